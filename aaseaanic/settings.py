@@ -54,6 +54,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -75,6 +76,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.airport_bundle_url',
             ],
         },
     },
@@ -133,6 +135,20 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+AIRPORT_BUNDLE_DIR = BASE_DIR / 'static' / 'data'  # Built by build_airport_bundle, not committed
+
+# Hashed names plus .gz/.br variants written by collectstatic (see core/staticfiles.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'core.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+# Serve STATIC_ROOT from Django itself (core.staticfiles.StaticFilesMiddleware)
+STATIC_SERVE = config('STATIC_SERVE', default=not DEBUG, cast=bool)
 
 # Media files
 MEDIA_URL = '/media/'
@@ -156,9 +172,99 @@ LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = '/dashboard/user/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Cache (per-process; point at a shared backend when running several workers)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'aaseaanic',
+    }
+}
+
+# Cached public pages and fragments, invalidated by model signals (see core/caching.py)
+PAGE_CACHE_TIMEOUT = 300  # Also bounds how stale "upcoming" lists can get
+
+# Reverse proxies in front of the app that append to X-Forwarded-For (see core.utils.get_client_ip).
+# Client IPs key login throttling and rate limits, so leave at 0 unless every request passes a proxy.
+NUM_PROXIES = config('NUM_PROXIES', default=0, cast=int)
+
+# Failed-login throttling (see authentication/throttling.py)
+LOGIN_THROTTLE = {
+    'IP': {'LIMIT': 20, 'WINDOW': 300},  # Failures per IP per 5 minutes
+    'USERNAME': {'LIMIT': 5, 'WINDOW': 300},  # Failures per username per 5 minutes
+}
+
+# Token-bucket limits for public endpoints (see core/ratelimit.py); RATE is tokens per second
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMITS = {
+    'search_airports': {'RATE': 5, 'BURST': 20, 'GLOBAL_RATE': 200, 'GLOBAL_BURST': 400},
+    'flight_availability': {'RATE': 5, 'BURST': 30, 'GLOBAL_RATE': 200, 'GLOBAL_BURST': 400},
+    'newsletter': {'RATE': 0.05, 'BURST': 3},
+}
+
 # Session Configuration
+# Cache-first, writes to the DB only on change (see core/sessions.py). Reads come from the default
+# cache, so several workers need a shared CACHES backend to see each other's session changes.
+SESSION_ENGINE = 'core.sessions'
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_SAVE_EVERY_REQUEST = True
+SESSION_DB_REFRESH_MARGIN = SESSION_COOKIE_AGE // 2  # Re-persist when the DB copy has less than this left
+
+# Buffered audit/activity writes (see core/audit.py)
+AUDIT_BUFFER = {
+    'ENABLED': config('AUDIT_BUFFER_ENABLED', default=True, cast=bool),
+    'MAX_EVENTS': 10000,  # Queue bound per process
+    'FLUSH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,  # Seconds
+    'OVERFLOW': 'drop',  # 'drop' new events or 'flush' synchronously when full
+}
+
+# Retention/archival (see core/archival.py); override per-table retention in days
+ARCHIVE_ROOT = BASE_DIR / 'archive'
+ARCHIVE_RETENTION_DAYS = {
+    # 'login_attempts': 90,
+}
+
+# Part of every conditional-GET ETag (see core/conditional.py); change it when templates change
+ETAG_VERSION = config('ETAG_VERSION', default='1')
+
+# Dynamic fares (see flights/pricing.py); run `manage.py reprice_flights` every few minutes
+FARE_PRICING = {
+    'HORIZON_DAYS': 365,
+    'LOAD_FACTOR_CURVE': [(0.0, 0.85), (0.5, 1.0), (0.8, 1.2), (0.95, 1.5), (1.0, 1.8)],  # (seats sold / capacity, multiplier)
+    'DAYS_CURVE': [(0, 1.5), (3, 1.3), (7, 1.15), (14, 1.05), (21, 1.0), (60, 0.9)],  # (days to departure, multiplier)
+    'MIN_MULTIPLIER': 0.5,
+    'MAX_MULTIPLIER': 3.0,
+}
+
+# Signed fare quotes held between availability and payment (see flights/quotes.py)
+FARE_QUOTE = {
+    'TTL': 900,
+    'TAX_RATE': '0.12',
+    'SERVICE_FEE': '25.00',
+}
+
+# Flight search reads the denormalized FlightSearchIndex (see flights/search_index.py)
+FLIGHT_SEARCH_USE_INDEX = True
+AIRPORT_SEARCH_RADIUS_KM = 80  # Also match airports this close to the one typed (see core/geo.py); 0 disables
+AIRPORT_SEARCH_MAX_RADIUS_KM = 300  # Upper bound for ?radius=, which otherwise could match every airport
+
+# Popular destinations ranking (see core/popularity.py); run `manage.py rank_destinations` hourly
+POPULAR_DESTINATIONS = {
+    'TOP_N': None,  # Every bookable destination; the destinations page lists them all
+    'WINDOW_DAYS': 90,
+    'SEARCH_WINDOW_DAYS': 14,
+    'HALF_LIFE_DAYS': 14,
+    'BOOKING_WEIGHT': 1.0,  # Per confirmed passenger
+    'SEARCH_WEIGHT': 0.05,  # Per destination search
+}
+
+# Live flight status stream (see flights/live.py); needs an ASGI server
+LIVE_STATUS = {
+    'POLL_INTERVAL': 2.0,  # Seconds between updated_at polls, shared by all connections
+    'KEEPALIVE': 15,
+    'MAX_SUBSCRIBERS': 20000,  # Per process
+    'QUEUE_SIZE': 100,
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -1,3 +1,102 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.utils import get_client_ip
+from . import throttling
+
+WINDOW = 300
+START = 1_000_000 * WINDOW  # Start of a fixed window
+
+
+@override_settings(LOGIN_THROTTLE={
+    'IP': {'LIMIT': 20, 'WINDOW': WINDOW},
+    'USERNAME': {'LIMIT': 5, 'WINDOW': WINDOW},
+})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def at(self, seconds):
+        return mock.patch('authentication.throttling.time.time', return_value=START + seconds)
+
+    def fail(self, times, seconds=0, ip='10.0.0.1', username='alice'):
+        with self.at(seconds):
+            for _ in range(times):
+                throttling.record_failure(ip, username)
+
+    def check(self, seconds, ip='10.0.0.1', username='alice'):
+        with self.at(seconds):
+            return throttling.check(ip, username)
+
+    def test_limit_is_reached_on_the_fifth_failure(self):
+        self.fail(4)
+        self.assertEqual(self.check(10), 0)
+
+        self.fail(1, seconds=10)
+        self.assertEqual(self.check(10), WINDOW - 10 + 1)
+
+    def test_previous_window_counts_by_its_remaining_overlap(self):
+        self.fail(5, seconds=WINDOW - 1)
+
+        # Just past the window edge the previous window still counts in full
+        self.assertGreater(self.check(WINDOW), 0)
+        # Halfway through the next window it counts 2.5
+        self.assertEqual(self.check(WINDOW + WINDOW // 2), 0)
+        self.assertEqual(self.check(2 * WINDOW), 0)
+
+    def test_username_limit_applies_across_ips(self):
+        for ip in range(5):
+            self.fail(1, ip=f'10.0.0.{ip}')
+
+        self.assertGreater(self.check(1, ip='10.9.9.9'), 0)
+        self.assertEqual(self.check(1, ip='10.9.9.9', username='bob'), 0)
+
+    def test_ip_limit_applies_across_usernames(self):
+        for name in range(20):
+            self.fail(1, username=f'user{name}')
+
+        self.assertGreater(self.check(1, username='someone-else'), 0)
+
+    def test_reset_forgets_the_username(self):
+        self.fail(5)
+        with self.at(0):
+            throttling.reset('Alice ')
+
+        self.assertEqual(self.check(1, ip='10.9.9.9'), 0)
+
+    @override_settings(AUDIT_BUFFER={'ENABLED': False})
+    def test_throttled_login_answers_429_without_checking_the_password(self):
+        User.objects.create_user('alice', 'alice@example.com', 'secret')
+        for _ in range(5):
+            self.client.post(reverse('authentication:login'), {'username': 'alice', 'password': 'wrong'})
+
+        with mock.patch('authentication.views.authenticate') as authenticate:
+            response = self.client.post(reverse('authentication:login'), {'username': 'alice', 'password': 'secret'})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        authenticate.assert_not_called()
+
+
+class ClientIpTests(TestCase):
+    def request(self, forwarded_for=None):
+        headers = {'REMOTE_ADDR': '192.0.2.1'}
+        if forwarded_for is not None:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded_for
+        return RequestFactory().get('/', **headers)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        self.assertEqual(get_client_ip(self.request('203.0.113.9')), '192.0.2.1')
+
+    @override_settings(NUM_PROXIES=1)
+    def test_client_is_taken_from_the_right(self):
+        # The left entry is whatever the client claimed
+        self.assertEqual(get_client_ip(self.request('1.2.3.4, 203.0.113.9')), '203.0.113.9')
+
+    @override_settings(NUM_PROXIES=2)
+    def test_short_forwarded_for_falls_back_to_remote_addr(self):
+        self.assertEqual(get_client_ip(self.request('203.0.113.9')), '192.0.2.1')
@@ -0,0 +1,91 @@
+"""
+Sliding-window login throttling per client IP and per username.
+
+Failed logins are counted in the Django cache in fixed windows. The effective
+count is the current window plus the previous window weighted by how much of
+it still overlaps the sliding window, which approximates a true sliding log
+with two counters per key. Checks run before ``authenticate()``, so an
+over-limit attempt costs two cache reads instead of a password hash.
+
+``LoginAttempt`` rows are still written for every attempt as the audit trail;
+the cache is only the fast path.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULTS = {
+    'IP': {'LIMIT': 20, 'WINDOW': 300},
+    'USERNAME': {'LIMIT': 5, 'WINDOW': 300},
+}
+
+KEY_PREFIX = 'login-throttle'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LOGIN_THROTTLE', {})}
+
+
+def _ident(scope, value):
+    # Usernames are user input; hash them into a safe, fixed-length cache key
+    value = (value or '').strip().lower()
+    return f"{scope}:{hashlib.sha256(value.encode()).hexdigest()[:32]}"
+
+
+def _window_keys(ident, window, now):
+    index = int(now // window)
+    return (
+        f'{KEY_PREFIX}:{ident}:{index}',
+        f'{KEY_PREFIX}:{ident}:{index - 1}',
+        now - index * window,
+    )
+
+
+def _weighted_count(ident, window, now):
+    current_key, previous_key, elapsed = _window_keys(ident, window, now)
+    counts = cache.get_many([current_key, previous_key])
+    previous_weight = 1 - elapsed / window
+    return counts.get(current_key, 0) + counts.get(previous_key, 0) * previous_weight, window - elapsed
+
+
+def _scopes(ip_address, username):
+    config = get_config()
+    yield _ident('ip', ip_address), config['IP']
+    if username:
+        yield _ident('user', username), config['USERNAME']
+
+
+def check(ip_address, username):
+    """Return the number of seconds to wait if either key is over its limit, else 0."""
+    now = time.time()
+    retry_after = 0
+    for ident, limits in _scopes(ip_address, username):
+        count, until_next_window = _weighted_count(ident, limits['WINDOW'], now)
+        if count >= limits['LIMIT']:
+            retry_after = max(retry_after, int(until_next_window) + 1)
+    return retry_after
+
+
+def record_failure(ip_address, username):
+    """Count a failed attempt against the IP and the username."""
+    now = time.time()
+    for ident, limits in _scopes(ip_address, username):
+        current_key, _, _ = _window_keys(ident, limits['WINDOW'], now)
+        # Keep each window around long enough to serve as the "previous" one
+        cache.add(current_key, 0, timeout=limits['WINDOW'] * 2)
+        try:
+            cache.incr(current_key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(current_key, 1, timeout=limits['WINDOW'] * 2)
+
+
+def reset(username):
+    """Forget failures for a username after a successful login."""
+    if not username:
+        return
+    window = get_config()['USERNAME']['WINDOW']
+    current_key, previous_key, _ = _window_keys(_ident('user', username), window, time.time())
+    cache.delete_many([current_key, previous_key])
@@ -11,8 +11,11 @@ from datetime import timedelta
 import random
 import string
 
+from . import throttling
 from .models import OTPVerification, LoginAttempt
 from core.models import UserProfile
+from core import audit
+from core.utils import get_client_ip
 
 class SignUpView(TemplateView):
     template_name = 'authentication/signup.html'
@@ -77,40 +80,50 @@ class LoginView(TemplateView):
         username = request.POST.get('username')
         password = request.POST.get('password')
         
-        user = authenticate(request, username=username, password=password)
-        
-        # Log login attempt
-        ip_address = self.get_client_ip(request)
+        # Client details for the login attempt log
+        ip_address = get_client_ip(request)
         user_agent = request.META.get('HTTP_USER_AGENT', '')
         
-        LoginAttempt.objects.create(
+        # Reject throttled clients before paying for a password hash
+        retry_after = throttling.check(ip_address, username)
+        if retry_after:
+            audit.record(LoginAttempt(
+                ip_address=ip_address,
+                success=False,
+                user_agent=user_agent
+            ))
+            messages.error(request, 'Too many failed login attempts. Please try again later.')
+            response = self.get(request, *args, **kwargs)
+            response.status_code = 429
+            response['Retry-After'] = str(retry_after)
+            return response
+        
+        user = authenticate(request, username=username, password=password)
+        
+        audit.record(LoginAttempt(
             user=user,
             ip_address=ip_address,
             success=user is not None,
             user_agent=user_agent
-        )
+        ))
         
         if user is not None:
+            throttling.reset(username)
             login(request, user)
+            audit.record_activity(request, 'login')
             messages.success(request, f'Welcome back, {user.get_full_name() or user.username}!')
             
             # Redirect to next page or dashboard
             next_page = request.GET.get('next', 'dashboard:user_dashboard')
             return redirect(next_page)
         else:
+            throttling.record_failure(ip_address, username)
             messages.error(request, 'Invalid username or password.')
             return self.get(request, *args, **kwargs)
-    
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
 
 class LogoutView(View):
     def get(self, request, *args, **kwargs):
+        audit.record_activity(request, 'logout')
         logout(request)
         messages.success(request, 'You have been logged out successfully.')
         return redirect('core:home')
@@ -0,0 +1,24 @@
+"""
+Booking drafts kept in the database, keyed by booking.
+
+Passenger details typed on the booking form are needed again on the next step
+only. They are stored in one ``PassengerDraft`` row per booking rather than in
+the session, so the session payload stays small, every worker sees the same
+draft and drafts of bookings made in parallel tabs stay apart. A draft is
+deleted once its booking is paid; drafts of abandoned bookings are dropped by
+the ``passenger_drafts`` archival policy (``manage.py archive_data``).
+"""
+from .models import PassengerDraft
+
+
+def save_passenger_draft(booking, passenger_data):
+    PassengerDraft.objects.update_or_create(booking=booking, defaults={'data': passenger_data})
+
+
+def get_passenger_draft(booking):
+    draft = PassengerDraft.objects.filter(booking=booking).values_list('data', flat=True).first()
+    return draft or []
+
+
+def clear_passenger_draft(booking):
+    PassengerDraft.objects.filter(booking=booking).delete()
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='fare_quote',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='seat_class',
+            field=models.CharField(choices=[('economy', 'Economy'), ('business', 'Business'), ('first', 'First Class')], default='economy', max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_booking_fare_quote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PassengerDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='passenger_draft', to='bookings.booking')),
+            ],
+        ),
+    ]
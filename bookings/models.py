@@ -29,8 +29,10 @@ class Booking(models.Model):
     
     # Passenger details
     passengers = models.PositiveIntegerField(default=1)
+    seat_class = models.CharField(max_length=10, choices=Seat.SEAT_CLASS_CHOICES, default='economy')
     
     # Pricing
+    fare_quote = models.TextField(blank=True)  # Signed quote the prices come from (see flights/quotes.py)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))])
     taxes = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     service_fee = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
@@ -49,6 +51,11 @@ class Booking(models.Model):
     
     class Meta:
         ordering = ['-booked_at']
+        indexes = [
+            models.Index(fields=['booked_at']),
+            models.Index(fields=['confirmed_at']),
+            models.Index(fields=['cancelled_at']),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.booking_reference:
@@ -102,6 +109,15 @@ class Passenger(models.Model):
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+class PassengerDraft(models.Model):
+    """Passenger details typed on the booking form, until the booking is paid (see drafts.py)"""
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='passenger_draft')
+    data = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    def __str__(self):
+        return f"Draft for {self.booking.booking_reference}"
+
 class Payment(models.Model):
     PAYMENT_STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -135,5 +151,11 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['processed_at']),
+        ]
+    
     def __str__(self):
         return f"Payment {self.payment_id} - {self.booking.booking_reference}"
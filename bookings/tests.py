@@ -1,3 +1,202 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Airline, Airport
+from flights import availability, quotes
+from flights.models import Aircraft, Flight
+from .models import Booking, PassengerDraft, Payment
+
+
+class BookingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('traveller', 'traveller@example.com', 'secret')
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=150, economy_seats=150)
+        departure = timezone.now() + timedelta(days=30)
+        cls.flight = Flight.objects.create(
+            flight_number='TA1',
+            airline=airline,
+            aircraft=aircraft,
+            origin=Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK'),
+            destination=Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR'),
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=7),
+            duration=timedelta(hours=7),
+            economy_price=Decimal('300.00'),
+            available_economy_seats=10,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def make_booking(self, passengers=2, token=None):
+        quote = availability.quote(self.flight, 'economy', passengers)
+        return Booking.objects.create(
+            user=self.user,
+            outbound_flight=self.flight,
+            passengers=passengers,
+            seat_class='economy',
+            total_amount=quote.fare,
+            taxes=quote.taxes,
+            service_fee=quote.service_fee,
+            fare_quote=quote.token if token is None else token,
+            contact_email=self.user.email,
+            contact_phone='0',
+        )
+
+    def pay(self, booking):
+        return self.client.post(reverse('bookings:payment', args=[booking.booking_reference]), {
+            'payment_method': 'credit_card',
+        })
+
+
+class PaymentTests(BookingTestCase):
+    def assertUnpaid(self, booking, seats=10):
+        booking.refresh_from_db()
+        self.flight.refresh_from_db()
+        self.assertEqual(booking.status, 'pending')
+        self.assertIsNone(booking.confirmed_at)
+        self.assertFalse(Payment.objects.filter(booking=booking).exists())
+        self.assertEqual(self.flight.available_economy_seats, seats)
+
+    def test_payment_confirms_at_the_quoted_total(self):
+        booking = self.make_booking()
+        quote = quotes.verify(booking.fare_quote)
+
+        response = self.pay(booking)
+
+        self.assertRedirects(response, reverse('bookings:confirmation', args=[booking.booking_reference]),
+                             fetch_redirect_response=False)
+        booking.refresh_from_db()
+        self.flight.refresh_from_db()
+        self.assertEqual(booking.status, 'confirmed')
+        self.assertEqual(booking.payment.amount, quote.total)
+        self.assertEqual(self.flight.available_economy_seats, 8)
+
+    def test_tampered_token_is_not_paid(self):
+        token = availability.quote(self.flight, 'economy', 2).token
+        booking = self.make_booking(token=token[:-4] + ('AAAA' if not token.endswith('AAAA') else 'BBBB'))
+
+        response = self.pay(booking)
+
+        self.assertRedirects(response, reverse('bookings:book_flight', args=[self.flight.pk]),
+                             fetch_redirect_response=False)
+        self.assertUnpaid(booking)
+
+    def test_tampered_token_creates_no_booking(self):
+        token = availability.quote(self.flight, 'economy', 2).token
+        response = self.client.post(reverse('bookings:book_flight', args=[self.flight.pk]), {
+            'quote': token.replace(':', ':x', 1),
+        })
+
+        self.assertRedirects(response, reverse('bookings:book_flight', args=[self.flight.pk]),
+                             fetch_redirect_response=False)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_zero_passengers_creates_no_booking(self):
+        response = self.client.post(reverse('bookings:book_flight', args=[self.flight.pk]), {
+            'seat_class': 'economy',
+            'passengers': '0',
+        })
+
+        self.assertRedirects(response, reverse('bookings:book_flight', args=[self.flight.pk]),
+                             fetch_redirect_response=False)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_expired_token_asks_for_a_new_quote(self):
+        expired = availability.quote(self.flight, 'economy', 2)
+        expired = quotes.issue(self.flight.pk, 'TA1', 'economy', expired.unit_price, 2,
+                               now=time.time() - quotes.get_config()['TTL'] - 1)
+        booking = self.make_booking(token=expired.token)
+
+        response = self.pay(booking)
+
+        self.assertRedirects(response, f"{reverse('bookings:book_flight', args=[self.flight.pk])}?passengers=2",
+                             fetch_redirect_response=False)
+        self.assertUnpaid(booking)
+
+    def test_not_enough_seats_left_rolls_back(self):
+        Flight.objects.filter(pk=self.flight.pk).update(available_economy_seats=1)
+        booking = self.make_booking(passengers=2)
+
+        response = self.pay(booking)
+
+        self.assertRedirects(response, reverse('bookings:payment', args=[booking.booking_reference]),
+                             fetch_redirect_response=False)
+        self.assertUnpaid(booking, seats=1)
+
+    def test_last_seat(self):
+        Flight.objects.filter(pk=self.flight.pk).update(available_economy_seats=1)
+        first = self.make_booking(passengers=1)
+        second = self.make_booking(passengers=1)
+
+        self.pay(first)
+        self.pay(second)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'confirmed')
+        self.assertEqual(second.status, 'pending')
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.available_economy_seats, 0)
+
+    def test_second_payment_is_rejected(self):
+        booking = self.make_booking()
+
+        self.pay(booking)
+        response = self.pay(booking)
+
+        self.assertRedirects(response, reverse('bookings:confirmation', args=[booking.booking_reference]),
+                             fetch_redirect_response=False)
+        self.assertEqual(Payment.objects.filter(booking=booking).count(), 1)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.available_economy_seats, 8)
+
+    def test_concurrent_second_payment_is_rejected(self):
+        # The second request read the booking while it was still pending
+        booking = self.make_booking()
+        stale = Booking.objects.get(pk=booking.pk)
+        self.pay(booking)
+
+        with mock.patch('bookings.views.get_object_or_404', return_value=stale):
+            response = self.pay(booking)
+
+        self.assertRedirects(response, reverse('bookings:confirmation', args=[booking.booking_reference]),
+                             fetch_redirect_response=False)
+        self.assertEqual(Payment.objects.filter(booking=booking).count(), 1)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.available_economy_seats, 8)
+
+    def test_payment_deletes_the_passenger_draft(self):
+        booking = self.make_booking()
+        PassengerDraft.objects.create(booking=booking, data=[{'first_name': 'Ada'}])
+
+        self.pay(booking)
+
+        self.assertFalse(PassengerDraft.objects.filter(booking=booking).exists())
+
+
+class PassengerDraftTests(BookingTestCase):
+    def test_draft_is_kept_out_of_the_session(self):
+        token = availability.quote(self.flight, 'economy', 1).token
+        response = self.client.post(reverse('bookings:book_flight', args=[self.flight.pk]), {
+            'quote': token,
+            'passenger_0_first_name': 'Ada',
+        })
+
+        booking = Booking.objects.get()
+        self.assertRedirects(response, reverse('bookings:passenger_details', args=[booking.booking_reference]),
+                             fetch_redirect_response=False)
+        self.assertEqual(booking.passenger_draft.data[0]['first_name'], 'Ada')
+        self.assertNotIn('Ada', str(dict(self.client.session)))
 
-# Create your tests here.
+        response = self.client.get(reverse('bookings:passenger_details', args=[booking.booking_reference]))
+        self.assertEqual(response.context['passenger_data'][0]['first_name'], 'Ada')
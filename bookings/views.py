@@ -3,11 +3,21 @@ from django.views.generic import TemplateView, View
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.contrib import messages
+from django.db import transaction
 from django.http import JsonResponse
+from django.urls import reverse
 from django.utils import timezone
-from decimal import Decimal
+from . import drafts
 from .models import Booking, Passenger, Payment
+from flights import availability, quotes as fare_quotes
 from flights.models import Flight, Seat
+from core import audit
+
+def booking_quote(booking, check_expiry=True):
+    """The fare quote a booking was made from, or None for bookings made before quotes"""
+    if not booking.fare_quote:
+        return None
+    return fare_quotes.verify(booking.fare_quote, flight_id=booking.outbound_flight_id, check_expiry=check_expiry)
 
 @method_decorator(login_required, name='dispatch')
 class BookFlightView(TemplateView):
@@ -19,51 +29,71 @@ class BookFlightView(TemplateView):
         flight_id = kwargs.get('flight_id')
         flight = get_object_or_404(Flight, id=flight_id)
         
-        # Get passengers count from session or default to 1
-        passengers = int(self.request.GET.get('passengers', 1))
+        # Get passengers count from the query string or default to 1
+        passengers = availability.parse_passengers(self.request.GET.get('passengers', 1)) or 1
+        
+        # One signed quote per cabin with enough seats; the form posts back the chosen one
+        quotes = {
+            seat_class: availability.quote(flight, seat_class, passengers)
+            for seat_class, (seats_field, _) in availability.CABINS.items()
+            if getattr(flight, seats_field) >= passengers
+        }
         
         context.update({
             'flight': flight,
             'passengers': passengers,
             'passenger_range': range(passengers),
+            'quotes': quotes,
         })
         
         return context
     
-    def post(self, request, *args, **kwargs):
-        flight_id = kwargs.get('flight_id')
-        flight = get_object_or_404(Flight, id=flight_id)
+    def get_quote(self, request, flight_id):
+        """The posted fare quote, or a fresh one for forms that do not send a token"""
+        token = request.POST.get('quote')
+        if token:
+            return fare_quotes.verify(token, flight_id=flight_id)
         
-        passengers_count = int(request.POST.get('passengers', 1))
+        flight = get_object_or_404(Flight, id=flight_id)
         seat_class = request.POST.get('seat_class', 'economy')
+        if seat_class not in availability.CABINS:
+            raise fare_quotes.QuoteError(f'Unknown seat class {seat_class!r}')
+        passengers = availability.parse_passengers(request.POST.get('passengers', 1))
+        if passengers is None:
+            raise fare_quotes.QuoteError('Please choose at least one passenger')
+        return availability.quote(flight, seat_class, passengers)
+    
+    def post(self, request, *args, **kwargs):
+        flight_id = kwargs.get('flight_id')
         trip_type = request.POST.get('trip_type', 'one_way')
         
-        # Calculate pricing
-        if seat_class == 'economy':
-            base_price = flight.economy_price
-        elif seat_class == 'business':
-            base_price = flight.business_price
-        else:
-            base_price = flight.first_class_price
-        
-        total_amount = base_price * passengers_count
-        taxes = total_amount * Decimal('0.12')  # 12% tax
-        service_fee = Decimal('25.00')  # Fixed service fee
+        # Prices come from the signed quote: no flight lookup and no re-pricing here
+        try:
+            quote = self.get_quote(request, flight_id)
+        except fare_quotes.QuoteExpired:
+            messages.error(request, 'Your fare quote has expired. Please review the current price.')
+            return redirect(f"{reverse('bookings:book_flight', args=[flight_id])}?passengers={request.POST.get('passengers', 1)}")
+        except fare_quotes.QuoteError as e:
+            messages.error(request, str(e))
+            return redirect('bookings:book_flight', flight_id=flight_id)
+        passengers_count = quote.passengers
         
         # Create booking
         booking = Booking.objects.create(
             user=request.user,
             trip_type=trip_type,
-            outbound_flight=flight,
+            outbound_flight_id=quote.flight_id,
             passengers=passengers_count,
-            total_amount=total_amount,
-            taxes=taxes,
-            service_fee=service_fee,
+            seat_class=quote.seat_class,
+            total_amount=quote.fare,
+            taxes=quote.taxes,
+            service_fee=quote.service_fee,
+            fare_quote=quote.token,
             contact_email=request.user.email,
             contact_phone=request.POST.get('contact_phone', ''),
         )
         
-        # Store passenger info in session for next step
+        # Keep passenger info in a draft for the next step
         passenger_data = []
         for i in range(passengers_count):
             passenger_data.append({
@@ -75,8 +105,9 @@ class BookFlightView(TemplateView):
                 'nationality': request.POST.get(f'passenger_{i}_nationality', ''),
             })
         
-        request.session['passenger_data'] = passenger_data
-        request.session['booking_reference'] = booking.booking_reference
+        drafts.save_passenger_draft(booking, passenger_data)
+        
+        audit.record_activity(request, 'booking_created', f'Booking {booking.booking_reference} on {quote.flight_number}')
         
         messages.success(request, f'Booking created successfully! Reference: {booking.booking_reference}')
         return redirect('bookings:passenger_details', booking_ref=booking.booking_reference)
@@ -91,8 +122,8 @@ class PassengerDetailsView(TemplateView):
         booking_ref = kwargs.get('booking_ref')
         booking = get_object_or_404(Booking, booking_reference=booking_ref, user=self.request.user)
         
-        # Get passenger data from session
-        passenger_data = self.request.session.get('passenger_data', [])
+        # Get passenger data from the booking draft
+        passenger_data = drafts.get_passenger_draft(booking)
         
         context.update({
             'booking': booking,
@@ -187,9 +218,15 @@ class PaymentView(TemplateView):
         booking_ref = kwargs.get('booking_ref')
         booking = get_object_or_404(Booking, booking_reference=booking_ref, user=self.request.user)
         
+        try:
+            quote = booking_quote(booking, check_expiry=False)
+        except fare_quotes.QuoteError:
+            quote = None
+        
         context.update({
             'booking': booking,
-            'grand_total': booking.get_grand_total(),
+            'grand_total': quote.total if quote else booking.get_grand_total(),
+            'quote_expires': quote.expires if quote else None,
         })
         
         return context
@@ -198,33 +235,60 @@ class PaymentView(TemplateView):
         booking_ref = kwargs.get('booking_ref')
         booking = get_object_or_404(Booking, booking_reference=booking_ref, user=request.user)
         
-        payment_method = request.POST.get('payment_method')
+        if booking.status != 'pending':
+            messages.error(request, 'This booking has already been paid.')
+            return redirect('bookings:confirmation', booking_ref=booking.booking_reference)
         
-        # Create payment record
-        payment = Payment.objects.create(
-            booking=booking,
-            amount=booking.get_grand_total(),
-            payment_method=payment_method,
-            status='completed',  # In real app, this would be 'pending' until gateway confirms
-            processed_at=timezone.now(),
-            transaction_id=f'TXN_{booking.booking_reference}_{timezone.now().strftime("%Y%m%d%H%M%S")}'
-        )
+        # The quoted price is honoured until it expires; after that the fare must be quoted again
+        try:
+            quote = booking_quote(booking)
+        except fare_quotes.QuoteExpired:
+            messages.error(request, 'Your fare quote expired before payment. Please book again at the current fare.')
+            return redirect(
+                f"{reverse('bookings:book_flight', args=[booking.outbound_flight_id])}?passengers={booking.passengers}"
+            )
+        except fare_quotes.QuoteError:
+            messages.error(request, 'This booking cannot be paid. Please book again.')
+            return redirect('bookings:book_flight', flight_id=booking.outbound_flight_id)
+        grand_total = quote.total if quote else booking.get_grand_total()
         
-        # Update booking status
-        booking.status = 'confirmed'
-        booking.confirmed_at = timezone.now()
-        booking.save()
+        payment_method = request.POST.get('payment_method')
         
-        # Update flight seat availability
-        flight = booking.outbound_flight
-        flight.available_economy_seats -= booking.passengers
-        flight.save()
+        with transaction.atomic():
+            # Claim the booking with a conditional UPDATE: of two concurrent payments only one
+            # matches. The status itself is written by save() below, so the model signals
+            # (counters, dashboard caches) still see the pending -> confirmed change.
+            confirmed_at = timezone.now()
+            claimed = Booking.objects.filter(
+                pk=booking.pk, status='pending', confirmed_at__isnull=True,
+            ).update(confirmed_at=confirmed_at)
+            if not claimed:
+                messages.error(request, 'This booking has already been paid.')
+                return redirect('bookings:confirmation', booking_ref=booking.booking_reference)
+            
+            # Inventory is the only thing checked again at commit
+            if not availability.reserve(booking.outbound_flight_id, booking.seat_class, booking.passengers):
+                transaction.set_rollback(True)
+                messages.error(request, 'Sorry, there are no longer enough seats left in this cabin.')
+                return redirect('bookings:payment', booking_ref=booking.booking_reference)
+            
+            # Create payment record
+            payment = Payment.objects.create(
+                booking=booking,
+                amount=grand_total,
+                payment_method=payment_method,
+                status='completed',  # In real app, this would be 'pending' until gateway confirms
+                processed_at=confirmed_at,
+                transaction_id=f'TXN_{booking.booking_reference}_{confirmed_at.strftime("%Y%m%d%H%M%S")}'
+            )
+            
+            # Update booking status
+            booking.status = 'confirmed'
+            booking.confirmed_at = confirmed_at
+            booking.save()
         
-        # Clear session data
-        if 'passenger_data' in request.session:
-            del request.session['passenger_data']
-        if 'booking_reference' in request.session:
-            del request.session['booking_reference']
+        # Clear the booking draft
+        drafts.clear_passenger_draft(booking)
         
         messages.success(request, 'Payment successful! Your booking is confirmed.')
         return redirect('bookings:confirmation', booking_ref=booking.booking_reference)
@@ -275,10 +339,9 @@ class CancelBookingView(View):
                     passenger.outbound_seat.save()
             
             # Update flight availability
-            flight = booking.outbound_flight
-            flight.available_economy_seats += booking.passengers
-            flight.save()
+            availability.release(booking.outbound_flight_id, booking.seat_class, booking.passengers)
             
+            audit.record_activity(request, 'booking_cancelled', f'Booking {booking.booking_reference}')
             messages.success(request, f'Booking {booking.booking_reference} has been cancelled successfully.')
         else:
             messages.error(request, 'This booking cannot be cancelled.')
@@ -0,0 +1,108 @@
+"""
+Static airport dataset for client-side autocomplete.
+
+``build()`` exports every ``Airport`` to a compact JSON file whose name carries
+a hash of its content (``airports.<hash>.json``), so browsers can cache it
+forever. The search key of each airport is precomputed (lowercase, accents
+stripped) and the client only has to run a substring match. ``airports.manifest.json``
+in the same directory points at the current bundle, and the
+``airport_bundle`` context processor passes its URL to the templates.
+
+The bundle is rebuilt after any airport change (see ``core.signals``) and by
+``manage.py build_airport_bundle``.
+"""
+import hashlib
+import json
+import logging
+import os
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Airport
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'airports.manifest.json'
+CACHE_KEY = 'airport-bundle:manifest'
+KEEP_BUNDLES = 3  # Older pages may still reference the previous bundle
+
+
+def get_directory():
+    return str(getattr(settings, 'AIRPORT_BUNDLE_DIR', os.path.join(settings.BASE_DIR, 'static', 'data')))
+
+
+def search_key(*values):
+    text = ' '.join(value for value in values if value)
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def _write(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _prune(directory, current):
+    bundles = sorted(
+        (name for name in os.listdir(directory)
+         if name.startswith('airports.') and name.endswith('.json') and name not in (current, MANIFEST_NAME)),
+        key=lambda name: os.path.getmtime(os.path.join(directory, name)),
+        reverse=True,
+    )
+    for name in bundles[KEEP_BUNDLES - 1:]:
+        os.remove(os.path.join(directory, name))
+
+
+def build():
+    """Write the bundle and manifest; returns the manifest dict."""
+    rows = [
+        [code, name, city, country, search_key(code, name, city, country)]
+        for code, name, city, country in Airport.objects.order_by('code').values_list('code', 'name', 'city', 'country')
+    ]
+    payload = json.dumps(
+        {'fields': ['code', 'name', 'city', 'country', 'key'], 'airports': rows},
+        ensure_ascii=False, separators=(',', ':'),
+    ).encode()
+    version = hashlib.sha256(payload).hexdigest()[:12]
+    filename = f'airports.{version}.json'
+
+    directories = [get_directory()]
+    # Also publish into an already collected STATIC_ROOT so a rebuild needs no collectstatic
+    if settings.STATIC_ROOT and os.path.isdir(settings.STATIC_ROOT):
+        directories.append(os.path.join(settings.STATIC_ROOT, 'data'))
+
+    manifest = {'file': filename, 'version': version, 'count': len(rows)}
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(os.path.join(directory, filename)):
+            _write(os.path.join(directory, filename), payload)
+        _write(os.path.join(directory, MANIFEST_NAME), json.dumps(manifest).encode())
+        _prune(directory, filename)
+    cache.set(CACHE_KEY, manifest, 60)
+    return manifest
+
+
+def rebuild_quietly():
+    """``build()`` for signal handlers: a failed rebuild must not break the save that triggered it."""
+    try:
+        build()
+    except Exception:
+        logger.exception('Could not rebuild the airport bundle')
+
+
+def get_manifest():
+    """Current manifest, or None if no bundle has been built."""
+    manifest = cache.get(CACHE_KEY)
+    if manifest is None:
+        try:
+            with open(os.path.join(get_directory(), MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        # Short timeout: other processes pick up a rebuild within a minute
+        cache.set(CACHE_KEY, manifest, 60)
+    return manifest or None
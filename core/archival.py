@@ -0,0 +1,182 @@
+"""
+Retention and archival for high-churn tables.
+
+Rows older than a per-table retention window are copied to gzip-compressed
+JSON Lines files under ``settings.ARCHIVE_ROOT`` and then deleted, one small
+chunk per transaction so SQLite never holds the write lock for long.
+
+Each chunk is handled in three steps:
+
+1. append the rows to the archive file and fsync it,
+2. store the chunk's primary keys in ``ArchiveCheckpoint.pending_pks``,
+3. delete those rows and clear ``pending_pks`` in one transaction.
+
+If the job dies between 2 and 3, the next run deletes the pending rows first
+without writing them again. Dying between 1 and 2 means that chunk is written
+again on the next run, so a crash can at worst duplicate one chunk in the
+archive (rows carry their primary key), never lose rows.
+"""
+import gzip
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import ArchiveCheckpoint
+
+CHUNK_SIZE = 1000
+
+
+@dataclass
+class Policy:
+    model: str  # app_label.ModelName
+    date_field: str  # Rows with this field older than the retention window are eligible
+    days: int
+    archive: bool = True  # False: delete without keeping a copy
+    filter: Q = field(default_factory=Q)
+
+    def get_model(self):
+        return apps.get_model(self.model)
+
+
+# Order matters: seats and fare history are archived before the flights that own them
+POLICIES = {
+    'login_attempts': Policy('authentication.LoginAttempt', 'attempted_at', 90),
+    'user_activity': Policy('dashboard.UserActivity', 'created_at', 365),
+    'otp_verifications': Policy('authentication.OTPVerification', 'expires_at', 7),
+    'sessions': Policy('sessions.Session', 'expire_date', 0, archive=False),
+    # Drafts of bookings that were never paid
+    'passenger_drafts': Policy('bookings.PassengerDraft', 'updated_at', 2, archive=False),
+    # Seats still assigned to a passenger are kept so booking history keeps its seat numbers
+    'seats': Policy(
+        'flights.Seat', 'flight__arrival_time', 30,
+        filter=Q(flight__status__in=['departed', 'landed'],
+                 outbound_passengers__isnull=True, return_passengers__isnull=True),
+    ),
+    # Price changes of the flights below; keep its retention no longer than 'flights', whose
+    # deletion would otherwise drop them (cascade) without an archived copy
+    'fare_history': Policy(
+        'flights.FareHistory', 'flight__arrival_time', 180,
+        filter=Q(flight__status__in=['departed', 'landed'],
+                 flight__outbound_bookings__isnull=True, flight__return_bookings__isnull=True),
+    ),
+    # Flights with bookings are kept: deleting them would cascade to booking history
+    'flights': Policy(
+        'flights.Flight', 'arrival_time', 180,
+        filter=Q(status__in=['departed', 'landed'], outbound_bookings__isnull=True, return_bookings__isnull=True),
+    ),
+}
+
+
+def get_policies():
+    """Policies with retention days overridden from ``settings.ARCHIVE_RETENTION_DAYS``."""
+    overrides = getattr(settings, 'ARCHIVE_RETENTION_DAYS', {})
+    policies = {}
+    for name, policy in POLICIES.items():
+        days = overrides.get(name, policy.days)
+        policies[name] = Policy(policy.model, policy.date_field, days, policy.archive, policy.filter)
+    return policies
+
+
+def eligible(policy, now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=policy.days)
+    queryset = policy.get_model().objects.filter(policy.filter, **{f'{policy.date_field}__lt': cutoff})
+    if policy.filter:
+        # Joins in the filter (e.g. the booking relations) can repeat rows
+        queryset = queryset.distinct()
+    return queryset, cutoff
+
+
+def report(names=None):
+    """Dry-run summary: eligible rows, cutoff and oldest timestamp per table."""
+    rows = []
+    for name, policy in get_policies().items():
+        if names and name not in names:
+            continue
+        queryset, cutoff = eligible(policy)
+        summary = queryset.order_by().aggregate(oldest=Min(policy.date_field))
+        rows.append({
+            'table': name,
+            'cutoff': cutoff,
+            'eligible': queryset.count(),
+            'oldest': summary['oldest'],
+            'archive': policy.archive,
+        })
+    return rows
+
+
+def _archive_path(name):
+    directory = os.path.join(settings.ARCHIVE_ROOT, name)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{timezone.localdate():%Y-%m-%d}.jsonl.gz')
+
+
+def _write(name, rows):
+    # Each call appends a complete gzip member; concatenated members are still a valid .gz file
+    with open(_archive_path(name), 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+            for row in rows:
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder).encode())
+                archive.write(b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _delete(model, checkpoint, pks, archived):
+    with transaction.atomic():
+        deleted = model.objects.filter(pk__in=pks).delete()[1].get(model._meta.label, 0)
+        checkpoint.pending_pks = []
+        checkpoint.rows_deleted += deleted
+        checkpoint.rows_archived += archived
+        checkpoint.last_run_at = timezone.now()
+        checkpoint.save()
+    return deleted
+
+
+def archive_table(name, policy, chunk_size=CHUNK_SIZE, max_chunks=None):
+    """Archive and delete eligible rows of one table. Returns the number of rows deleted."""
+    model = policy.get_model()
+    checkpoint, _ = ArchiveCheckpoint.objects.get_or_create(table=name)
+    deleted = 0
+
+    # Finish a chunk that was archived by a previous, interrupted run
+    if checkpoint.pending_pks:
+        deleted += _delete(model, checkpoint, checkpoint.pending_pks, archived=0)
+
+    queryset, _ = eligible(policy)
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        if policy.archive:
+            rows = list(queryset.order_by('pk').values()[:chunk_size])
+            pks = [row[model._meta.pk.attname] for row in rows]
+        else:
+            rows = []
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+
+        if rows:
+            _write(name, rows)
+            checkpoint.pending_pks = pks
+            checkpoint.save(update_fields=['pending_pks'])
+        deleted += _delete(model, checkpoint, pks, archived=len(rows))
+        chunks += 1
+
+    return deleted
+
+
+def run(names=None, chunk_size=CHUNK_SIZE, max_chunks=None):
+    """Archive every (or the named) table and return ``{table: rows_deleted}``."""
+    results = {}
+    for name, policy in get_policies().items():
+        if names and name not in names:
+            continue
+        results[name] = archive_table(name, policy, chunk_size=chunk_size, max_chunks=max_chunks)
+    return results
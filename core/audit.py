@@ -0,0 +1,194 @@
+"""
+Buffered writer for audit and activity rows.
+
+``LoginAttempt``, ``UserActivity`` and ``AdminLog`` rows are written on hot
+request paths. Instead of an INSERT (and fsync) per event, ``record()`` queues
+the unsaved instance in memory and a background thread writes the queue with
+``bulk_create`` whenever it reaches ``FLUSH_SIZE`` events or every
+``FLUSH_INTERVAL`` seconds. The queue is flushed once more at interpreter exit.
+
+The queue is bounded by ``MAX_EVENTS``. When it is full the ``OVERFLOW`` policy
+decides: ``'drop'`` discards the new event (and counts it), ``'flush'`` makes
+the calling request flush synchronously (backpressure).
+
+Models whose default manager has a ``bulk_record(objs)`` method are written
+through it instead of ``bulk_create``, e.g. to merge counter increments
+(``core.models.DestinationSearch``).
+
+Configured through ``settings.AUDIT_BUFFER``; with ``ENABLED`` false every
+event is saved immediately.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_EVENTS': 10000,
+    'FLUSH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+    'OVERFLOW': 'drop',
+}
+
+
+class BufferedWriter:
+    """Bounded in-process queue of unsaved model instances, written in bulk"""
+
+    def __init__(self, max_events, flush_size, flush_interval, overflow):
+        self.max_events = max_events
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.dropped = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def record(self, obj):
+        """Queue an unsaved instance. Returns False if it was dropped."""
+        with self._lock:
+            full = len(self._queue) >= self.max_events
+            if full and self.overflow != 'flush':
+                self.dropped += 1
+                return False
+            if not full:
+                self._queue.append(obj)
+                size = len(self._queue)
+
+        if full:
+            # Backpressure: the caller pays for the flush, then the event is queued
+            self.flush()
+            with self._lock:
+                self._queue.append(obj)
+                size = len(self._queue)
+
+        self._ensure_thread()
+        if size >= self.flush_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self):
+        """Write everything queued so far. Safe to call from any thread."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._queue:
+                    return 0
+                events = list(self._queue)
+                self._queue.clear()
+
+            by_model = {}
+            for obj in events:
+                by_model.setdefault(type(obj), []).append(obj)
+
+            written = 0
+            for model, objs in by_model.items():
+                try:
+                    _write(model, objs, batch_size=self.flush_size)
+                    written += len(objs)
+                except Exception:
+                    # Never re-queue: a poisoned batch must not grow the buffer forever
+                    logger.exception('Dropping %d buffered %s row(s)', len(objs), model.__name__)
+                    self.dropped += len(objs)
+            return written
+
+    def _ensure_thread(self):
+        # The flusher thread does not survive a fork (e.g. preloading app servers)
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Audit buffer flush failed')
+            finally:
+                close_old_connections()
+
+
+def _write(model, objs, batch_size=None):
+    manager = model._default_manager
+    if hasattr(manager, 'bulk_record'):
+        manager.bulk_record(objs)
+    else:
+        manager.bulk_create(objs, batch_size=batch_size)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_BUFFER', {})}
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                config = get_config()
+                _writer = BufferedWriter(
+                    max_events=config['MAX_EVENTS'],
+                    flush_size=config['FLUSH_SIZE'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    overflow=config['OVERFLOW'],
+                )
+    return _writer
+
+
+def record(obj):
+    """Save ``obj`` through the buffer (or immediately when buffering is disabled)."""
+    if not get_config()['ENABLED']:
+        manager = type(obj)._default_manager
+        if hasattr(manager, 'bulk_record'):
+            manager.bulk_record([obj])
+        else:
+            obj.save()
+        return True
+    return get_writer().record(obj)
+
+
+def flush():
+    """Write any buffered rows now."""
+    if _writer is not None:
+        return _writer.flush()
+    return 0
+
+
+def record_activity(request, activity_type, description=''):
+    """Buffer a ``UserActivity`` row for the authenticated user of ``request``."""
+    from dashboard.models import UserActivity
+    from .utils import get_client_ip
+
+    if not request.user.is_authenticated:
+        return False
+    return record(UserActivity(
+        user=request.user,
+        activity_type=activity_type,
+        description=description,
+        ip_address=get_client_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+    ))
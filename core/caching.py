@@ -0,0 +1,63 @@
+"""
+Versioned cache keys for public pages and template fragments.
+
+Each namespace (``airports``, ``airlines``, ``flights``) has a version number
+stored in the cache. ``flights`` changes with every seat or fare update;
+``schedule`` only when flights are added, removed or rescheduled (see
+``Flight.SCHEDULE_FIELDS``), so pages that show no seats or fares key on it. Cached values and fragments include the versions of the
+namespaces they depend on in their key, so bumping a version (done by the
+``post_save``/``post_delete`` receivers in ``core.signals``) makes every
+dependent entry unreachable at once without having to know its key. Old
+entries simply age out.
+
+Code paths that bypass model signals (``bulk_create``, ``bulk_update``,
+``QuerySet.update``) must call ``bump()`` themselves.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'cache-version'
+
+DEFAULT_TIMEOUT = 300
+
+
+def _version_key(namespace):
+    return f'{KEY_PREFIX}:{namespace}'
+
+
+def get_version(*namespaces):
+    """Combined version string for ``namespaces``, e.g. ``'17.4'``."""
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock so an evicted counter never reuses an old version
+            cache.add(key, int(time.time() * 1000), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump(*namespaces):
+    """Invalidate everything cached under ``namespaces``."""
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+
+
+def get_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def cached(name, namespaces, build, timeout=None):
+    """Return ``build()`` cached under ``name`` and the current ``namespaces`` versions."""
+    key = f'page:{name}:{get_version(*namespaces)}'
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, get_timeout() if timeout is None else timeout)
+    return value
@@ -0,0 +1,30 @@
+"""
+Cheap validators for conditional GETs (``ETag`` / ``If-None-Match``).
+
+Views wrap their ``get`` with ``django.views.decorators.http.condition`` and
+an ETag function built from data that is much cheaper to read than the page:
+a row's ``updated_at`` (one primary-key lookup) or a ``core.caching`` version
+(one cache read). When the client's ETag matches, the view is never called,
+so nothing is rendered or serialized.
+
+HTML pages include the user in the ETag because ``base.html`` renders the
+navigation for the logged-in user. ``settings.ETAG_VERSION`` is part of every
+tag. Change it on deploys that change templates or response formats.
+"""
+import hashlib
+
+from django.conf import settings
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(repr((getattr(settings, 'ETAG_VERSION', ''),) + parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def page_etag(request, *parts):
+    """ETag for an HTML page: varies by user, and is withheld while flash messages are pending."""
+    messages = getattr(request, '_messages', None)
+    if messages is not None and len(messages):
+        # Messages are only consumed when rendered, a 304 would hold them back
+        return None
+    return make_etag(request.user.pk if request.user.is_authenticated else None, *parts)
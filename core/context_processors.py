@@ -0,0 +1,12 @@
+from django.conf import settings
+
+from . import airport_bundle
+
+
+def airport_bundle_url(request):
+    """``AIRPORT_BUNDLE_URL`` for the autocomplete in main.js (empty if no bundle is built)."""
+    manifest = airport_bundle.get_manifest()
+    if not manifest:
+        return {'AIRPORT_BUNDLE_URL': ''}
+    # Already content-hashed, so it bypasses the static storage's own manifest
+    return {'AIRPORT_BUNDLE_URL': f"{settings.STATIC_URL}data/{manifest['file']}"}
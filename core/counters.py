@@ -0,0 +1,220 @@
+"""
+Materialized site counters.
+
+Totals and per-status counts that the About page and the admin dashboards used
+to compute with ``COUNT(*)`` on every request are kept in ``SiteCounter`` rows
+and read with one small query.
+
+Counters are adjusted by model signals: ``pre_save`` remembers which counters
+the stored row contributed to, ``post_save``/``post_delete`` apply the
+difference with an ``UPDATE ... SET value = value + n``. When the write happens
+inside ``transaction.atomic()`` (as the booking views do) the counter update
+commits or rolls back with it. Paths that skip signals (``bulk_create``,
+``QuerySet.update``) must adjust counters themselves, and
+``manage.py reconcile_counters`` recomputes everything from the source tables.
+
+``customers`` is the number of distinct users with at least one confirmed or
+completed booking.
+"""
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import SiteCounter
+
+BOOKED_STATUSES = ('confirmed', 'completed')
+
+
+def flight_counters(values):
+    return ['flights', f"flights:status:{values['status']}"]
+
+
+def booking_counters(values):
+    return ['bookings', f"bookings:status:{values['status']}"]
+
+
+def user_counters(values):
+    names = ['users']
+    if values['is_active']:
+        names.append('users:active')
+    if values['is_staff']:
+        names.append('users:staff')
+    return names
+
+
+def profile_counters(values):
+    return ['users:verified'] if values['email_verified'] else []
+
+
+# model label -> (fields the counters depend on, function mapping those field values to counter names)
+TRACKED = {
+    'flights.Flight': (['status'], flight_counters),
+    'bookings.Booking': (['status', 'user_id'], booking_counters),
+    'auth.User': (['is_active', 'is_staff'], user_counters),
+    'core.UserProfile': (['email_verified'], profile_counters),
+    'core.Airport': ([], lambda values: ['airports']),
+    'core.Airline': ([], lambda values: ['airlines']),
+}
+
+
+def increment(name, delta=1):
+    if not delta:
+        return
+    if SiteCounter.objects.filter(name=name).update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            SiteCounter.objects.create(name=name, value=delta)
+    except IntegrityError:
+        # Created concurrently
+        SiteCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def apply(old_names, new_names):
+    """Move one row's contribution from ``old_names`` to ``new_names``."""
+    for name in set(old_names) - set(new_names):
+        increment(name, -1)
+    for name in set(new_names) - set(old_names):
+        increment(name, 1)
+
+
+def get(*names):
+    """Return ``{name: value}`` for ``names``; missing counters read as 0."""
+    values = dict(SiteCounter.objects.filter(name__in=names).values_list('name', 'value'))
+    return {name: values.get(name, 0) for name in names}
+
+
+def _values(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def remember(instance):
+    """Record the counters the stored version of ``instance`` contributes to (``pre_save``)."""
+    fields, counters = TRACKED[instance._meta.label]
+    instance._counter_state = None
+    if instance.pk is None or instance._state.adding:
+        return
+    stored = type(instance)._base_manager.filter(pk=instance.pk).values(*fields or ['pk']).first()
+    if stored is not None:
+        instance._counter_state = {'names': counters(stored), 'values': stored}
+
+
+def saved(instance, created):
+    """Apply the counter changes for a saved ``instance`` (``post_save``)."""
+    fields, counters = TRACKED[instance._meta.label]
+    state = None if created else getattr(instance, '_counter_state', None)
+    new_values = _values(instance, fields)
+    apply(state['names'] if state else [], counters(new_values))
+    if instance._meta.label == 'bookings.Booking':
+        _update_customers(instance, state['values'] if state else None, new_values)
+    instance._counter_state = None
+
+
+def deleted(instance):
+    """Remove a deleted ``instance``'s contribution (``post_delete``)."""
+    fields, counters = TRACKED[instance._meta.label]
+    values = _values(instance, fields)
+    apply(counters(values), [])
+    if instance._meta.label == 'bookings.Booking':
+        _update_customers(instance, values, None)
+
+
+def _update_customers(booking, old, new):
+    was_booked = old is not None and old['status'] in BOOKED_STATUSES
+    is_booked = new is not None and new['status'] in BOOKED_STATUSES
+    if was_booked == is_booked:
+        return
+    # Only the user's first booked booking (or the loss of their last one) changes the count
+    others = apps.get_model('bookings.Booking').objects.filter(
+        user_id=booking.user_id, status__in=BOOKED_STATUSES,
+    ).exclude(pk=booking.pk).exists()
+    if not others:
+        increment('customers', 1 if is_booked else -1)
+
+
+def _by_status(model, prefix):
+    values = {prefix: 0}
+    for status, total in model.objects.order_by().values_list('status').annotate(total=Count('pk')):
+        values[f'{prefix}:status:{status}'] = total
+        values[prefix] += total
+    return values
+
+
+def _flight_values(registry):
+    return _by_status(registry.get_model('flights.Flight'), 'flights')
+
+
+def _booking_values(registry):
+    return _by_status(registry.get_model('bookings.Booking'), 'bookings')
+
+
+def _user_values(registry):
+    values = registry.get_model('auth.User').objects.aggregate(
+        users=Count('pk'),
+        **{
+            'users:active': Count('pk', filter=Q(is_active=True)),
+            'users:staff': Count('pk', filter=Q(is_staff=True)),
+        }
+    )
+    values['users:verified'] = registry.get_model('core.UserProfile').objects.filter(email_verified=True).count()
+    return values
+
+
+def _customer_values(registry):
+    return {'customers': registry.get_model('bookings.Booking').objects.filter(
+        status__in=BOOKED_STATUSES
+    ).order_by().values('user_id').distinct().count()}
+
+
+# counter name prefix -> function computing every counter in that group
+GROUPS = {
+    'flights': _flight_values,
+    'bookings': _booking_values,
+    'users': _user_values,
+    'customers': _customer_values,
+    'airports': lambda registry: {'airports': registry.get_model('core.Airport').objects.count()},
+    'airlines': lambda registry: {'airlines': registry.get_model('core.Airline').objects.count()},
+}
+
+
+def compute(registry=apps, groups=None):
+    """
+    Recompute counters from the source tables: every group, or only ``groups``
+    (keys of ``GROUPS``). ``registry`` may be a migration's app registry.
+    """
+    values = {}
+    for group, compute_group in GROUPS.items():
+        if groups is None or group in groups:
+            values.update(compute_group(registry))
+    return values
+
+
+def reconcile(dry_run=False, groups=None):
+    """
+    Overwrite stored counters with recomputed values and return
+    ``{name: (stored, actual)}`` for the ones that had drifted. ``groups``
+    limits this to counters whose name starts with one of the given prefixes
+    (e.g. ``['flights']``).
+    """
+    def wanted(name):
+        return groups is None or name.split(':')[0] in groups
+
+    with transaction.atomic():
+        actual = compute(groups=groups)
+        stored = {
+            name: value
+            for name, value in SiteCounter.objects.select_for_update().values_list('name', 'value')
+            if wanted(name)
+        }
+        # Counters for statuses that no longer have rows drop to 0
+        for name in stored:
+            actual.setdefault(name, 0)
+        drift = {
+            name: (stored.get(name, 0), value)
+            for name, value in actual.items()
+            if stored.get(name) != value
+        }
+        if not dry_run:
+            for name, (_, value) in drift.items():
+                SiteCounter.objects.update_or_create(name=name, defaults={'value': value})
+    return drift
@@ -0,0 +1,141 @@
+"""
+Nearby-airport search with an in-memory spatial grid.
+
+Airports with coordinates are bucketed into cells of ``CELL_DEGREES`` by
+``CELL_DEGREES``. A radius lookup only visits the cells the radius' bounding
+box overlaps, then checks the candidates with the haversine distance. The box
+widens towards the poles and wraps around the antimeridian. With tens of
+thousands of airports a lookup takes well under a millisecond and needs no
+query.
+
+The grid is built once per process and rebuilt when the ``airports`` cache
+version moves (see ``core.signals``), so it always reflects committed airport
+changes.
+"""
+import math
+import threading
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import caching
+from .models import Airport
+
+EARTH_RADIUS_KM = 6371.0088
+
+CELL_DEGREES = 1.0
+
+
+class AirportGrid:
+    """Fixed-size lat/lon cells of ``(id, lat_radians, lon_radians, cos_lat)``"""
+
+    def __init__(self, airports, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.columns = int(math.ceil(360 / cell_degrees))
+        self.cells = {}
+        self.size = 0
+        for pk, latitude, longitude in airports:
+            lat, lon = math.radians(latitude), math.radians(longitude)
+            self.cells.setdefault(self._key(latitude, longitude), []).append((pk, lat, lon, math.cos(lat)))
+            self.size += 1
+
+    def _row(self, latitude):
+        return math.floor(latitude / self.cell_degrees)
+
+    def _column(self, longitude):
+        # Normalized so -180 and 180 land in the same column
+        return math.floor((longitude + 180) / self.cell_degrees) % self.columns
+
+    def _key(self, latitude, longitude):
+        return self._row(latitude), self._column(longitude)
+
+    def _candidate_cells(self, latitude, longitude, radius_km):
+        lat_span = math.degrees(radius_km / EARTH_RADIUS_KM)
+        rows = range(self._row(max(latitude - lat_span, -90)), self._row(min(latitude + lat_span, 90)) + 1)
+        # Longitude degrees shrink towards the poles; size the box for the latitude closest to one
+        widest = min(abs(latitude) + lat_span, 90)
+        cos_widest = math.cos(math.radians(widest))
+        if cos_widest < 1e-6 or radius_km / (EARTH_RADIUS_KM * cos_widest) >= math.pi:
+            columns = range(self.columns)
+        else:
+            lon_span = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_widest))
+            first = math.floor((longitude - lon_span + 180) / self.cell_degrees)
+            last = math.floor((longitude + lon_span + 180) / self.cell_degrees)
+            columns = {column % self.columns for column in range(first, last + 1)}
+        for row in rows:
+            for column in columns:
+                cell = self.cells.get((row, column))
+                if cell:
+                    yield cell
+
+    def within(self, latitude, longitude, radius_km):
+        """``[(airport_id, distance_km)]`` of every airport within ``radius_km``, nearest first."""
+        lat, lon = math.radians(latitude), math.radians(longitude)
+        cos_lat = math.cos(lat)
+        # Compare haversine terms instead of distances: no asin/sqrt per candidate
+        limit = math.sin(min(radius_km / (2 * EARTH_RADIUS_KM), math.pi / 2)) ** 2
+        found = []
+        for cell in self._candidate_cells(latitude, longitude, radius_km):
+            for pk, lat2, lon2, cos_lat2 in cell:
+                a = math.sin((lat2 - lat) / 2) ** 2 + cos_lat * cos_lat2 * math.sin((lon2 - lon) / 2) ** 2
+                if a <= limit:
+                    found.append((pk, 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))))
+        found.sort(key=lambda item: item[1])
+        return found
+
+
+_grid = None
+_grid_lock = threading.Lock()
+
+
+def get_grid():
+    """The process-wide grid, rebuilt when the ``airports`` cache version has moved."""
+    global _grid
+    version = caching.get_version('airports')
+    if _grid is None or _grid[0] != version:
+        with _grid_lock:
+            if _grid is None or _grid[0] != version:
+                airports = Airport.objects.filter(
+                    latitude__isnull=False, longitude__isnull=False,
+                ).values_list('id', 'latitude', 'longitude')
+                _grid = (version, AirportGrid(airports))
+    return _grid[1]
+
+
+def get_radius():
+    return getattr(settings, 'AIRPORT_SEARCH_RADIUS_KM', 0)
+
+
+def parse_radius(value):
+    """A requested radius in km: the default if missing or invalid, capped at ``AIRPORT_SEARCH_MAX_RADIUS_KM``."""
+    try:
+        radius = float(value)
+    except (TypeError, ValueError):
+        return get_radius()
+    if not math.isfinite(radius):
+        return get_radius()
+    return min(max(radius, 0), getattr(settings, 'AIRPORT_SEARCH_MAX_RADIUS_KM', get_radius()))
+
+
+def matching_airports(query):
+    """``[(id, latitude, longitude)]`` of the airports matching ``query`` by code, city or name."""
+    return list(Airport.objects.filter(
+        Q(code__icontains=query) | Q(city__icontains=query) | Q(name__icontains=query)
+    ).values_list('id', 'latitude', 'longitude'))
+
+
+def expand_airports(query, radius_km=None, matches=None):
+    """
+    Ids of the airports matching ``query`` (or the given ``matching_airports``
+    result), plus every airport within ``radius_km`` of one of them.
+    """
+    radius_km = get_radius() if radius_km is None else radius_km
+    if matches is None:
+        matches = matching_airports(query)
+    ids = set()
+    grid = get_grid() if radius_km > 0 else None
+    for pk, latitude, longitude in matches:
+        ids.add(pk)
+        if grid is not None and latitude is not None and longitude is not None:
+            ids.update(nearby for nearby, _ in grid.within(latitude, longitude, radius_km))
+    return ids
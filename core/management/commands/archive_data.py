@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archival
+
+
+class Command(BaseCommand):
+    help = 'Archive rows past their retention window to compressed JSONL and delete them'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--table', action='append', dest='tables',
+            help=f"Only process this table (repeatable): {', '.join(archival.POLICIES)}"
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+        parser.add_argument('--chunk-size', type=int, default=archival.CHUNK_SIZE)
+        parser.add_argument('--max-chunks', type=int, help='Stop each table after this many chunks')
+    
+    def handle(self, *args, **options):
+        tables = options['tables']
+        unknown = set(tables or []) - set(archival.POLICIES)
+        if unknown:
+            raise CommandError(f"Unknown table(s): {', '.join(sorted(unknown))}")
+        
+        if options['dry_run']:
+            for row in archival.report(tables):
+                action = 'archive' if row['archive'] else 'delete'
+                self.stdout.write(
+                    f"{row['table']:<20} {row['eligible']:>10} row(s) to {action} "
+                    f"(cutoff {row['cutoff']:%Y-%m-%d %H:%M}, oldest {row['oldest'] or '-'})"
+                )
+            return
+        
+        started = time.perf_counter()
+        results = archival.run(tables, chunk_size=options['chunk_size'], max_chunks=options['max_chunks'])
+        for table, deleted in results.items():
+            self.stdout.write(f'{table:<20} {deleted:>10} row(s) removed')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
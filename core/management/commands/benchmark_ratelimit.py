@@ -0,0 +1,45 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from core import ratelimit
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the token-bucket rate limiter on the configured cache'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100_000)
+        parser.add_argument('--clients', type=int, default=1000, help='Distinct client IPs to spread requests over')
+    
+    def timed(self, label, iterations, func):
+        started = time.perf_counter()
+        for i in range(iterations):
+            func(i)
+        per_call = (time.perf_counter() - started) / iterations * 1_000_000
+        self.stdout.write(f'{label:<36} {per_call:8.2f} µs/request')
+        return per_call
+    
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        clients = options['clients']
+        ips = [f'10.0.{i // 256}.{i % 256}' for i in range(clients)]
+        limits = {'benchmark': {'RATE': 1_000_000, 'BURST': 1_000_000, 'GLOBAL_RATE': 1_000_000, 'GLOBAL_BURST': 1_000_000}}
+        
+        request = RequestFactory().get('/benchmark/')
+        view = lambda request: None
+        limited_view = ratelimit.ratelimit('benchmark')(view)
+        
+        with override_settings(RATE_LIMITS=limits, RATE_LIMIT_ENABLED=True):
+            baseline = self.timed('undecorated view call', iterations, lambda i: view(request))
+            self.timed('cache get (reference)', iterations, lambda i: cache.get(f'benchmark:{ips[i % clients]}'))
+            self.timed('ratelimit.check', iterations, lambda i: ratelimit.check('benchmark', ips[i % clients]))
+            
+            def limited(i):
+                request.META['REMOTE_ADDR'] = ips[i % clients]
+                limited_view(request)
+            decorated = self.timed('decorated view call', iterations, limited)
+        
+        self.stdout.write(self.style.SUCCESS(f'Limiter overhead: {decorated - baseline:.2f} µs/request'))
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+ENGINES = [
+    ('django.contrib.sessions.backends.db', 'database'),
+    ('django.contrib.sessions.backends.cached_db', 'cached_db'),
+    ('core.sessions', 'core.sessions'),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Count django_session writes per request for each session engine with SESSION_SAVE_EVERY_REQUEST'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per simulated visitor')
+        parser.add_argument('--visitors', type=int, default=10)
+        parser.add_argument('--change-every', type=int, default=20,
+                            help='Modify the session every N requests (0 = never)')
+    
+    def simulate(self, options):
+        factory = RequestFactory()
+        change_every = options['change_every']
+        
+        def view(request):
+            request.session.setdefault('visits', 0)
+            if change_every and request.visit % change_every == 0:
+                request.session['visits'] += 1
+            return HttpResponse()
+        
+        middleware = SessionMiddleware(view)
+        writes = 0
+        with CaptureQueriesContext(connection) as queries:
+            for visitor in range(options['visitors']):
+                session_key = None
+                for visit in range(options['requests']):
+                    request = factory.get('/')
+                    request.user = AnonymousUser()
+                    request.visit = visit
+                    if session_key:
+                        request.COOKIES['sessionid'] = session_key
+                    response = middleware(request)
+                    if 'sessionid' in response.cookies:
+                        session_key = response.cookies['sessionid'].value
+        for query in queries.captured_queries:
+            sql = query['sql'].lstrip().upper()
+            if sql.startswith(('INSERT', 'UPDATE', 'DELETE')) and 'DJANGO_SESSION' in sql:
+                writes += 1
+        return writes
+    
+    def handle(self, *args, **options):
+        total = options['requests'] * options['visitors']
+        for engine, label in ENGINES:
+            try:
+                with transaction.atomic(), override_settings(SESSION_ENGINE=engine, SESSION_SAVE_EVERY_REQUEST=True):
+                    writes = self.simulate(options)
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(f'{label:<16} {writes:8d} session writes  {writes / total:6.3f} per request')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core import airport_bundle
+
+
+class Command(BaseCommand):
+    help = 'Export all airports to the content-hashed JSON bundle used by the autocomplete'
+    
+    def handle(self, *args, **options):
+        manifest = airport_bundle.build()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {manifest['file']} ({manifest['count']} airports) to {airport_bundle.get_directory()}"
+        ))
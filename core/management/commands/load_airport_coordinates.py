@@ -0,0 +1,57 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import caching
+from core.models import Airport
+
+
+class Command(BaseCommand):
+    help = 'Set airport latitude/longitude from a CSV keyed by IATA code (e.g. the OurAirports airports.csv)'
+    
+    # Accepted header names, first match wins
+    CODE_COLUMNS = ['code', 'iata_code', 'iata']
+    LATITUDE_COLUMNS = ['latitude', 'latitude_deg', 'lat']
+    LONGITUDE_COLUMNS = ['longitude', 'longitude_deg', 'lon', 'lng']
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+    
+    def _column(self, header, names):
+        for name in names:
+            if name in header:
+                return name
+        raise CommandError(f"CSV needs one of the columns {', '.join(names)}")
+    
+    def handle(self, *args, **options):
+        airports = {airport.code.upper(): airport for airport in Airport.objects.all()}
+        changed = []
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            reader = csv.DictReader(stream)
+            header = reader.fieldnames or []
+            code_column = self._column(header, self.CODE_COLUMNS)
+            latitude_column = self._column(header, self.LATITUDE_COLUMNS)
+            longitude_column = self._column(header, self.LONGITUDE_COLUMNS)
+            for row in reader:
+                airport = airports.get((row.get(code_column) or '').strip().upper())
+                if airport is None:
+                    continue
+                try:
+                    latitude = float(row[latitude_column])
+                    longitude = float(row[longitude_column])
+                except (TypeError, ValueError):
+                    continue
+                if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                    continue
+                if (airport.latitude, airport.longitude) != (latitude, longitude):
+                    airport.latitude, airport.longitude = latitude, longitude
+                    changed.append(airport)
+        
+        Airport.objects.bulk_update(changed, ['latitude', 'longitude'], batch_size=1000)
+        if changed:
+            # bulk_update sends no post_save; the nearby-airport grid follows this version
+            caching.bump('airports')
+        missing = Airport.objects.filter(latitude__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {len(changed)} airport(s); {missing} still without coordinates'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import popularity
+from core.models import Airport
+
+
+class Command(BaseCommand):
+    help = 'Recompute the popular destinations ranking from recent bookings and searches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--show', type=int, default=10, help='Print this many of the top destinations')
+    
+    def handle(self, *args, **options):
+        rows = popularity.rank()
+        airports = Airport.objects.in_bulk([row.airport_id for row in rows[:options['show']]])
+        for row in rows[:options['show']]:
+            self.stdout.write(
+                f'{row.rank:>3}. {airports[row.airport_id].code:<4} score {row.score:>10.2f} '
+                f'({row.bookings} booked, {row.searches} searches)'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Ranked {len(rows)} destination(s)'))
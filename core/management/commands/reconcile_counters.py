@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized site counters from the source tables and fix any drift'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+        parser.add_argument('--group', action='append', dest='groups', choices=sorted(counters.GROUPS),
+                            help='Only recompute this group of counters (repeatable)')
+    
+    def handle(self, *args, **options):
+        drift = counters.reconcile(dry_run=options['dry_run'], groups=options['groups'])
+        for name, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f'{name:<32} {stored:>10} -> {actual:>10}')
+        
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drift)} drifted counter(s)'))
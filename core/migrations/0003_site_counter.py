@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:29
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+# Frozen copy of core.counters.compute() as of this migration
+BOOKED_STATUSES = ('confirmed', 'completed')
+
+
+def compute(apps):
+    Flight = apps.get_model('flights', 'Flight')
+    Booking = apps.get_model('bookings', 'Booking')
+    User = apps.get_model('auth', 'User')
+    UserProfile = apps.get_model('core', 'UserProfile')
+    Airport = apps.get_model('core', 'Airport')
+    Airline = apps.get_model('core', 'Airline')
+
+    values = {}
+    for prefix, model in (('flights', Flight), ('bookings', Booking)):
+        values[prefix] = 0
+        for status, total in model.objects.order_by().values_list('status').annotate(total=Count('pk')):
+            values[f'{prefix}:status:{status}'] = total
+            values[prefix] += total
+
+    values.update(User.objects.aggregate(
+        users=Count('pk'),
+        **{
+            'users:active': Count('pk', filter=Q(is_active=True)),
+            'users:staff': Count('pk', filter=Q(is_staff=True)),
+        }
+    ))
+    values['users:verified'] = UserProfile.objects.filter(email_verified=True).count()
+    values['customers'] = Booking.objects.filter(
+        status__in=BOOKED_STATUSES
+    ).order_by().values('user_id').distinct().count()
+    values['airports'] = Airport.objects.count()
+    values['airlines'] = Airline.objects.count()
+    return values
+
+
+def populate_counters(apps, schema_editor):
+    SiteCounter = apps.get_model('core', 'SiteCounter')
+    SiteCounter.objects.bulk_create([
+        SiteCounter(name=name, value=value) for name, value in compute(apps).items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_archive_checkpoint'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('bookings', '0002_booking_payment_indexes'),
+        ('flights', '0002_flight_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
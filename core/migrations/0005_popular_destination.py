@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_airport_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularDestination',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(unique=True)),
+                ('score', models.FloatField()),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.airport')),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_popular_destination'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DestinationSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.airport')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='core_destin_day_f44a1e_idx')],
+                'unique_together': {('airport', 'day')},
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from collections import Counter
+
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 
 class Airline(models.Model):
@@ -17,6 +19,8 @@ class Airport(models.Model):
     country = models.CharField(max_length=100)
     code = models.CharField(max_length=3, unique=True)  # IATA code like JFK, LAX
     timezone = models.CharField(max_length=50, default='UTC')
+    latitude = models.FloatField(null=True, blank=True)  # Decimal degrees, used for nearby-airport search
+    longitude = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -43,3 +47,75 @@ class Newsletter(models.Model):
     
     def __str__(self):
         return f"Newsletter: {self.email}"
+
+class ArchiveCheckpoint(models.Model):
+    """Progress of the retention/archival job for one table"""
+    table = models.CharField(max_length=50, unique=True)
+    pending_pks = models.JSONField(default=list, blank=True)  # Chunk written to the archive but not yet deleted
+    rows_archived = models.BigIntegerField(default=0)
+    rows_deleted = models.BigIntegerField(default=0)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Archive checkpoint {self.table}: {self.rows_deleted} rows"
+
+class SiteCounter(models.Model):
+    """Materialized row count (e.g. ``bookings:status:confirmed``) kept current by core.counters"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+class PopularDestination(models.Model):
+    """One row of the destination ranking written by core.popularity"""
+    rank = models.PositiveSmallIntegerField(unique=True)  # 1 = most popular
+    airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    bookings = models.PositiveIntegerField(default=0)  # Passengers booked within the window
+    searches = models.PositiveIntegerField(default=0)  # Searches within the search window
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['rank']
+    
+    def __str__(self):
+        return f"#{self.rank} {self.airport.code} ({self.score:.1f})"
+
+class DestinationSearchManager(models.Manager):
+    
+    def bulk_record(self, objs):
+        """Add the searches of unsaved rows to the stored counts, one UPDATE per airport and day"""
+        totals = Counter()
+        for obj in objs:
+            totals[obj.airport_id, obj.day] += obj.searches
+        with transaction.atomic():
+            for (airport_id, day), searches in totals.items():
+                counts = self.filter(airport_id=airport_id, day=day)
+                if counts.update(searches=models.F('searches') + searches):
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(airport_id=airport_id, day=day, searches=searches)
+                except IntegrityError:
+                    # Created concurrently
+                    counts.update(searches=models.F('searches') + searches)
+        return objs
+
+class DestinationSearch(models.Model):
+    """Searches naming a destination airport on one day, counted by core.popularity"""
+    airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    searches = models.PositiveIntegerField(default=0)
+    
+    objects = DestinationSearchManager()
+    
+    class Meta:
+        unique_together = ['airport', 'day']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.airport_id} on {self.day}: {self.searches}"
@@ -0,0 +1,152 @@
+"""
+Popular destinations, ranked from bookings and searches with time decay.
+
+``rank()`` scores every destination that still has upcoming flights:
+
+    score = sum over days d of
+            (BOOKING_WEIGHT * passengers confirmed on d + SEARCH_WEIGHT * searches on d)
+            * 0.5 ** (age of d in days / HALF_LIFE_DAYS)
+
+Bookings come from confirmed ``Booking`` rows within ``WINDOW_DAYS``,
+aggregated per destination and day in the database. Searches are counted by
+``record_search()``, which only queues the increment in the ``core.audit``
+buffer; each worker's buffer adds its counts to ``DestinationSearch`` (one row
+per airport and day) in the background, so searching never waits on a write
+and the ranking job still sees the searches of every worker.
+
+Every bookable destination is stored in ``PopularDestination`` (the first
+``TOP_N`` when set), scored ones first and the rest by upcoming arrivals.
+Pages read the table through the ``rankings`` cache namespace, so serving the
+ranking costs one cache hit. Run it on a schedule with
+``manage.py rank_destinations``; pages never rank on their own.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from . import audit, caching
+from .models import DestinationSearch, PopularDestination
+
+DEFAULTS = {
+    'TOP_N': None,  # None keeps every bookable destination
+    'WINDOW_DAYS': 90,  # Bookings considered
+    'SEARCH_WINDOW_DAYS': 14,  # Days of search counts kept and read
+    'HALF_LIFE_DAYS': 14,
+    'BOOKING_WEIGHT': 1.0,  # Per passenger
+    'SEARCH_WEIGHT': 0.05,  # Per search
+    'MAX_MATCHES': 5,  # Vaguer queries matching more airports than this are not counted
+}
+
+NAMESPACE = 'rankings'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'POPULAR_DESTINATIONS', {})}
+
+
+def record_search(airport_ids):
+    """Count one search for each destination airport the query matched."""
+    airport_ids = list(airport_ids)
+    if len(airport_ids) > get_config()['MAX_MATCHES']:
+        return
+    today = timezone.localdate()
+    for airport_id in airport_ids:
+        # Merged into one UPDATE per airport and day when the buffer flushes
+        audit.record(DestinationSearch(airport_id=airport_id, day=today, searches=1))
+
+
+def _decay(age_days, half_life):
+    return 0.5 ** (max(age_days, 0) / half_life)
+
+
+def booking_volume(since):
+    """``{(airport_id, day): passengers}`` of confirmed bookings since ``since``."""
+    Booking = apps.get_model('bookings', 'Booking')
+    # Bookings confirmed outside the payment flow may have no confirmed_at
+    rows = Booking.objects.filter(status='confirmed').annotate(
+        confirmed=Coalesce('confirmed_at', 'booked_at'),
+    ).filter(confirmed__gte=since).annotate(day=TruncDate('confirmed')).values(
+        'outbound_flight__destination_id', 'day',
+    ).annotate(passengers=Sum('passengers')).order_by()
+    return {(row['outbound_flight__destination_id'], row['day']): row['passengers'] for row in rows}
+
+
+def search_volume(since):
+    """``{(airport_id, day): searches}`` counted on ``since`` and later."""
+    rows = DestinationSearch.objects.filter(day__gte=since).values_list('airport_id', 'day', 'searches')
+    return {(airport_id, day): searches for airport_id, day, searches in rows}
+
+
+def bookable_destinations(now):
+    """``{airport_id: upcoming arrivals}`` of airports that can still be booked."""
+    Flight = apps.get_model('flights', 'Flight')
+    rows = Flight.objects.filter(departure_time__gte=now, status='scheduled').values(
+        'destination_id',
+    ).annotate(arrivals=Count('id')).order_by()
+    return {row['destination_id']: row['arrivals'] for row in rows}
+
+
+def score(now=None, config=None):
+    """Ranked ``[(airport_id, score, bookings, searches)]`` of every bookable destination."""
+    config = config or get_config()
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    half_life = config['HALF_LIFE_DAYS']
+    arrivals = bookable_destinations(now)
+
+    scores = defaultdict(float)
+    bookings = defaultdict(int)
+    searches = defaultdict(int)
+    for (airport_id, day), passengers in booking_volume(now - timedelta(days=config['WINDOW_DAYS'])).items():
+        if airport_id in arrivals:
+            scores[airport_id] += config['BOOKING_WEIGHT'] * passengers * _decay((today - day).days, half_life)
+            bookings[airport_id] += passengers
+    searched_since = today - timedelta(days=config['SEARCH_WINDOW_DAYS'] - 1)
+    for (airport_id, day), count in search_volume(searched_since).items():
+        if airport_id in arrivals:
+            scores[airport_id] += config['SEARCH_WEIGHT'] * count * _decay((today - day).days, half_life)
+            searches[airport_id] += count
+
+    # Unscored destinations follow, busiest first, so the list is never empty
+    ranked = sorted(arrivals, key=lambda airport_id: (-scores[airport_id], -arrivals[airport_id], airport_id))
+    return [(airport_id, scores[airport_id], bookings[airport_id], searches[airport_id]) for airport_id in ranked]
+
+
+def rank(now=None):
+    """Recompute and store the ranking. Returns the stored rows."""
+    config = get_config()
+    now = now or timezone.now()
+    # Searches this process still holds
+    audit.flush()
+    rows = [
+        PopularDestination(
+            rank=position, airport_id=airport_id, score=round(value, 4),
+            bookings=booked, searches=searched, computed_at=now,
+        )
+        for position, (airport_id, value, booked, searched)
+        in enumerate(score(now, config)[:config['TOP_N']], start=1)
+    ]
+    with transaction.atomic():
+        PopularDestination.objects.all().delete()
+        PopularDestination.objects.bulk_create(rows)
+        # Older counts no longer contribute
+        DestinationSearch.objects.filter(
+            day__lt=timezone.localdate(now) - timedelta(days=config['SEARCH_WINDOW_DAYS'] - 1)
+        ).delete()
+    caching.bump(NAMESPACE)
+    return rows
+
+
+def top_airports(limit=None):
+    """Ranked ``Airport`` list from the stored ranking (empty until it first ran), served from the page cache."""
+    def build():
+        return [entry.airport for entry in PopularDestination.objects.select_related('airport')]
+
+    airports = caching.cached('popular-destinations', (NAMESPACE, 'airports'), build)
+    return airports[:limit] if limit else airports
@@ -0,0 +1,79 @@
+"""
+Token-bucket rate limiting for public endpoints.
+
+Each endpoint (``scope``) has a per-client-IP bucket and, optionally, one
+endpoint-wide bucket shared by all clients. Client IPs come from
+``core.utils.get_client_ip``, which only believes X-Forwarded-For entries
+added by the ``NUM_PROXIES`` trusted proxies, so clients cannot pick their
+own bucket. A bucket holds up to ``BURST``
+tokens and refills at ``RATE`` tokens per second; every request takes one.
+Bucket state is a ``(tokens, timestamp)`` pair in the Django cache, so a check
+is one cache read and one cache write per bucket.
+
+Read-modify-write on the cache is not atomic, so concurrent requests from the
+same client can occasionally both get the last token. That is acceptable for
+shedding scraper load and keeps the limiter to a few microseconds.
+
+Configured through ``settings.RATE_LIMITS``::
+
+    RATE_LIMITS = {
+        'search_airports': {'RATE': 5, 'BURST': 20, 'GLOBAL_RATE': 200, 'GLOBAL_BURST': 400},
+    }
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from .utils import get_client_ip
+
+KEY_PREFIX = 'ratelimit'
+
+
+def _consume(key, rate, burst, now):
+    """Take one token from a bucket. Returns 0 on success, else seconds until a token is available."""
+    tokens, last = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - last) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    # Expire once the bucket would have refilled completely anyway
+    cache.set(key, (tokens - 1, now), timeout=math.ceil(burst / rate) + 1)
+    return 0
+
+
+def check(scope, ip_address):
+    """Return 0 if the request may proceed, else the number of seconds to wait."""
+    if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        return 0
+    config = getattr(settings, 'RATE_LIMITS', {}).get(scope)
+    if not config:
+        return 0
+
+    now = time.time()
+    wait = _consume(f'{KEY_PREFIX}:{scope}:ip:{ip_address}', config['RATE'], config['BURST'], now)
+    if not wait and config.get('GLOBAL_RATE'):
+        wait = _consume(f'{KEY_PREFIX}:{scope}:global', config['GLOBAL_RATE'], config['GLOBAL_BURST'], now)
+    return wait
+
+
+def too_many_requests(wait):
+    response = JsonResponse({'error': 'Too many requests. Please slow down.'}, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def ratelimit(scope):
+    """View decorator; use with ``method_decorator(..., name='dispatch')`` on class-based views."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            # No address at all (e.g. a misconfigured server) shares one bucket rather than none
+            wait = check(scope, get_client_ip(request) or 'unknown')
+            if wait:
+                return too_many_requests(wait)
+            return view_func(request, *args, **kwargs)
+        return wrapped
+    return decorator
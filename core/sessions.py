@@ -0,0 +1,58 @@
+"""
+Cache-first session engine that avoids redundant database writes.
+
+Built on Django's ``cached_db`` engine: reads come from the cache and fall back
+to the database. With ``SESSION_SAVE_EVERY_REQUEST`` every response saves the
+session, which for ``cached_db`` means an UPDATE on ``django_session`` per page
+view. Here an unchanged session only has its cache entry refreshed; the
+database row is written when the data changes, when the session is created,
+or when its stored expiry is within ``SESSION_DB_REFRESH_MARGIN`` seconds, so
+a session that falls out of the cache can still be restored from the DB.
+
+Enable with ``SESSION_ENGINE = 'core.sessions'``.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+logger = logging.getLogger('django.contrib.sessions')
+
+KEY_PREFIX = 'core.sessions'
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    @property
+    def db_expiry_key(self):
+        return f'{self.cache_key}:db-expiry'
+
+    def _db_write_due(self):
+        # Unknown DB expiry (e.g. evicted from the cache) is treated as due
+        db_expires_at = self._cache.get(self.db_expiry_key)
+        if db_expires_at is None:
+            return True
+        margin = getattr(settings, 'SESSION_DB_REFRESH_MARGIN', settings.SESSION_COOKIE_AGE // 2)
+        return db_expires_at - time.time() < margin
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or self.modified or self._db_write_due():
+            super().save(must_create)
+            expiry_age = self.get_expiry_age()
+            self._cache.set(self.db_expiry_key, time.time() + expiry_age, expiry_age)
+            return
+
+        # Unchanged session: slide the cache TTL only
+        try:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        except Exception:
+            logger.exception('Error saving to cache (%s)', self._cache)
+
+    def delete(self, session_key=None):
+        if session_key is None and self.session_key is not None:
+            session_key = self.session_key
+        super().delete(session_key)
+        if session_key is not None:
+            self._cache.delete(f'{self.cache_key_prefix}{session_key}:db-expiry')
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import airport_bundle, caching, counters
+from .models import Airline, Airport
+
+
+@receiver([post_save, post_delete], sender=Airport)
+def airport_changed(sender, **kwargs):
+    caching.bump('airports')
+    # Once per change, after commit, so the bundle never contains rolled-back rows
+    transaction.on_commit(airport_bundle.rebuild_quietly)
+
+
+@receiver([post_save, post_delete], sender=Airline)
+def airline_changed(sender, **kwargs):
+    caching.bump('airlines')
+
+
+@receiver([post_save, post_delete], sender='flights.Flight')
+def flight_changed(sender, update_fields=None, **kwargs):
+    caching.bump('flights')
+    # Seat and fare updates leave the schedule (home and about pages) alone
+    if update_fields is None or not sender.SCHEDULE_FIELDS.isdisjoint(update_fields):
+        caching.bump('schedule')
+
+
+@receiver([post_save, post_delete], sender='flights.Seat')
+def seat_changed(sender, instance, **kwargs):
+    # Seat maps are validated per flight (see flights.views.flight_detail_etag)
+    caching.bump(f'seats:flight:{instance.flight_id}')
+
+
+def counter_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        counters.remember(instance)
+
+
+def counter_post_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.saved(instance, created)
+
+
+def counter_post_delete(sender, instance, **kwargs):
+    counters.deleted(instance)
+
+
+for label in counters.TRACKED:
+    pre_save.connect(counter_pre_save, sender=label, dispatch_uid=f'counters-pre-save-{label}')
+    post_save.connect(counter_post_save, sender=label, dispatch_uid=f'counters-post-save-{label}')
+    post_delete.connect(counter_post_delete, sender=label, dispatch_uid=f'counters-post-delete-{label}')
@@ -0,0 +1,215 @@
+"""
+Static file storage and serving for single-container deployments.
+
+``CompressedManifestStaticFilesStorage`` is Django's manifest storage (content-
+hashed file names) plus a ``collectstatic`` step that writes ``.gz`` and, when
+the optional ``brotli`` package is installed, ``.br`` variants next to every
+compressible file.
+
+``StaticFilesMiddleware`` serves ``STATIC_URL`` from an in-memory index of
+``STATIC_ROOT`` built at startup. It picks the best precompressed variant for
+the request's ``Accept-Encoding``, answers ``If-None-Match`` with 304 (each
+encoding has its own ETag, so a cache never revalidates one encoding's bytes
+with another's validator), and sends
+far-future ``immutable`` cache headers for hashed names. Small files are kept in
+memory after the first request. Files that appear later (e.g. a rebuilt airport
+bundle) are picked up on first request.
+
+The middleware is active when ``settings.STATIC_SERVE`` is true (by default when
+``DEBUG`` is off); in development ``runserver`` keeps serving static files.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.xml', '.map', '.ico', '.eot', '.ttf'}
+
+# Only keep a variant if it saves at least this fraction of the original
+MIN_SAVING = 0.05
+
+MAX_MEMORY_SIZE = 512 * 1024
+
+# name.0123456789ab.ext as written by ManifestStaticFilesStorage
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+SHORT = 'public, max-age=300'
+
+# (Accept-Encoding token, file suffix), in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def compress_file(path):
+    """Write ``path.gz`` (and ``path.br``) when they are meaningfully smaller. Returns the suffixes written."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = []
+    variants = [('.gz', lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda: brotli.compress(data, quality=11)))
+    for suffix, compress in variants:
+        compressed = compress()
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Templates referencing a file that is not shipped get the plain URL instead of a 500
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if content is not None:
+                raise
+            # A CSS url() pointing at a missing file: keep it as written
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for root, _, files in os.walk(self.location):
+            for filename in files:
+                if os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                    compress_file(os.path.join(root, filename))
+
+
+class StaticFile:
+    __slots__ = ('path', 'size', 'content_type', 'etag', 'last_modified', 'cache_control', 'variants', 'content')
+
+    def __init__(self, path, url_path):
+        st = os.stat(path)
+        self.path = path
+        self.size = st.st_size
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.etag = '"%s"' % hashlib.md5(f'{st.st_size}-{st.st_mtime_ns}'.encode()).hexdigest()
+        self.last_modified = http_date(st.st_mtime)
+        self.cache_control = IMMUTABLE if HASHED_NAME.search(url_path) else SHORT
+        self.variants = {}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = (path + suffix, os.stat(path + suffix).st_size)
+        self.content = {}
+
+    def etag_for(self, encoding):
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+
+def accepted_encodings(header):
+    """Content codings from an ``Accept-Encoding`` header, minus any refused with ``q=0``."""
+    accepted = set()
+    for part in header.split(','):
+        token, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'STATIC_SERVE', not settings.DEBUG) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.root = os.path.realpath(settings.STATIC_ROOT)
+        self.files = {}
+        self.scan()
+
+    def scan(self):
+        files = {}
+        for root, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(root, filename)
+                url_path = self.prefix + os.path.relpath(path, self.root).replace(os.sep, '/')
+                files[url_path] = StaticFile(path, url_path)
+        self.files = files
+
+    def find(self, url_path):
+        static_file = self.files.get(url_path)
+        if static_file is not None:
+            return static_file
+        # Not indexed at startup: look on disk once, never outside STATIC_ROOT
+        path = os.path.realpath(os.path.join(self.root, url_path[len(self.prefix):]))
+        if not path.startswith(self.root + os.sep) or path.endswith(('.gz', '.br')):
+            return None
+        try:
+            if not stat.S_ISREG(os.stat(path).st_mode):
+                return None
+        except OSError:
+            return None
+        static_file = self.files[url_path] = StaticFile(path, url_path)
+        return static_file
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            static_file = self.find(request.path_info)
+            if static_file is not None:
+                try:
+                    return self.serve(request, static_file)
+                except FileNotFoundError:
+                    # Pruned from disk after it was indexed: forget it and answer like any missing file
+                    self.files.pop(request.path_info, None)
+        return self.get_response(request)
+
+    def serve(self, request, static_file):
+        encoding = None
+        path, size = static_file.path, static_file.size
+        if static_file.variants:
+            accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            for candidate, _ in ENCODINGS:
+                if candidate in static_file.variants and candidate in accepted:
+                    encoding = candidate
+                    path, size = static_file.variants[candidate]
+                    break
+        etag = static_file.etag_for(encoding)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            if size <= MAX_MEMORY_SIZE:
+                content = static_file.content.get(encoding)
+                if content is None:
+                    with open(path, 'rb') as f:
+                        content = static_file.content[encoding] = f.read()
+                response = HttpResponse(content if request.method == 'GET' else b'', content_type=static_file.content_type)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            response['Content-Length'] = str(size)
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = static_file.last_modified
+        response['ETag'] = etag
+        response['Cache-Control'] = static_file.cache_control
+        if static_file.variants:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        return response
@@ -1,3 +1,503 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.models import LoginAttempt
+from bookings.models import Booking
+from flights import availability
+from flights.models import Aircraft, FareHistory, Flight
+from . import archival, audit, caching, counters, geo, popularity, ratelimit, staticfiles
+from .models import Airline, Airport, ArchiveCheckpoint, DestinationSearch, PopularDestination, SiteCounter
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.airline = Airline.objects.create(name='Test Air', code='TA')
+        cls.aircraft = Aircraft.objects.create(model='A320', airline=cls.airline, capacity=150, economy_seats=150)
+        cls.origin = Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK')
+        cls.destination = Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR')
+
+    def flight(self, number, status='scheduled'):
+        departure = timezone.now() + timedelta(days=10)
+        return Flight.objects.create(
+            flight_number=number, airline=self.airline, aircraft=self.aircraft,
+            origin=self.origin, destination=self.destination, status=status, departure_time=departure,
+            arrival_time=departure + timedelta(hours=7), duration=timedelta(hours=7),
+            economy_price=Decimal('300.00'), available_economy_seats=150,
+        )
+
+    def test_signals_keep_counters_current(self):
+        flight = self.flight('TA1')
+        self.flight('TA2', status='delayed')
+
+        flight.status = 'delayed'
+        flight.save()
+
+        self.assertEqual(counters.get('flights', 'flights:status:scheduled', 'flights:status:delayed'), {
+            'flights': 2, 'flights:status:scheduled': 0, 'flights:status:delayed': 2,
+        })
+        self.assertEqual(counters.get('airports')['airports'], 2)
+
+    def test_compute_only_counts_the_groups_asked_for(self):
+        self.flight('TA1')
+
+        with self.assertNumQueries(1):
+            values = counters.compute(groups=['flights'])
+
+        self.assertEqual(values, {'flights': 1, 'flights:status:scheduled': 1})
+
+    def test_reconcile_repairs_drift_in_the_given_groups(self):
+        self.flight('TA1')
+        SiteCounter.objects.filter(name='flights').update(value=7)
+        SiteCounter.objects.filter(name='airports').update(value=9)
+
+        drift = counters.reconcile(groups=['flights'])
+
+        self.assertEqual(drift, {'flights': (7, 1)})
+        self.assertEqual(counters.get('flights', 'airports'), {'flights': 1, 'airports': 9})
+
+
+class PageCacheNamespaceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=150, economy_seats=150)
+        departure = timezone.now() + timedelta(days=10)
+        cls.flight = Flight.objects.create(
+            flight_number='TA1', airline=airline, aircraft=aircraft,
+            origin=Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK'),
+            destination=Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR'),
+            departure_time=departure, arrival_time=departure + timedelta(hours=7), duration=timedelta(hours=7),
+            economy_price=Decimal('300.00'), available_economy_seats=150,
+        )
+
+    def test_seat_and_fare_changes_keep_the_schedule_version(self):
+        version = caching.get_version('schedule')
+
+        availability.reserve(self.flight.pk, 'economy', 2)
+        self.flight.refresh_from_db()
+        self.flight.economy_price = Decimal('320.00')
+        self.flight.save(update_fields=['economy_price', 'updated_at'])
+
+        self.assertEqual(caching.get_version('schedule'), version)
+
+    def test_reschedule_bumps_the_schedule_version(self):
+        version = caching.get_version('schedule')
+
+        self.flight.departure_time += timedelta(hours=1)
+        self.flight.save()
+
+        self.assertNotEqual(caching.get_version('schedule'), version)
+
+
+@override_settings(AUDIT_BUFFER={'ENABLED': False})
+class PopularityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('traveller', 'traveller@example.com', 'secret')
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        cls.aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=150, economy_seats=150)
+        cls.origin = Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK')
+        cls.london = Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR')
+        cls.paris = Airport.objects.create(name='Charles de Gaulle', city='Paris', country='FR', code='CDG')
+        cls.rome = Airport.objects.create(name='Fiumicino', city='Rome', country='IT', code='FCO')
+        cls.closed = Airport.objects.create(name='Tegel', city='Berlin', country='DE', code='TXL')
+
+    def setUp(self):
+        cache.clear()
+
+    def flight(self, destination, days=10, number='TA1'):
+        departure = timezone.now() + timedelta(days=days)
+        return Flight.objects.create(
+            flight_number=number, airline=self.aircraft.airline, aircraft=self.aircraft,
+            origin=self.origin, destination=destination, departure_time=departure,
+            arrival_time=departure + timedelta(hours=7), duration=timedelta(hours=7),
+            economy_price=Decimal('300.00'), available_economy_seats=150,
+        )
+
+    def book(self, flight, passengers, days_ago=0):
+        return Booking.objects.create(
+            user=self.user, outbound_flight=flight, passengers=passengers, status='confirmed',
+            confirmed_at=timezone.now() - timedelta(days=days_ago), total_amount=Decimal('300.00'),
+            contact_email=self.user.email, contact_phone='0',
+        )
+
+    def test_searches_are_buffered_and_merged(self):
+        writer = audit.BufferedWriter(max_events=100, flush_size=100, flush_interval=3600, overflow='drop')
+        with override_settings(AUDIT_BUFFER={'ENABLED': True}), \
+                mock.patch('core.audit.get_writer', return_value=writer):
+            popularity.record_search([self.london.pk])
+            popularity.record_search([self.london.pk, self.paris.pk])
+
+            self.assertFalse(DestinationSearch.objects.exists())
+            writer.flush()
+
+        counts = dict(DestinationSearch.objects.values_list('airport__code', 'searches'))
+        self.assertEqual(counts, {'LHR': 2, 'CDG': 1})
+
+    def test_vague_searches_are_not_counted(self):
+        popularity.record_search([airport.pk for airport in Airport.objects.all()] * 2)
+
+        self.assertFalse(DestinationSearch.objects.exists())
+
+    def test_rank_orders_by_decayed_bookings_and_searches(self):
+        london = self.flight(self.london)
+        paris = self.flight(self.paris, number='TA2')
+        self.flight(self.rome, number='TA3')
+        self.book(london, 2, days_ago=60)  # Four half-lives old: worth 2 / 16
+        self.book(paris, 1)
+        for _ in range(5):
+            popularity.record_search([self.rome.pk])
+
+        rows = popularity.rank()
+
+        self.assertEqual([row.airport_id for row in rows], [self.paris.pk, self.rome.pk, self.london.pk])
+        self.assertEqual((rows[0].bookings, rows[1].searches), (1, 5))
+
+    def test_rank_skips_destinations_without_upcoming_flights(self):
+        self.book(self.flight(self.closed, days=-3), 4)
+        self.flight(self.london)
+
+        rows = popularity.rank()
+
+        self.assertEqual([row.airport_id for row in rows], [self.london.pk])
+
+    def test_rank_drops_old_search_counts(self):
+        self.flight(self.london)
+        old = timezone.localdate() - timedelta(days=popularity.get_config()['SEARCH_WINDOW_DAYS'])
+        DestinationSearch.objects.create(airport=self.london, day=old, searches=100)
+
+        rows = popularity.rank()
+
+        self.assertEqual(rows[0].searches, 0)
+        self.assertFalse(DestinationSearch.objects.exists())
+
+    def test_pages_read_the_stored_ranking(self):
+        self.flight(self.london)
+        self.assertEqual(popularity.top_airports(), [])
+
+        popularity.rank()
+
+        self.assertEqual(popularity.top_airports(), [self.london])
+        self.assertEqual(PopularDestination.objects.count(), 1)
+        response = self.client.get(reverse('core:destinations'))
+        self.assertEqual(response.context['destinations_by_country'], {'UK': [self.london]})
+
+
+class StaticFilesMiddlewareTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(self.root, 'js'))
+        self.path = os.path.join(self.root, 'js', 'app.0123456789ab.js')
+        with open(self.path, 'w') as f:
+            f.write('console.log("hello");\n' * 200)
+        staticfiles.compress_file(self.path)
+        with override_settings(STATIC_SERVE=True, STATIC_ROOT=self.root, STATIC_URL='/static/'):
+            self.middleware = staticfiles.StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+
+    def get(self, encoding='', **headers):
+        request = RequestFactory().get('/static/js/app.0123456789ab.js', HTTP_ACCEPT_ENCODING=encoding, **headers)
+        return self.middleware(request)
+
+    def test_serves_the_precompressed_variant(self):
+        response = self.get('gzip, deflate')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], staticfiles.IMMUTABLE)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_each_encoding_has_its_own_etag(self):
+        gzipped = self.get('gzip')['ETag']
+        identity = self.get()['ETag']
+
+        self.assertNotEqual(gzipped, identity)
+        self.assertEqual(self.get('gzip', HTTP_IF_NONE_MATCH=gzipped).status_code, 304)
+        # The gzip validator must not revalidate the identity bytes
+        response = self.get('', HTTP_IF_NONE_MATCH=gzipped)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_file_pruned_after_indexing_is_a_404(self):
+        os.remove(self.path)
+        os.remove(self.path + '.gz')
+
+        self.assertEqual(self.get('gzip').status_code, 404)
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={
+    'test': {'RATE': 2, 'BURST': 3, 'GLOBAL_RATE': 10, 'GLOBAL_BURST': 5},
+})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def check(self, seconds, ip='10.0.0.1'):
+        with mock.patch('core.ratelimit.time.time', return_value=1_000_000 + seconds):
+            return ratelimit.check('test', ip)
+
+    def test_burst_then_wait_for_the_next_token(self):
+        self.assertEqual([self.check(0) for _ in range(3)], [0, 0, 0])
+
+        self.assertAlmostEqual(self.check(0), 0.5)
+        self.assertAlmostEqual(self.check(0.25), 0.25)
+        self.assertEqual(self.check(0.5), 0)
+        self.assertGreater(self.check(0.5), 0)
+
+    def test_bucket_refills_up_to_the_burst_only(self):
+        for _ in range(3):
+            self.check(0)
+
+        self.assertEqual([self.check(100) for _ in range(3)], [0, 0, 0])
+        self.assertGreater(self.check(100), 0)
+
+    def test_clients_have_their_own_buckets_under_a_global_one(self):
+        for _ in range(3):
+            self.check(0, ip='10.0.0.1')
+
+        self.assertGreater(self.check(0, ip='10.0.0.1'), 0)
+        self.assertEqual(self.check(0, ip='10.0.0.2'), 0)
+        self.assertEqual(self.check(0, ip='10.0.0.3'), 0)
+        # Five requests got through: the endpoint-wide bucket is empty for everyone
+        self.assertGreater(self.check(0, ip='10.0.0.4'), 0)
+
+    def test_unknown_scope_and_disabled_limiter_never_wait(self):
+        self.assertEqual(ratelimit.check('unknown', '10.0.0.1'), 0)
+        with override_settings(RATE_LIMIT_ENABLED=False):
+            self.assertEqual([self.check(0) for _ in range(10)], [0] * 10)
+
+    def test_view_answers_429_with_retry_after(self):
+        view = ratelimit.ratelimit('test')(lambda request: HttpResponse('ok'))
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+        with mock.patch('core.ratelimit.time.time', return_value=1_000_000):
+            responses = [view(request) for _ in range(4)]
+
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200, 429])
+        self.assertEqual(responses[-1]['Retry-After'], '1')
+
+
+class ArchivalTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(ARCHIVE_ROOT=self.root, ARCHIVE_RETENTION_DAYS={})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def attempts(self, days_ago, count):
+        return LoginAttempt.objects.bulk_create([
+            LoginAttempt(ip_address='10.0.0.1', attempted_at=timezone.now() - timedelta(days=days_ago))
+            for _ in range(count)
+        ])
+
+    def archived(self, table):
+        directory = os.path.join(self.root, table)
+        rows = []
+        for filename in sorted(os.listdir(directory)):
+            with gzip.open(os.path.join(directory, filename), 'rt') as archive:
+                rows += [json.loads(line) for line in archive]
+        return rows
+
+    def test_old_rows_are_archived_then_deleted(self):
+        old = self.attempts(100, 5)
+        recent = self.attempts(10, 2)
+
+        deleted = archival.run(['login_attempts'], chunk_size=2)
+
+        self.assertEqual(deleted, {'login_attempts': 5})
+        self.assertEqual(sorted(row['id'] for row in self.archived('login_attempts')), sorted(a.pk for a in old))
+        self.assertEqual(set(LoginAttempt.objects.values_list('pk', flat=True)), {a.pk for a in recent})
+        checkpoint = ArchiveCheckpoint.objects.get(table='login_attempts')
+        self.assertEqual((checkpoint.rows_archived, checkpoint.rows_deleted, checkpoint.pending_pks), (5, 5, []))
+
+    def test_interrupted_chunk_is_deleted_without_writing_it_again(self):
+        old = self.attempts(100, 3)
+        ArchiveCheckpoint.objects.create(table='login_attempts', pending_pks=[old[0].pk])
+
+        archival.run(['login_attempts'])
+
+        self.assertFalse(LoginAttempt.objects.exists())
+        self.assertEqual(sorted(row['id'] for row in self.archived('login_attempts')), [old[1].pk, old[2].pk])
+
+    def test_max_chunks_stops_early(self):
+        self.attempts(100, 5)
+
+        deleted = archival.run(['login_attempts'], chunk_size=2, max_chunks=1)
+
+        self.assertEqual(deleted, {'login_attempts': 2})
+        self.assertEqual(LoginAttempt.objects.count(), 3)
+
+    def test_report_does_not_delete(self):
+        self.attempts(100, 2)
+
+        row, = archival.report(['login_attempts'])
+
+        self.assertEqual(row['eligible'], 2)
+        self.assertEqual(LoginAttempt.objects.count(), 2)
+
+    def test_retention_override(self):
+        self.attempts(30, 2)
+
+        with override_settings(ARCHIVE_RETENTION_DAYS={'login_attempts': 7}):
+            deleted = archival.run(['login_attempts'])
+
+        self.assertEqual(deleted, {'login_attempts': 2})
+
+    def test_fare_history_is_archived_before_its_flight(self):
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=150, economy_seats=150)
+        departure = timezone.now() - timedelta(days=200)
+        flight = Flight.objects.create(
+            flight_number='TA1', airline=airline, aircraft=aircraft, status='landed',
+            origin=Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK'),
+            destination=Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR'),
+            departure_time=departure, arrival_time=departure + timedelta(hours=7), duration=timedelta(hours=7),
+            economy_price=Decimal('300.00'), available_economy_seats=150,
+        )
+        FareHistory.objects.create(
+            flight=flight, seat_class='economy', old_price=Decimal('300.00'), new_price=Decimal('320.00'),
+            load_factor=0.5, days_to_departure=10, changed_at=departure - timedelta(days=10),
+        )
+
+        deleted = archival.run(['fare_history', 'flights'])
+
+        self.assertEqual(deleted, {'fare_history': 1, 'flights': 1})
+        self.assertEqual(self.archived('fare_history')[0]['flight_id'], flight.pk)
+        self.assertEqual(self.archived('flights')[0]['id'], flight.pk)
+
+
+@override_settings(AIRPORT_SEARCH_RADIUS_KM=80, AIRPORT_SEARCH_MAX_RADIUS_KM=300)
+class GeoTests(TestCase):
+    def test_parse_radius_bounds(self):
+        cases = {
+            None: 80, '': 80, 'abc': 80, 'nan': 80, 'inf': 80, '-inf': 80,
+            '-5': 0, '0': 0, '50': 50, '12.5': 12.5, '300': 300, '301': 300, '1e9': 300,
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(geo.parse_radius(value), expected)
+
+    def test_grid_finds_airports_within_the_radius_nearest_first(self):
+        grid = geo.AirportGrid([
+            (1, 51.4700, -0.4543),  # Heathrow
+            (2, 51.1537, -0.1821),  # Gatwick, about 40 km away
+            (3, 49.0097, 2.5479),  # Charles de Gaulle, about 350 km away
+        ])
+
+        found = grid.within(51.4700, -0.4543, 80)
+
+        self.assertEqual([pk for pk, _ in found], [1, 2])
+        self.assertAlmostEqual(found[1][1], 40, delta=1)
+
+    def test_grid_wraps_around_the_antimeridian(self):
+        grid = geo.AirportGrid([(1, 0.0, 179.9), (2, 0.0, -179.9), (3, 0.0, 170.0)])
+
+        self.assertEqual({pk for pk, _ in grid.within(0.0, 179.95, 50)}, {1, 2})
+
+    def test_grid_near_a_pole_checks_every_longitude(self):
+        grid = geo.AirportGrid([(1, 89.9, 0.0), (2, 89.9, 180.0)])
+
+        self.assertEqual({pk for pk, _ in grid.within(89.95, 90.0, 50)}, {1, 2})
+
+    def test_expand_airports_adds_nearby_ones(self):
+        cache.clear()
+        heathrow = Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR',
+                                          latitude=51.4700, longitude=-0.4543)
+        gatwick = Airport.objects.create(name='Gatwick', city='Crawley', country='UK', code='LGW',
+                                         latitude=51.1537, longitude=-0.1821)
+        Airport.objects.create(name='Charles de Gaulle', city='Paris', country='FR', code='CDG',
+                               latitude=49.0097, longitude=2.5479)
+
+        self.assertEqual(geo.expand_airports('LHR', 80), {heathrow.pk, gatwick.pk})
+        self.assertEqual(geo.expand_airports('LHR', 0), {heathrow.pk})
+
+
+@mock.patch.object(audit.BufferedWriter, '_ensure_thread')
+class AuditBufferTests(TestCase):
+    def writer(self, max_events=10, overflow='drop'):
+        return audit.BufferedWriter(max_events=max_events, flush_size=500, flush_interval=3600, overflow=overflow)
+
+    def attempt(self, ip='10.0.0.1'):
+        return LoginAttempt(ip_address=ip)
+
+    def test_rows_are_written_in_bulk_on_flush(self, ensure_thread):
+        writer = self.writer()
+        for ip in range(3):
+            writer.record(self.attempt(f'10.0.0.{ip}'))
+        self.assertFalse(LoginAttempt.objects.exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(writer.flush(), 3)
+
+        self.assertEqual(LoginAttempt.objects.count(), 3)
+        self.assertEqual((len(writer), writer.flush()), (0, 0))
+        ensure_thread.assert_called()
+
+    def test_full_queue_drops_new_events(self, ensure_thread):
+        writer = self.writer(max_events=2)
+
+        self.assertEqual([writer.record(self.attempt()) for _ in range(3)], [True, True, False])
+        self.assertEqual((len(writer), writer.dropped), (2, 1))
+
+    def test_full_queue_can_flush_synchronously(self, ensure_thread):
+        writer = self.writer(max_events=2, overflow='flush')
+
+        self.assertEqual([writer.record(self.attempt()) for _ in range(3)], [True, True, True])
+        self.assertEqual((LoginAttempt.objects.count(), len(writer), writer.dropped), (2, 1, 0))
+
+    def test_failed_batch_is_dropped_not_requeued(self, ensure_thread):
+        writer = self.writer()
+        writer.record(self.attempt())
+        writer.record(DestinationSearch(airport=Airport.objects.create(name='Heathrow', code='LHR'),
+                                        day=timezone.localdate()))
+
+        with mock.patch('core.audit._write', side_effect=[RuntimeError('boom'), None]), \
+                self.assertLogs('core.audit', 'ERROR'):
+            self.assertEqual(writer.flush(), 1)
+
+        self.assertEqual((len(writer), writer.dropped), (0, 1))
+
+    @override_settings(AUDIT_BUFFER={'ENABLED': False})
+    def test_disabled_buffer_saves_immediately(self, ensure_thread):
+        self.assertTrue(audit.record(self.attempt()))
+
+        self.assertEqual(LoginAttempt.objects.count(), 1)
+        ensure_thread.assert_not_called()
+
+
+class SearchAirportsConditionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR')
+
+    def search(self, query, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('core:search_airports'), {'q': query}, **headers)
+
+    def test_results_revalidate_until_an_airport_changes(self):
+        response = self.search('lon')
+        self.assertEqual(response.json()['airports'][0]['code'], 'LHR')
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search(' LON ', etag).status_code, 304)
+        self.assertEqual(self.search('hea', etag).status_code, 200)
+
+        Airport.objects.create(name='Gatwick', city='London', country='UK', code='LGW')
+        response = self.search('lon', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['airports']), 2)
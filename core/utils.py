@@ -0,0 +1,31 @@
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+
+
+def get_client_ip(request):
+    """
+    Client IP as seen by the outermost trusted proxy.
+
+    With ``settings.NUM_PROXIES`` reverse proxies in front of the app, each
+    appends the address it received from to X-Forwarded-For, so the client is
+    the ``NUM_PROXIES``-th entry from the right. Entries further left are
+    whatever the client sent and are ignored. Without proxies, REMOTE_ADDR.
+    """
+    num_proxies = getattr(settings, 'NUM_PROXIES', 0)
+    if num_proxies > 0:
+        hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+        if len(hops) >= num_proxies:
+            return hops[-num_proxies]
+    return request.META.get('REMOTE_ADDR')
+
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    """ZoneInfo for an ``Airport.timezone`` value, falling back to UTC for unknown names."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return dt_timezone.utc
@@ -4,52 +4,68 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.utils import timezone
+from . import caching, counters, popularity
+from .conditional import make_etag
 from .models import Newsletter, Airport, Airline
+from .ratelimit import ratelimit
 from flights.models import Flight
 from django.db.models import Q
 from datetime import datetime, timedelta
 
 class HomeView(TemplateView):
     template_name = 'core/home.html'
+    cache_namespaces = ('airports', 'airlines', 'schedule', popularity.NAMESPACE)
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def build_context(self):
+        now = timezone.now()
         
-        # Get popular destinations (top 6 airports by flight count)
-        popular_destinations = Airport.objects.filter(
-            arriving_flights__departure_time__gte=datetime.now()
-        ).distinct()[:6]
+        # Top 6 of the precomputed ranking (see core/popularity.py)
+        popular_destinations = popularity.top_airports(6)
         
         # Get featured airlines
         featured_airlines = Airline.objects.all()[:4]
         
         # Get upcoming flights for showcase
         upcoming_flights = Flight.objects.filter(
-            departure_time__gte=datetime.now(),
+            departure_time__gte=now,
             status='scheduled'
         ).select_related('airline', 'origin', 'destination')[:3]
         
-        context.update({
-            'popular_destinations': popular_destinations,
-            'featured_airlines': featured_airlines,
-            'upcoming_flights': upcoming_flights,
-        })
-        
+        return {
+            'popular_destinations': list(popular_destinations),
+            'featured_airlines': list(featured_airlines),
+            'upcoming_flights': list(upcoming_flights),
+        }
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(caching.cached('home', self.cache_namespaces, self.build_context))
+        # Fragment cache keys in the template vary on this
+        context['cache_version'] = caching.get_version(*self.cache_namespaces)
+        context['cache_timeout'] = caching.get_timeout()
         return context
 
 class AboutView(TemplateView):
     template_name = 'core/about.html'
+    cache_namespaces = ('airports', 'airlines', 'schedule')
+    
+    def build_context(self):
+        totals = counters.get('flights', 'airports', 'airlines', 'customers')
+        return {
+            'total_flights': totals['flights'],
+            'total_destinations': totals['airports'],
+            'partner_airlines': totals['airlines'],
+            'happy_customers': totals['customers'],
+        }
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         # Add statistics
-        context.update({
-            'total_flights': Flight.objects.count(),
-            'total_destinations': Airport.objects.count(),
-            'partner_airlines': Airline.objects.count(),
-            'happy_customers': 50000,  # This could be calculated from bookings
-        })
+        context.update(caching.cached('about', self.cache_namespaces, self.build_context))
         
         return context
 
@@ -73,14 +89,11 @@ class ContactView(TemplateView):
 
 class DestinationsView(TemplateView):
     template_name = 'core/destinations.html'
+    cache_namespaces = ('airports', popularity.NAMESPACE)
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        
-        # Get all destinations with flights
-        destinations = Airport.objects.filter(
-            arriving_flights__departure_time__gte=datetime.now()
-        ).distinct().order_by('city')
+    def build_destinations(self):
+        # Bookable destinations from the precomputed ranking (see core/popularity.py), most popular first
+        destinations = popularity.top_airports()
         
         # Group by country
         destinations_by_country = {}
@@ -90,10 +103,16 @@ class DestinationsView(TemplateView):
                 destinations_by_country[country] = []
             destinations_by_country[country].append(destination)
         
-        context['destinations_by_country'] = destinations_by_country
-        
+        return destinations_by_country
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['destinations_by_country'] = caching.cached(
+            'destinations', self.cache_namespaces, self.build_destinations
+        )
         return context
 
+@method_decorator(ratelimit('newsletter'), name='dispatch')
 class NewsletterSubscribeView(View):
     
     @method_decorator(csrf_exempt)
@@ -125,6 +144,12 @@ class NewsletterSubscribeView(View):
                 'message': 'An error occurred. Please try again.'
             })
 
+def search_airports_etag(request, *args, **kwargs):
+    return make_etag(request.GET.get('q', '').strip().lower(), caching.get_version('airports'))
+
+@method_decorator(ratelimit('search_airports'), name='dispatch')
+@method_decorator(cache_control(private=True, no_cache=True), name='get')
+@method_decorator(condition(etag_func=search_airports_etag), name='get')
 class SearchAirportsView(View):
     """AJAX view for airport search suggestions"""
     
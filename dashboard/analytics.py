@@ -0,0 +1,94 @@
+"""
+Per-airline and per-route performance figures for the admin analytics page.
+
+Bookings and seat capacity are aggregated in two separate grouped queries and
+merged in Python. Joining flights to both aircraft and bookings in a single
+annotate multiplies rows (one per booking per flight) and double counts the
+capacity side, so the two sides are never mixed in one query.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+from bookings.models import Booking
+from core.models import Airline, Airport
+from flights.models import Flight
+
+# Bookings that hold seats and count towards revenue
+BOOKED_STATUSES = ['confirmed', 'completed']
+
+
+def _collect(key_fields, since=None):
+    """Return ``{key: stats}`` keyed on the given ``Flight`` fields."""
+    flights = Flight.objects.exclude(status='cancelled')
+    bookings = Booking.objects.filter(status__in=BOOKED_STATUSES).exclude(outbound_flight__status='cancelled')
+    if since is not None:
+        flights = flights.filter(departure_time__gte=since)
+        bookings = bookings.filter(outbound_flight__departure_time__gte=since)
+
+    capacity_rows = flights.values(*key_fields).annotate(
+        flights=Count('id'),
+        seats=Sum('aircraft__capacity'),
+    ).order_by()
+
+    booking_keys = [f'outbound_flight__{field}' for field in key_fields]
+    booking_rows = bookings.values(*booking_keys).annotate(
+        bookings=Count('id'),
+        passengers=Sum('passengers'),
+        revenue=Sum('total_amount'),
+    ).order_by()
+
+    stats = {}
+    for row in capacity_rows:
+        key = tuple(row[field] for field in key_fields)
+        stats[key] = {
+            'flights': row['flights'],
+            'seats': row['seats'] or 0,
+            'bookings': 0,
+            'passengers': 0,
+            'revenue': Decimal('0.00'),
+        }
+    for row in booking_rows:
+        key = tuple(row[field] for field in booking_keys)
+        entry = stats.setdefault(key, {
+            'flights': 0, 'seats': 0, 'bookings': 0, 'passengers': 0, 'revenue': Decimal('0.00'),
+        })
+        entry['bookings'] = row['bookings']
+        entry['passengers'] = row['passengers'] or 0
+        entry['revenue'] = row['revenue'] or Decimal('0.00')
+
+    for entry in stats.values():
+        entry['load_factor'] = entry['passengers'] / entry['seats'] if entry['seats'] else 0.0
+        entry['average_fare'] = (
+            (entry['revenue'] / entry['passengers']).quantize(Decimal('0.01'))
+            if entry['passengers'] else Decimal('0.00')
+        )
+    return stats
+
+
+def _ranked(rows, limit):
+    rows.sort(key=lambda row: (row['bookings'], row['revenue']), reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def airline_performance(limit=None, since=None):
+    """Flights, seats, bookings, passengers, revenue, load factor and average fare per airline."""
+    stats = _collect(['airline'], since=since)
+    airlines = Airline.objects.in_bulk([key[0] for key in stats])
+    rows = [
+        dict(entry, airline=airlines[key[0]])
+        for key, entry in stats.items()
+    ]
+    return _ranked(rows, limit)
+
+
+def route_performance(limit=None, since=None):
+    """Same figures as ``airline_performance`` per origin/destination pair."""
+    stats = _collect(['origin', 'destination'], since=since)
+    airport_ids = {airport_id for key in stats for airport_id in key}
+    airports = Airport.objects.in_bulk(airport_ids)
+    rows = [
+        dict(entry, origin=airports[key[0]], destination=airports[key[1]])
+        for key, entry in stats.items()
+    ]
+    return _ranked(rows, limit)
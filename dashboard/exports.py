@@ -0,0 +1,142 @@
+"""
+Streaming CSV exports for bookings, payments and flights.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and written one
+line at a time, so memory use stays flat regardless of the number of rows.
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from bookings.models import Booking, Payment
+from flights.models import Flight
+
+CHUNK_SIZE = 2000
+
+# kind -> model, date field used for the range filter, status field and (header, lookup) columns
+EXPORTS = {
+    'bookings': {
+        'model': Booking,
+        'date_field': 'booked_at',
+        'status_field': 'status',
+        'ordering': ['pk', 'passenger_details__pk'],
+        'columns': [
+            ('booking_reference', 'booking_reference'),
+            ('status', 'status'),
+            ('trip_type', 'trip_type'),
+            ('booked_at', 'booked_at'),
+            ('confirmed_at', 'confirmed_at'),
+            ('cancelled_at', 'cancelled_at'),
+            ('username', 'user__username'),
+            ('contact_email', 'contact_email'),
+            ('contact_phone', 'contact_phone'),
+            ('flight_number', 'outbound_flight__flight_number'),
+            ('departure_time', 'outbound_flight__departure_time'),
+            ('origin', 'outbound_flight__origin__code'),
+            ('destination', 'outbound_flight__destination__code'),
+            ('passengers', 'passengers'),
+            ('total_amount', 'total_amount'),
+            ('taxes', 'taxes'),
+            ('service_fee', 'service_fee'),
+            ('payment_id', 'payment__payment_id'),
+            ('payment_status', 'payment__status'),
+            ('payment_method', 'payment__payment_method'),
+            ('payment_amount', 'payment__amount'),
+            ('passenger_title', 'passenger_details__title'),
+            ('passenger_first_name', 'passenger_details__first_name'),
+            ('passenger_last_name', 'passenger_details__last_name'),
+            ('passenger_date_of_birth', 'passenger_details__date_of_birth'),
+            ('passenger_nationality', 'passenger_details__nationality'),
+        ],
+    },
+    'payments': {
+        'model': Payment,
+        'date_field': 'created_at',
+        'status_field': 'status',
+        'ordering': ['pk'],
+        'columns': [
+            ('payment_id', 'payment_id'),
+            ('booking_reference', 'booking__booking_reference'),
+            ('amount', 'amount'),
+            ('payment_method', 'payment_method'),
+            ('status', 'status'),
+            ('transaction_id', 'transaction_id'),
+            ('created_at', 'created_at'),
+            ('processed_at', 'processed_at'),
+        ],
+    },
+    'flights': {
+        'model': Flight,
+        'date_field': 'departure_time',
+        'status_field': 'status',
+        'ordering': ['departure_time', 'pk'],
+        'columns': [
+            ('flight_number', 'flight_number'),
+            ('airline', 'airline__code'),
+            ('aircraft', 'aircraft__model'),
+            ('origin', 'origin__code'),
+            ('destination', 'destination__code'),
+            ('departure_time', 'departure_time'),
+            ('arrival_time', 'arrival_time'),
+            ('status', 'status'),
+            ('gate', 'gate'),
+            ('terminal', 'terminal'),
+            ('economy_price', 'economy_price'),
+            ('business_price', 'business_price'),
+            ('first_class_price', 'first_class_price'),
+            ('available_economy_seats', 'available_economy_seats'),
+            ('available_business_seats', 'available_business_seats'),
+            ('available_first_class_seats', 'available_first_class_seats'),
+        ],
+    },
+}
+
+
+class Echo:
+    """Pseudo-buffer for ``csv.writer`` that hands each line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def parse_date(value):
+    """Parse a ``YYYY-MM-DD`` string; empty values mean "no bound"."""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def export_queryset(kind, date_from=None, date_to=None, status=None):
+    """Build the ``values_list`` queryset for an export. ``date_to`` is inclusive."""
+    spec = EXPORTS[kind]
+    queryset = spec['model'].objects.all()
+    date_field = spec['date_field']
+
+    if date_from:
+        queryset = queryset.filter(**{
+            f'{date_field}__gte': timezone.make_aware(datetime.combine(date_from, time.min))
+        })
+    if date_to:
+        queryset = queryset.filter(**{
+            f'{date_field}__lt': timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+        })
+    if status:
+        queryset = queryset.filter(**{spec['status_field']: status})
+
+    lookups = [lookup for _, lookup in spec['columns']]
+    return queryset.order_by(*spec['ordering']).values_list(*lookups)
+
+
+def export_rows(kind, date_from=None, date_to=None, status=None, chunk_size=CHUNK_SIZE):
+    """Yield the header row followed by every data row."""
+    yield [header for header, _ in EXPORTS[kind]['columns']]
+    queryset = export_queryset(kind, date_from, date_to, status)
+    yield from queryset.iterator(chunk_size=chunk_size)
+
+
+def export_lines(kind, date_from=None, date_to=None, status=None, chunk_size=CHUNK_SIZE):
+    """Yield CSV lines as strings, suitable for ``StreamingHttpResponse``."""
+    writer = csv.writer(Echo())
+    for row in export_rows(kind, date_from, date_to, status, chunk_size):
+        yield writer.writerow(row)
@@ -0,0 +1,117 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from bookings.models import Booking
+from core.models import Airline, Airport
+from dashboard import analytics
+from flights.models import Aircraft, Flight
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark airline/route analytics against the legacy single-annotate query '
+        'on a synthetic dataset. All generated rows are rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=1_000_000)
+        parser.add_argument('--flights', type=int, default=20_000)
+        parser.add_argument('--airlines', type=int, default=20)
+        parser.add_argument('--airports', type=int, default=60)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.generate(options)
+            self.run_benchmark()
+            transaction.set_rollback(True)
+        self.stdout.write('Synthetic data rolled back.')
+
+    def generate(self, options):
+        rng = random.Random(42)
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        airlines = Airline.objects.bulk_create([
+            Airline(name=f'Bench Airline {i}', code=f'Z{i:02d}') for i in range(options['airlines'])
+        ])
+        airports = Airport.objects.bulk_create([
+            Airport(name=f'Bench Airport {i}', city=f'Bench City {i}', country='Benchland', code=f'Q{i:02d}')
+            for i in range(options['airports'])
+        ])
+        aircraft = Aircraft.objects.bulk_create([
+            Aircraft(model='Bench 320', airline=airline, capacity=180, economy_seats=150,
+                     business_seats=24, first_class_seats=6)
+            for airline in airlines
+        ])
+        user = User.objects.create(username='benchmark-analytics')
+
+        now = timezone.now()
+        flights = []
+        for i in range(options['flights']):
+            index = rng.randrange(len(airlines))
+            origin, destination = rng.sample(airports, 2)
+            departure = now + timedelta(minutes=i)
+            flights.append(Flight(
+                flight_number=f'{airlines[index].code}{i}', airline=airlines[index], aircraft=aircraft[index],
+                origin=origin, destination=destination, departure_time=departure,
+                arrival_time=departure + timedelta(hours=2), duration=timedelta(hours=2),
+                economy_price=Decimal('100.00'), available_economy_seats=150,
+            ))
+        flights = Flight.objects.bulk_create(flights, batch_size=batch_size)
+
+        statuses = ['confirmed', 'confirmed', 'confirmed', 'pending', 'cancelled']
+        batch = []
+        for i in range(options['bookings']):
+            passengers = rng.randint(1, 4)
+            batch.append(Booking(
+                booking_reference=f'B{i:09X}', user=user, outbound_flight=rng.choice(flights),
+                passengers=passengers, total_amount=Decimal(rng.randint(80, 900) * passengers),
+                status=rng.choice(statuses), contact_email='bench@example.com', contact_phone='0',
+            ))
+            if len(batch) >= batch_size:
+                Booking.objects.bulk_create(batch)
+                batch = []
+        Booking.objects.bulk_create(batch)
+
+        self.stdout.write(
+            f"Generated {options['flights']} flights and {options['bookings']} bookings "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    def timed(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        self.stdout.write(f'{label:<40} {time.perf_counter() - started:8.3f}s')
+        return result
+
+    def run_benchmark(self):
+        legacy = self.timed('legacy annotate (no capacity)', lambda: list(
+            Airline.objects.annotate(
+                booking_count=Count('flight__outbound_bookings'),
+                revenue=Sum('flight__outbound_bookings__total_amount'),
+            ).order_by('-booking_count')[:10]
+        ))
+        legacy_with_capacity = self.timed('legacy annotate + capacity (fan-out)', lambda: list(
+            Airline.objects.annotate(
+                booking_count=Count('flight__outbound_bookings'),
+                seats=Sum('flight__aircraft__capacity'),
+            ).order_by('-booking_count')[:10]
+        ))
+        airlines = self.timed('analytics.airline_performance', analytics.airline_performance)
+        self.timed('analytics.route_performance', analytics.route_performance)
+
+        # Show how far off the fanned-out capacity is for the busiest airline
+        if legacy_with_capacity:
+            top = legacy_with_capacity[0]
+            actual = next((row['seats'] for row in airlines if row['airline'].pk == top.pk), 0)
+            self.stdout.write(f'{top.code}: fanned-out seats {top.seats} vs actual {actual}')
+        self.stdout.write(f'Legacy top airline bookings (all statuses): {legacy[0].booking_count if legacy else 0}')
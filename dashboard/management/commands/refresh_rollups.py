@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Incrementally refresh the daily revenue and booking rollups used by the admin dashboards'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every day instead of only changed days')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and refresh every N seconds (background worker mode)'
+        )
+    
+    def handle(self, *args, **options):
+        full = options['full']
+        interval = options['interval']
+        
+        while True:
+            result = refresh_rollups(full=full)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {result['revenue_days']} revenue day(s) and {result['booking_days']} booking day(s)"
+            ))
+            if interval <= 0:
+                break
+            full = False
+            time.sleep(interval)
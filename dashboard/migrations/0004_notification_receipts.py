@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_targets_to_receipts(apps, schema_editor):
+    SystemNotification = apps.get_model('dashboard', 'SystemNotification')
+    NotificationReceipt = apps.get_model('dashboard', 'NotificationReceipt')
+    Through = SystemNotification.target_users.through
+    notifications = SystemNotification.objects.in_bulk()
+    receipts = []
+    for notification_id, user_id in Through.objects.values_list('systemnotification_id', 'user_id').iterator():
+        notification = notifications[notification_id]
+        receipts.append(NotificationReceipt(
+            notification_id=notification_id,
+            user_id=user_id,
+            created_at=notification.created_at,
+            # The old flag was shared by all targets; keep it as each target's read state
+            read_at=notification.created_at if notification.is_read else None,
+        ))
+    NotificationReceipt.objects.bulk_create(receipts, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_buffered_event_timestamps'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='dashboard.systemnotification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='dashboard_n_user_id_c1895f_idx'), models.Index(fields=['user', 'read_at'], name='dashboard_n_user_id_265da6_idx')],
+                'unique_together': {('notification', 'user')},
+            },
+        ),
+        migrations.RunPython(copy_targets_to_receipts, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='systemnotification',
+            name='is_read',
+        ),
+        migrations.RemoveField(
+            model_name='systemnotification',
+            name='target_users',
+        ),
+    ]
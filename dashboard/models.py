@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from core.models import Airline, Airport
+from decimal import Decimal
 
 class UserActivity(models.Model):
     ACTIVITY_CHOICES = [
@@ -17,7 +20,7 @@ class UserActivity(models.Model):
     description = models.TextField(blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)  # Event time, rows may be written later in a batch
     
     class Meta:
         ordering = ['-created_at']
@@ -37,9 +40,7 @@ class SystemNotification(models.Model):
     title = models.CharField(max_length=200)
     message = models.TextField()
     notification_type = models.CharField(max_length=10, choices=NOTIFICATION_TYPES, default='info')
-    is_global = models.BooleanField(default=False)  # Show to all users
-    target_users = models.ManyToManyField(User, blank=True)  # Specific users
-    is_read = models.BooleanField(default=False)
+    is_global = models.BooleanField(default=False)  # Show to all users, otherwise to users with a receipt
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(null=True, blank=True)
     
@@ -49,6 +50,23 @@ class SystemNotification(models.Model):
     def __str__(self):
         return f"{self.title} - {self.get_notification_type_display()}"
 
+class NotificationReceipt(models.Model):
+    """Delivery and read state of a notification for one user"""
+    notification = models.ForeignKey(SystemNotification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_receipts')
+    created_at = models.DateTimeField(default=timezone.now)  # Copied from the notification so inboxes sort on this table alone
+    read_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['notification', 'user']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['user', 'read_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.notification.title}"
+
 class AdminLog(models.Model):
     ACTION_CHOICES = [
         ('create', 'Created'),
@@ -65,10 +83,57 @@ class AdminLog(models.Model):
     object_id = models.CharField(max_length=50, blank=True)
     description = models.TextField()
     ip_address = models.GenericIPAddressField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.admin_user.username} {self.action} {self.object_type}"
+
+class DailyRevenueRollup(models.Model):
+    """Completed payment totals per day, airline and route."""
+    date = models.DateField()
+    airline = models.ForeignKey(Airline, on_delete=models.CASCADE, related_name='revenue_rollups')
+    origin = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    destination = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    payment_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['date', 'airline', 'origin', 'destination']
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.date} {self.airline_id} {self.origin_id}->{self.destination_id}: {self.revenue}"
+
+class DailyBookingRollup(models.Model):
+    """Booking and passenger counts per day (of booking), status, airline and route."""
+    date = models.DateField()
+    status = models.CharField(max_length=20)
+    airline = models.ForeignKey(Airline, on_delete=models.CASCADE, related_name='booking_rollups')
+    origin = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    destination = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    booking_count = models.PositiveIntegerField(default=0)
+    passenger_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['date', 'status', 'airline', 'origin', 'destination']
+        indexes = [
+            models.Index(fields=['status', 'date']),
+        ]
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.date} {self.status} {self.origin_id}->{self.destination_id}: {self.booking_count}"
+
+class RollupCheckpoint(models.Model):
+    """High-water mark of the last incremental rollup refresh."""
+    name = models.CharField(max_length=50, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.high_water_mark}"
@@ -0,0 +1,140 @@
+"""
+System notifications with per-user read state.
+
+Global notifications are shown to everyone. They are read from a cached list,
+and a user who reads one gets a ``NotificationReceipt`` with ``read_at`` set.
+Targeted notifications get one receipt per recipient when sent, written with
+chunked ``bulk_create``, and a user's inbox is a range scan on the
+``(user, created_at)`` index.
+
+Unread counts are cached per user. The key includes the version of the global
+list, so publishing a global notification resets everyone's count, while
+targeted sends and mark-as-read only clear the affected users' keys.
+"""
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from core import caching
+from .models import NotificationReceipt, SystemNotification
+
+CHUNK_SIZE = 1000
+CACHE_TIMEOUT = 300  # Also bounds how long an expired notification can still be counted
+
+GLOBAL_NAMESPACE = 'notifications:global'
+
+
+def _not_expired(prefix=''):
+    now = timezone.now()
+    return Q(**{f'{prefix}expires_at__isnull': True}) | Q(**{f'{prefix}expires_at__gt': now})
+
+
+def global_notifications():
+    """Active global notifications, newest first."""
+    return caching.cached('notifications:global', [GLOBAL_NAMESPACE], lambda: list(
+        SystemNotification.objects.filter(_not_expired(), is_global=True).order_by('-created_at')
+    ), timeout=CACHE_TIMEOUT)
+
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}:{caching.get_version(GLOBAL_NAMESPACE)}'
+
+
+def _forget_counts(user_ids):
+    cache.delete_many([_unread_key(user_id) for user_id in user_ids])
+
+
+def _unread_receipts(user):
+    return NotificationReceipt.objects.filter(
+        _not_expired('notification__'),
+        user=user,
+        read_at__isnull=True,
+        notification__is_global=False,
+    )
+
+
+def _read_global_ids(user, notifications):
+    return set(NotificationReceipt.objects.filter(
+        user=user,
+        notification__in=[notification.pk for notification in notifications],
+        read_at__isnull=False,
+    ).values_list('notification_id', flat=True))
+
+
+def unread_count(user):
+    """Number of unread notifications for ``user`` (cached)."""
+    key = _unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        globals_ = global_notifications()
+        count = len(globals_) - len(_read_global_ids(user, globals_)) + _unread_receipts(user).count()
+        cache.set(key, count, CACHE_TIMEOUT)
+    return count
+
+
+def unread_notifications(user, limit=5):
+    """The ``limit`` newest unread notifications for ``user``."""
+    globals_ = global_notifications()
+    read_ids = _read_global_ids(user, globals_)
+    unread = [notification for notification in globals_ if notification.pk not in read_ids][:limit]
+    receipts = _unread_receipts(user).select_related('notification').order_by('-created_at')[:limit]
+    unread.extend(receipt.notification for receipt in receipts)
+    unread.sort(key=lambda notification: notification.created_at, reverse=True)
+    return unread[:limit]
+
+
+def fan_out(notification, user_ids, chunk_size=CHUNK_SIZE):
+    """Deliver a targeted ``notification`` to ``user_ids`` (any iterable or ``values_list`` queryset)."""
+    delivered = 0
+    chunk = []
+    for user_id in user_ids:
+        chunk.append(user_id)
+        if len(chunk) >= chunk_size:
+            delivered += _deliver(notification, chunk)
+            chunk = []
+    if chunk:
+        delivered += _deliver(notification, chunk)
+    return delivered
+
+
+def _deliver(notification, user_ids):
+    NotificationReceipt.objects.bulk_create([
+        NotificationReceipt(notification=notification, user_id=user_id, created_at=notification.created_at)
+        for user_id in user_ids
+    ], ignore_conflicts=True)
+    _forget_counts(user_ids)
+    return len(user_ids)
+
+
+def send(title, message, notification_type='info', user_ids=None, expires_at=None, chunk_size=CHUNK_SIZE):
+    """Create a notification for everyone (``user_ids=None``) or for ``user_ids``."""
+    notification = SystemNotification.objects.create(
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        is_global=user_ids is None,
+        expires_at=expires_at,
+    )
+    if user_ids is not None:
+        fan_out(notification, user_ids, chunk_size=chunk_size)
+    return notification
+
+
+def mark_read(user, notification_ids=None):
+    """Mark the given (or all unread) notifications as read for ``user``."""
+    now = timezone.now()
+    globals_ = global_notifications()
+    receipts = NotificationReceipt.objects.filter(user=user, read_at__isnull=True)
+    global_ids = {notification.pk for notification in globals_}
+    if notification_ids is not None:
+        receipts = receipts.filter(notification__in=notification_ids)
+        global_ids &= set(notification_ids)
+    receipts.update(read_at=now)
+
+    # Global notifications only get a receipt once they are read
+    created_at = {notification.pk: notification.created_at for notification in globals_}
+    NotificationReceipt.objects.bulk_create([
+        NotificationReceipt(notification_id=pk, user=user, created_at=created_at[pk], read_at=now)
+        for pk in global_ids
+    ], ignore_conflicts=True)
+    _forget_counts([user.pk])
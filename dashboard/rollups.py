@@ -0,0 +1,157 @@
+"""
+Incremental maintenance of the daily rollup tables read by the admin dashboards.
+
+Each refresh looks at the rows that changed since the stored high-water mark,
+works out which days they belong to and rebuilds exactly those days. Rebuilding
+a day is idempotent, so the high-water mark is re-read with a small overlap to
+pick up rows from transactions that committed late.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from bookings.models import Booking, Payment
+from .models import DailyBookingRollup, DailyRevenueRollup, RollupCheckpoint
+
+REVENUE_CHECKPOINT = 'revenue'
+BOOKINGS_CHECKPOINT = 'bookings'
+
+# Re-scan this far behind the high-water mark to catch late commits
+OVERLAP = timedelta(minutes=5)
+
+# Number of days rebuilt per transaction
+DAYS_PER_BATCH = 31
+
+
+def _day_range_filter(field, days):
+    """OR of half-open [day, day + 1) ranges so the date indexes can be used."""
+    condition = Q()
+    for day in days:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        condition |= Q(**{f'{field}__gte': start, f'{field}__lt': start + timedelta(days=1)})
+    return condition
+
+
+def _batches(days):
+    days = sorted(days)
+    for i in range(0, len(days), DAYS_PER_BATCH):
+        yield days[i:i + DAYS_PER_BATCH]
+
+
+def _touched_days(queryset, date_field, change_fields, since):
+    if since is not None:
+        changed = Q()
+        for field in change_fields:
+            changed |= Q(**{f'{field}__gte': since - OVERLAP})
+        queryset = queryset.filter(changed)
+    return set(
+        queryset.annotate(day=TruncDate(date_field)).values_list('day', flat=True).distinct()
+    )
+
+
+def _get_checkpoint(name):
+    checkpoint, _ = RollupCheckpoint.objects.get_or_create(name=name)
+    return checkpoint
+
+
+def rebuild_revenue_days(days):
+    """Recompute the revenue rollup for the given dates."""
+    for batch in _batches(days):
+        rows = Payment.objects.filter(
+            _day_range_filter('created_at', batch),
+            status='completed',
+        ).annotate(
+            day=TruncDate('created_at')
+        ).values(
+            'day',
+            'booking__outbound_flight__airline',
+            'booking__outbound_flight__origin',
+            'booking__outbound_flight__destination',
+        ).annotate(
+            revenue=Sum('amount'),
+            payment_count=Count('id'),
+        ).order_by()
+
+        with transaction.atomic():
+            DailyRevenueRollup.objects.filter(date__in=batch).delete()
+            DailyRevenueRollup.objects.bulk_create([
+                DailyRevenueRollup(
+                    date=row['day'],
+                    airline_id=row['booking__outbound_flight__airline'],
+                    origin_id=row['booking__outbound_flight__origin'],
+                    destination_id=row['booking__outbound_flight__destination'],
+                    revenue=row['revenue'],
+                    payment_count=row['payment_count'],
+                )
+                for row in rows
+            ])
+
+
+def rebuild_booking_days(days):
+    """Recompute the booking rollup for the given dates."""
+    for batch in _batches(days):
+        rows = Booking.objects.filter(
+            _day_range_filter('booked_at', batch),
+        ).annotate(
+            day=TruncDate('booked_at')
+        ).values(
+            'day',
+            'status',
+            'outbound_flight__airline',
+            'outbound_flight__origin',
+            'outbound_flight__destination',
+        ).annotate(
+            booking_count=Count('id'),
+            passenger_count=Sum('passengers'),
+        ).order_by()
+
+        with transaction.atomic():
+            DailyBookingRollup.objects.filter(date__in=batch).delete()
+            DailyBookingRollup.objects.bulk_create([
+                DailyBookingRollup(
+                    date=row['day'],
+                    status=row['status'],
+                    airline_id=row['outbound_flight__airline'],
+                    origin_id=row['outbound_flight__origin'],
+                    destination_id=row['outbound_flight__destination'],
+                    booking_count=row['booking_count'],
+                    passenger_count=row['passenger_count'] or 0,
+                )
+                for row in rows
+            ])
+
+
+def refresh_rollups(full=False):
+    """
+    Bring both rollup tables up to date and return the number of days rebuilt.
+
+    Payments are picked up through ``created_at``/``processed_at`` and bookings
+    through ``booked_at``/``confirmed_at``/``cancelled_at``. Status changes that
+    touch none of those timestamps need a ``full`` rebuild.
+    """
+    started_at = timezone.now()
+
+    revenue_checkpoint = _get_checkpoint(REVENUE_CHECKPOINT)
+    since = None if full else revenue_checkpoint.high_water_mark
+    revenue_days = _touched_days(Payment.objects.all(), 'created_at', ['created_at', 'processed_at'], since)
+    if full:
+        DailyRevenueRollup.objects.exclude(date__in=revenue_days).delete()
+    rebuild_revenue_days(revenue_days)
+    revenue_checkpoint.high_water_mark = started_at
+    revenue_checkpoint.save()
+
+    bookings_checkpoint = _get_checkpoint(BOOKINGS_CHECKPOINT)
+    since = None if full else bookings_checkpoint.high_water_mark
+    booking_days = _touched_days(
+        Booking.objects.all(), 'booked_at', ['booked_at', 'confirmed_at', 'cancelled_at'], since
+    )
+    if full:
+        DailyBookingRollup.objects.exclude(date__in=booking_days).delete()
+    rebuild_booking_days(booking_days)
+    bookings_checkpoint.high_water_mark = started_at
+    bookings_checkpoint.save()
+
+    return {'revenue_days': len(revenue_days), 'booking_days': len(booking_days)}
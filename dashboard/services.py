@@ -0,0 +1,57 @@
+"""
+Data for the user dashboard.
+
+Booking counts come from one conditional aggregate, the booking lists are
+fetched with their flights and airports joined in, and the result is cached
+per user. The cache key includes two ``core.caching`` versions: the user's own
+bookings namespace (bumped by ``dashboard.signals`` whenever one of their
+bookings changes) and ``flights``, since the lists show flight times and
+status.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from bookings.models import Booking
+from core import caching
+
+CACHE_TIMEOUT = 300  # Also bounds how long a departed flight can stay in "upcoming"
+
+FLIGHT_RELATED = ('outbound_flight__airline', 'outbound_flight__origin', 'outbound_flight__destination')
+
+
+def bookings_namespace(user_id):
+    return f'bookings:user:{user_id}'
+
+
+def invalidate_user_dashboard(user_id):
+    caching.bump(bookings_namespace(user_id))
+
+
+def _build(user):
+    bookings = Booking.objects.filter(user=user)
+    counts = bookings.aggregate(
+        total=Count('pk'),
+        confirmed=Count('pk', filter=Q(status='confirmed')),
+    )
+    related = bookings.select_related(*FLIGHT_RELATED)
+    return {
+        'recent_bookings': list(related.order_by('-booked_at')[:5]),
+        'total_bookings': counts['total'],
+        'confirmed_bookings': counts['confirmed'],
+        'upcoming_bookings': list(related.filter(
+            status='confirmed',
+            outbound_flight__departure_time__gte=timezone.now(),
+        ).order_by('outbound_flight__departure_time')[:3]),
+    }
+
+
+def get_user_dashboard(user):
+    """Booking lists and counts for ``user``'s dashboard, cached until their bookings or any flight change."""
+    version = caching.get_version(bookings_namespace(user.pk), 'flights')
+    key = f'user-dashboard:{user.pk}:{version}'
+    data = cache.get(key)
+    if data is None:
+        data = _build(user)
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import caching
+from .models import SystemNotification
+from .notifications import GLOBAL_NAMESPACE
+from .services import invalidate_user_dashboard
+
+
+@receiver([post_save, post_delete], sender='bookings.Booking')
+def booking_changed(sender, instance, **kwargs):
+    invalidate_user_dashboard(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=SystemNotification)
+def notification_changed(sender, instance, **kwargs):
+    if instance.is_global:
+        caching.bump(GLOBAL_NAMESPACE)
@@ -1,3 +1,301 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import Booking, Payment
+from core.models import Airline, Airport
+from flights.models import Aircraft, Flight
+from . import analytics, notifications, rollups, services
+from .models import DailyBookingRollup, DailyRevenueRollup, NotificationReceipt, RollupCheckpoint
+
+
+def at(day, hour=12):
+    return datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc) + timedelta(hours=hour)
+
+
+class DashboardTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('traveller', 'traveller@example.com', 'secret')
+        cls.airline = Airline.objects.create(name='Test Air', code='TA')
+        cls.aircraft = Aircraft.objects.create(model='A320', airline=cls.airline, capacity=150, economy_seats=150)
+        cls.jfk = Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK')
+        cls.lhr = Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR')
+
+    def make_flight(self, flight_number='TA1', origin=None, destination=None, aircraft=None, **fields):
+        departure = fields.pop('departure_time', timezone.now() + timedelta(days=30))
+        aircraft = aircraft or self.aircraft
+        return Flight.objects.create(**{
+            'flight_number': flight_number,
+            'airline': aircraft.airline,
+            'aircraft': aircraft,
+            'origin': origin or self.jfk,
+            'destination': destination or self.lhr,
+            'departure_time': departure,
+            'arrival_time': departure + timedelta(hours=7),
+            'duration': timedelta(hours=7),
+            'economy_price': Decimal('300.00'),
+            'available_economy_seats': 150,
+            **fields,
+        })
+
+    def make_booking(self, flight, passengers=1, amount='300.00', status='confirmed', booked_at=None, user=None):
+        booking = Booking.objects.create(
+            user=user or self.user,
+            outbound_flight=flight,
+            passengers=passengers,
+            total_amount=Decimal(amount),
+            status=status,
+            contact_email='traveller@example.com',
+            contact_phone='0',
+        )
+        if booked_at is not None:
+            # booked_at is auto_now_add
+            Booking.objects.filter(pk=booking.pk).update(booked_at=booked_at)
+            booking.booked_at = booked_at
+        return booking
+
+    def pay(self, booking, created_at, status='completed', processed_at=None):
+        payment = Payment.objects.create(
+            booking=booking,
+            amount=booking.total_amount,
+            payment_method='credit_card',
+            status=status,
+            processed_at=processed_at,
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_at=created_at)
+        return payment
+
+
+class RollupTests(DashboardTestCase):
+    def setUp(self):
+        self.flight = self.make_flight()
+        self.day = timezone.now().date() - timedelta(days=30)
+
+    def revenue(self):
+        return {
+            row.date: (row.revenue, row.payment_count)
+            for row in DailyRevenueRollup.objects.all()
+        }
+
+    def test_refresh_groups_completed_payments_and_bookings_by_day(self):
+        for hour, amount in ((0, '100.00'), (23, '250.00')):
+            self.pay(self.make_booking(self.flight, amount=amount, booked_at=at(self.day, hour)),
+                     at(self.day, hour))
+        self.pay(self.make_booking(self.flight, amount='999.00', status='pending', booked_at=at(self.day)),
+                 at(self.day), status='failed')
+        self.pay(self.make_booking(self.flight, amount='50.00', booked_at=at(self.day + timedelta(days=1))),
+                 at(self.day + timedelta(days=1), 0))
+
+        rollups.refresh_rollups()
+
+        self.assertEqual(self.revenue(), {
+            self.day: (Decimal('350.00'), 2),
+            self.day + timedelta(days=1): (Decimal('50.00'), 1),
+        })
+        bookings = {
+            (row.date, row.status): row.booking_count
+            for row in DailyBookingRollup.objects.all()
+        }
+        self.assertEqual(bookings, {
+            (self.day, 'confirmed'): 2,
+            (self.day, 'pending'): 1,
+            (self.day + timedelta(days=1), 'confirmed'): 1,
+        })
+
+    def test_incremental_refresh_rebuilds_the_day_of_a_late_payment(self):
+        booking = self.make_booking(self.flight, booked_at=at(self.day))
+        self.pay(self.make_booking(self.flight, amount='100.00', booked_at=at(self.day)), at(self.day))
+        rollups.refresh_rollups()
+
+        # An old pending payment completes now: only processed_at is recent
+        payment = self.pay(booking, at(self.day), status='pending')
+        Payment.objects.filter(pk=payment.pk).update(status='completed', processed_at=timezone.now())
+        result = rollups.refresh_rollups()
+
+        self.assertEqual(result['revenue_days'], 1)
+        self.assertEqual(self.revenue(), {self.day: (Decimal('400.00'), 2)})
+
+    def test_incremental_refresh_skips_untouched_days(self):
+        self.pay(self.make_booking(self.flight, booked_at=at(self.day)), at(self.day))
+        rollups.refresh_rollups()
+
+        self.assertEqual(rollups.refresh_rollups(), {'revenue_days': 0, 'booking_days': 0})
+        self.assertIsNotNone(RollupCheckpoint.objects.get(name=rollups.REVENUE_CHECKPOINT).high_water_mark)
+
+    def test_full_refresh_drops_days_that_no_longer_have_rows(self):
+        payment = self.pay(self.make_booking(self.flight, booked_at=at(self.day)), at(self.day))
+        rollups.refresh_rollups()
+        # Deletions leave no timestamp behind for the incremental path
+        payment.booking.delete()
+
+        rollups.refresh_rollups()
+        self.assertIn(self.day, self.revenue())
+
+        rollups.refresh_rollups(full=True)
+        self.assertEqual(self.revenue(), {})
+        self.assertFalse(DailyBookingRollup.objects.exists())
+
+
+class AnalyticsTests(DashboardTestCase):
+    def setUp(self):
+        self.first = self.make_flight('TA1')
+        self.second = self.make_flight('TA2', origin=self.lhr, destination=self.jfk)
+        for passengers in (1, 2, 3):
+            self.make_booking(self.first, passengers=passengers, amount='100.00')
+
+    def test_capacity_is_not_multiplied_by_bookings(self):
+        [row] = analytics.airline_performance()
+
+        self.assertEqual(row['airline'], self.airline)
+        self.assertEqual((row['flights'], row['seats']), (2, 300))
+        self.assertEqual((row['bookings'], row['passengers'], row['revenue']), (3, 6, Decimal('300.00')))
+        self.assertEqual(row['load_factor'], 6 / 300)
+        self.assertEqual(row['average_fare'], Decimal('50.00'))
+
+    def test_unbooked_and_cancelled_rows_are_left_out(self):
+        self.make_booking(self.second, status='pending')
+        self.make_booking(self.second, status='cancelled')
+        cancelled = self.make_flight('TA3', status='cancelled')
+        self.make_booking(cancelled)
+
+        [row] = analytics.airline_performance()
+
+        self.assertEqual((row['flights'], row['seats'], row['bookings']), (2, 300, 3))
+
+    def test_routes_are_ranked_by_bookings(self):
+        other = Airline.objects.create(name='Other Air', code='OA')
+        aircraft = Aircraft.objects.create(model='B737', airline=other, capacity=100, economy_seats=100)
+        self.make_booking(self.make_flight('OA1', aircraft=aircraft))
+
+        routes = analytics.route_performance()
+
+        self.assertEqual([(row['origin'], row['destination']) for row in routes],
+                         [(self.jfk, self.lhr), (self.lhr, self.jfk)])
+        self.assertEqual((routes[0]['flights'], routes[0]['seats'], routes[0]['bookings']), (2, 250, 4))
+        self.assertEqual(routes[1]['load_factor'], 0.0)
+        self.assertEqual([row['airline'] for row in analytics.airline_performance(limit=1)], [self.airline])
+
+    def test_since_limits_by_departure(self):
+        self.make_booking(self.make_flight('TA3', departure_time=timezone.now() - timedelta(days=60)))
+
+        [row] = analytics.airline_performance(since=timezone.now())
+
+        self.assertEqual((row['flights'], row['bookings']), (2, 3))
+
+
+class UserDashboardTests(DashboardTestCase):
+    def setUp(self):
+        cache.clear()
+        self.flight = self.make_flight()
+
+    def test_counts_and_lists(self):
+        departed = self.make_flight('TA2', departure_time=timezone.now() - timedelta(days=1))
+        later = self.make_flight('TA3', departure_time=timezone.now() + timedelta(days=60))
+        soon = self.make_booking(self.flight)
+        self.make_booking(later)
+        self.make_booking(departed)
+        self.make_booking(self.flight, status='pending')
+        self.make_booking(self.flight, user=User.objects.create_user('other'))
+
+        data = services.get_user_dashboard(self.user)
+
+        self.assertEqual((data['total_bookings'], data['confirmed_bookings']), (4, 3))
+        self.assertEqual(len(data['recent_bookings']), 4)
+        self.assertEqual([booking.outbound_flight.flight_number for booking in data['upcoming_bookings']],
+                         ['TA1', 'TA3'])
+        with self.assertNumQueries(0):
+            self.assertEqual(data['upcoming_bookings'][0], soon)
+            self.assertEqual(data['upcoming_bookings'][0].outbound_flight.origin.code, 'JFK')
+
+    def test_result_is_cached_until_the_users_bookings_change(self):
+        self.make_booking(self.flight)
+        services.get_user_dashboard(self.user)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(services.get_user_dashboard(self.user)['total_bookings'], 1)
+
+        self.make_booking(self.flight, user=User.objects.create_user('other'))
+        self.assertEqual(services.get_user_dashboard(self.user)['total_bookings'], 1)
+        with self.assertNumQueries(0):
+            services.get_user_dashboard(self.user)
+
+        booking = self.make_booking(self.flight, status='pending')
+        self.assertEqual(services.get_user_dashboard(self.user)['total_bookings'], 2)
+        booking.delete()
+        self.assertEqual(services.get_user_dashboard(self.user)['total_bookings'], 1)
+
+    def test_flight_changes_refresh_the_lists(self):
+        self.make_booking(self.flight)
+        services.get_user_dashboard(self.user)
+
+        self.flight.gate = 'B7'
+        self.flight.save()
+
+        [booking] = services.get_user_dashboard(self.user)['upcoming_bookings']
+        self.assertEqual(booking.outbound_flight.gate, 'B7')
+
+
+class NotificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice')
+        cls.bob = User.objects.create_user('bob')
+        cls.carol = User.objects.create_user('carol')
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self):
+        return [notifications.unread_count(user) for user in (self.alice, self.bob, self.carol)]
+
+    def test_global_notifications_reach_everyone_until_read(self):
+        notification = notifications.send('Maintenance', 'Tonight')
+        self.assertEqual(self.counts(), [1, 1, 1])
+        self.assertFalse(NotificationReceipt.objects.exists())
+
+        notifications.mark_read(self.alice, [notification.pk])
+
+        self.assertEqual(self.counts(), [0, 1, 1])
+        notifications.send('Another', 'One')
+        self.assertEqual(self.counts(), [1, 2, 2])
+
+    def test_targeted_notifications_fan_out_in_chunks(self):
+        notification = notifications.send('Gate change', 'B7', user_ids=[self.alice.pk, self.bob.pk], chunk_size=1)
+
+        self.assertEqual(self.counts(), [1, 1, 0])
+        self.assertEqual(notifications.fan_out(notification, [self.bob.pk, self.carol.pk]), 2)
+        self.assertEqual(NotificationReceipt.objects.filter(notification=notification).count(), 3)
+        self.assertEqual(self.counts(), [1, 1, 1])
+
+    def test_expired_notifications_are_not_shown(self):
+        expired = timezone.now() - timedelta(minutes=1)
+        notifications.send('Old', 'News', expires_at=expired)
+        notifications.send('Old', 'News', user_ids=[self.alice.pk], expires_at=expired)
+
+        self.assertEqual(self.counts(), [0, 0, 0])
+        self.assertEqual(notifications.unread_notifications(self.alice), [])
+
+    def test_unread_list_merges_global_and_targeted_newest_first(self):
+        first = notifications.send('First', '.', user_ids=[self.alice.pk])
+        second = notifications.send('Second', '.')
+        third = notifications.send('Third', '.', user_ids=[self.alice.pk, self.bob.pk])
+
+        self.assertEqual(notifications.unread_notifications(self.alice), [third, second, first])
+        self.assertEqual(notifications.unread_notifications(self.alice, limit=2), [third, second])
+        self.assertEqual(notifications.unread_notifications(self.bob), [third, second])
+
+    def test_read_all_view(self):
+        notifications.send('Global', '.')
+        notifications.send('Targeted', '.', user_ids=[self.alice.pk, self.bob.pk])
+        self.client.force_login(self.alice)
+
+        response = self.client.post(reverse('dashboard:notifications_read_all'))
 
-# Create your tests here.
+        self.assertEqual(response.json(), {'unread': 0})
+        self.assertEqual(self.counts(), [0, 2, 1])
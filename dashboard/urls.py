@@ -5,11 +5,16 @@ app_name = 'dashboard'
 
 urlpatterns = [
     path('user/', views.UserDashboardView.as_view(), name='user_dashboard'),
+    path('notifications/read/', views.NotificationReadView.as_view(), name='notifications_read_all'),
+    path('notifications/<int:notification_id>/read/', views.NotificationReadView.as_view(), name='notification_read'),
     path('admin/', views.AdminDashboardView.as_view(), name='admin_dashboard'),
     path('admin/flights/', views.AdminFlightsView.as_view(), name='admin_flights'),
     path('admin/bookings/', views.AdminBookingsView.as_view(), name='admin_bookings'),
     path('admin/users/', views.AdminUsersView.as_view(), name='admin_users'),
     path('admin/analytics/', views.AdminAnalyticsView.as_view(), name='admin_analytics'),
+    path('admin/import/schedule/', views.AdminImportScheduleView.as_view(), name='admin_import_schedule'),
+    path('admin/import/status/', views.AdminStatusFeedView.as_view(), name='admin_status_feed'),
+    path('admin/export/<str:kind>/', views.AdminExportView.as_view(), name='admin_export'),
     path('bookings/', views.UserBookingsView.as_view(), name='user_bookings'),
     path('booking/<str:booking_ref>/', views.BookingDetailView.as_view(), name='booking_detail'),
 ]
@@ -1,16 +1,27 @@
 from django.shortcuts import render, get_object_or_404
-from django.views.generic import TemplateView
+from django.views.generic import TemplateView, View
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, Sum, Q, F
+from django.db.models.functions import TruncMonth, TruncWeek
 from django.contrib.auth.models import User
 from datetime import datetime, timedelta
+import csv
+import io
+import os
 
-from .models import UserActivity, SystemNotification, AdminLog
+from . import analytics, exports, notifications
+from .services import get_user_dashboard
+from .models import UserActivity, AdminLog, DailyRevenueRollup, DailyBookingRollup
 from bookings.models import Booking, Payment
 from flights.models import Flight
+from flights.importer import import_schedule
+from flights.statusfeed import ingest_status_feed
 from core.models import Airport, Airline
+from core import audit, counters
+from core.utils import get_client_ip
 
 @method_decorator(login_required, name='dispatch')
 class UserDashboardView(TemplateView):
@@ -21,34 +32,16 @@ class UserDashboardView(TemplateView):
         
         user = self.request.user
         
-        # Get user's bookings
-        recent_bookings = Booking.objects.filter(user=user).order_by('-booked_at')[:5]
-        total_bookings = Booking.objects.filter(user=user).count()
-        confirmed_bookings = Booking.objects.filter(user=user, status='confirmed').count()
-        
-        # Get upcoming flights
-        upcoming_bookings = Booking.objects.filter(
-            user=user,
-            status='confirmed',
-            outbound_flight__departure_time__gte=datetime.now()
-        ).order_by('outbound_flight__departure_time')[:3]
+        # Booking counts and lists (one aggregate, joined lists, cached per user)
+        context.update(get_user_dashboard(user))
         
         # Get user activities
         recent_activities = UserActivity.objects.filter(user=user).order_by('-created_at')[:10]
         
-        # Get notifications
-        notifications = SystemNotification.objects.filter(
-            Q(is_global=True) | Q(target_users=user),
-            is_read=False
-        ).order_by('-created_at')[:5]
-        
         context.update({
-            'recent_bookings': recent_bookings,
-            'total_bookings': total_bookings,
-            'confirmed_bookings': confirmed_bookings,
-            'upcoming_bookings': upcoming_bookings,
             'recent_activities': recent_activities,
-            'notifications': notifications,
+            'notifications': notifications.unread_notifications(user),
+            'unread_notifications': notifications.unread_count(user),
         })
         
         return context
@@ -61,11 +54,12 @@ class AdminDashboardView(TemplateView):
         context = super().get_context_data(**kwargs)
         
         # Calculate statistics
-        total_users = User.objects.count()
-        total_bookings = Booking.objects.count()
-        total_flights = Flight.objects.count()
-        total_revenue = Payment.objects.filter(status='completed').aggregate(
-            total=Sum('amount')
+        totals = counters.get('users', 'bookings', 'flights')
+        total_users = totals['users']
+        total_bookings = totals['bookings']
+        total_flights = totals['flights']
+        total_revenue = DailyRevenueRollup.objects.aggregate(
+            total=Sum('revenue')
         )['total'] or 0
         
         # Recent bookings
@@ -73,20 +67,24 @@ class AdminDashboardView(TemplateView):
             'user', 'outbound_flight'
         ).order_by('-booked_at')[:10]
         
-        # Popular destinations
-        popular_destinations = Airport.objects.annotate(
-            booking_count=Count('arriving_flights__outbound_bookings')
+        # Popular destinations (from the daily booking rollup)
+        top_destinations = DailyBookingRollup.objects.values('destination').annotate(
+            booking_count=Sum('booking_count')
         ).order_by('-booking_count')[:5]
+        airports = Airport.objects.in_bulk([row['destination'] for row in top_destinations])
+        popular_destinations = []
+        for row in top_destinations:
+            airport = airports[row['destination']]
+            airport.booking_count = row['booking_count']
+            popular_destinations.append(airport)
         
         # Revenue by month (last 6 months)
-        from django.db.models import TruncMonth
-        monthly_revenue = Payment.objects.filter(
-            status='completed',
-            created_at__gte=datetime.now() - timedelta(days=180)
+        monthly_revenue = DailyRevenueRollup.objects.filter(
+            date__gte=(datetime.now() - timedelta(days=180)).date()
         ).annotate(
-            month=TruncMonth('created_at')
+            month=TruncMonth('date')
         ).values('month').annotate(
-            total=Sum('amount')
+            total=Sum('revenue')
         ).order_by('month')
         
         # Admin logs
@@ -118,10 +116,13 @@ class AdminFlightsView(TemplateView):
         ).order_by('-departure_time')[:50]
         
         # Flight statistics
-        total_flights = Flight.objects.count()
-        scheduled_flights = Flight.objects.filter(status='scheduled').count()
-        completed_flights = Flight.objects.filter(status='landed').count()
-        cancelled_flights = Flight.objects.filter(status='cancelled').count()
+        totals = counters.get(
+            'flights', 'flights:status:scheduled', 'flights:status:landed', 'flights:status:cancelled'
+        )
+        total_flights = totals['flights']
+        scheduled_flights = totals['flights:status:scheduled']
+        completed_flights = totals['flights:status:landed']
+        cancelled_flights = totals['flights:status:cancelled']
         
         context.update({
             'flights': flights,
@@ -146,10 +147,13 @@ class AdminBookingsView(TemplateView):
         ).order_by('-booked_at')[:100]
         
         # Booking statistics
-        total_bookings = Booking.objects.count()
-        confirmed_bookings = Booking.objects.filter(status='confirmed').count()
-        pending_bookings = Booking.objects.filter(status='pending').count()
-        cancelled_bookings = Booking.objects.filter(status='cancelled').count()
+        totals = counters.get(
+            'bookings', 'bookings:status:confirmed', 'bookings:status:pending', 'bookings:status:cancelled'
+        )
+        total_bookings = totals['bookings']
+        confirmed_bookings = totals['bookings:status:confirmed']
+        pending_bookings = totals['bookings:status:pending']
+        cancelled_bookings = totals['bookings:status:cancelled']
         
         context.update({
             'bookings': bookings,
@@ -172,10 +176,11 @@ class AdminUsersView(TemplateView):
         users = User.objects.select_related('userprofile').order_by('-date_joined')[:100]
         
         # User statistics
-        total_users = User.objects.count()
-        verified_users = User.objects.filter(userprofile__email_verified=True).count()
-        staff_users = User.objects.filter(is_staff=True).count()
-        active_users = User.objects.filter(is_active=True).count()
+        totals = counters.get('users', 'users:verified', 'users:staff', 'users:active')
+        total_users = totals['users']
+        verified_users = totals['users:verified']
+        staff_users = totals['users:staff']
+        active_users = totals['users:active']
         
         context.update({
             'users': users,
@@ -194,50 +199,44 @@ class AdminAnalyticsView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Revenue analytics
-        from django.db.models import TruncDay, TruncWeek, TruncMonth
+        # Revenue analytics (from the daily revenue rollup)
         
         # Daily revenue (last 30 days)
-        daily_revenue = Payment.objects.filter(
-            status='completed',
-            created_at__gte=datetime.now() - timedelta(days=30)
-        ).annotate(
-            day=TruncDay('created_at')
-        ).values('day').annotate(
-            total=Sum('amount')
+        daily_revenue = DailyRevenueRollup.objects.filter(
+            date__gte=(datetime.now() - timedelta(days=30)).date()
+        ).values(day=F('date')).annotate(
+            total=Sum('revenue')
         ).order_by('day')
         
         # Weekly revenue (last 12 weeks)
-        weekly_revenue = Payment.objects.filter(
-            status='completed',
-            created_at__gte=datetime.now() - timedelta(weeks=12)
+        weekly_revenue = DailyRevenueRollup.objects.filter(
+            date__gte=(datetime.now() - timedelta(weeks=12)).date()
         ).annotate(
-            week=TruncWeek('created_at')
+            week=TruncWeek('date')
         ).values('week').annotate(
-            total=Sum('amount')
+            total=Sum('revenue')
         ).order_by('week')
         
         # Top routes
-        top_routes = Booking.objects.filter(
+        top_routes = DailyBookingRollup.objects.filter(
             status='confirmed'
         ).values(
-            'outbound_flight__origin__code',
-            'outbound_flight__destination__code'
+            origin_code=F('origin__code'),
+            destination_code=F('destination__code'),
         ).annotate(
-            count=Count('id')
+            count=Sum('booking_count')
         ).order_by('-count')[:10]
         
-        # Airline performance
-        airline_performance = Airline.objects.annotate(
-            booking_count=Count('flight__outbound_bookings'),
-            revenue=Sum('flight__outbound_bookings__total_amount')
-        ).order_by('-booking_count')[:10]
+        # Airline and route performance
+        airline_performance = analytics.airline_performance(limit=10)
+        route_performance = analytics.route_performance(limit=10)
         
         context.update({
             'daily_revenue': daily_revenue,
             'weekly_revenue': weekly_revenue,
             'top_routes': top_routes,
             'airline_performance': airline_performance,
+            'route_performance': route_performance,
         })
         
         return context
@@ -288,3 +287,104 @@ class BookingDetailView(TemplateView):
         })
         
         return context
+
+@method_decorator(login_required, name='dispatch')
+class NotificationReadView(View):
+    """Mark one notification, or all of them, as read for the current user"""
+    
+    def post(self, request, *args, **kwargs):
+        notification_id = kwargs.get('notification_id')
+        notifications.mark_read(request.user, None if notification_id is None else [notification_id])
+        return JsonResponse({'unread': notifications.unread_count(request.user)})
+
+@method_decorator(staff_member_required, name='dispatch')
+class AdminExportView(View):
+    """Stream bookings, payments or flights as CSV, filtered by date range and status"""
+    
+    def get(self, request, *args, **kwargs):
+        kind = kwargs.get('kind')
+        if kind not in exports.EXPORTS:
+            raise Http404('Unknown export')
+        
+        try:
+            date_from = exports.parse_date(request.GET.get('date_from'))
+            date_to = exports.parse_date(request.GET.get('date_to'))
+        except ValueError:
+            return HttpResponseBadRequest('Dates must be in YYYY-MM-DD format.')
+        status = request.GET.get('status', '')
+        
+        audit.record(AdminLog(
+            admin_user=request.user,
+            action='export',
+            object_type=kind.title(),
+            description=f'CSV export of {kind} (from={date_from or "-"}, to={date_to or "-"}, status={status or "any"})',
+            ip_address=get_client_ip(request),
+        ))
+        
+        filename = f'{kind}-{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
+        return StreamingHttpResponse(
+            exports.export_lines(kind, date_from, date_to, status),
+            content_type='text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+        )
+
+@method_decorator(staff_member_required, name='dispatch')
+class AdminImportScheduleView(View):
+    """Upload a CSV or JSON flight schedule and upsert it"""
+    
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if not upload:
+            return JsonResponse({'error': 'No file uploaded'}, status=400)
+        
+        fmt = request.POST.get('format') or os.path.splitext(upload.name)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'json'):
+            return JsonResponse({'error': 'File must be .csv or .json'}, status=400)
+        
+        try:
+            report = import_schedule(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), fmt)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return JsonResponse({'error': f'Could not read file: {e}'}, status=400)
+        
+        audit.record(AdminLog(
+            admin_user=request.user,
+            action='import',
+            object_type='Flight',
+            description=f"Schedule import of {upload.name}: {report['upserted']} upserted, "
+                        f"{report['rejected']} rejected",
+            ip_address=get_client_ip(request),
+        ))
+        
+        return JsonResponse(report)
+
+@method_decorator(staff_member_required, name='dispatch')
+class AdminStatusFeedView(View):
+    """Apply a batch of operational status/gate/terminal/time updates"""
+    
+    def post(self, request, *args, **kwargs):
+        if request.content_type == 'application/json':
+            stream, fmt, source = io.StringIO(request.body.decode('utf-8-sig')), 'json', 'request body'
+        else:
+            upload = request.FILES.get('file')
+            if not upload:
+                return JsonResponse({'error': 'Send a JSON body or upload a file'}, status=400)
+            fmt = request.POST.get('format') or os.path.splitext(upload.name)[1].lstrip('.').lower()
+            if fmt not in ('csv', 'json'):
+                return JsonResponse({'error': 'File must be .csv or .json'}, status=400)
+            stream, source = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), upload.name
+        
+        try:
+            report = ingest_status_feed(stream, fmt)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return JsonResponse({'error': f'Could not read feed: {e}'}, status=400)
+        
+        audit.record(AdminLog(
+            admin_user=request.user,
+            action='update',
+            object_type='Flight',
+            description=f"Status feed from {source}: {report['applied']} applied, {report['unchanged']} unchanged, "
+                        f"{report['unknown']} unknown, {report['rejected']} rejected",
+            ip_address=get_client_ip(request),
+        ))
+        
+        return JsonResponse(report)
@@ -0,0 +1,86 @@
+"""
+Seat availability and pricing answers shared by the single and batch endpoints,
+and the inventory updates made when a booking is paid or cancelled.
+"""
+
+from django.db.models import F
+from django.utils import timezone
+
+from core import caching
+from . import quotes, search_index
+from .models import Flight
+
+# cabin -> (seats column, price column)
+CABINS = {
+    'economy': ('available_economy_seats', 'economy_price'),
+    'business': ('available_business_seats', 'business_price'),
+    'first': ('available_first_class_seats', 'first_class_price'),
+}
+
+FIELDS = ['id', 'flight_number', 'updated_at'] + [column for cabin in CABINS.values() for column in cabin]
+
+
+def parse_passengers(value):
+    """A passenger count from a query string, or None unless it is a whole number of at least 1."""
+    try:
+        passengers = int(value)
+    except (TypeError, ValueError):
+        return None
+    return passengers if passengers >= 1 else None
+
+
+def answer(values, seat_class, passengers):
+    """Availability for ``passengers`` in ``seat_class`` of a flight given as a ``values()`` dict."""
+    if seat_class in CABINS:
+        seats_field, price_field = CABINS[seat_class]
+        available = values[seats_field] >= passengers
+        price = values[price_field]
+    else:
+        available = False
+        price = 0
+    return {
+        'available': available,
+        'price': float(price),
+        'currency': 'USD',
+        'total_price': float(price * passengers),
+        # Bookable answers carry a signed quote that holds this price until payment
+        'quote': quote(values, seat_class, passengers).as_dict() if available else None,
+    }
+
+
+def quote(values, seat_class, passengers):
+    """Signed ``Quote`` for a flight given as a ``values()`` dict or a ``Flight``."""
+    if isinstance(values, Flight):
+        values = {'id': values.pk, 'flight_number': values.flight_number,
+                  **{column: getattr(values, column) for _, column in CABINS.values()}}
+    _, price_field = CABINS[seat_class]
+    return quotes.issue(values['id'], values['flight_number'], seat_class, values[price_field], passengers)
+
+
+def reserve(flight_id, seat_class, passengers):
+    """Take seats in one cabin if enough are left. Returns False when they are not."""
+    if passengers < 1:
+        raise ValueError(f'Cannot reserve {passengers} seats')
+    seats_field, _ = CABINS[seat_class]
+    # A conditional UPDATE, so two payments can never oversell the last seats
+    taken = Flight.objects.filter(pk=flight_id, **{f'{seats_field}__gte': passengers}).update(
+        **{seats_field: F(seats_field) - passengers, 'updated_at': timezone.now()}
+    )
+    if taken:
+        # update() sends no post_save
+        caching.bump('flights')
+        search_index.sync(Flight.objects.filter(pk=flight_id))
+    return bool(taken)
+
+
+def release(flight_id, seat_class, passengers):
+    """Give seats back to a cabin, e.g. when a booking is cancelled."""
+    if passengers < 1:
+        raise ValueError(f'Cannot release {passengers} seats')
+    seats_field, _ = CABINS[seat_class]
+    Flight.objects.filter(pk=flight_id).update(
+        **{seats_field: F(seats_field) + passengers, 'updated_at': timezone.now()}
+    )
+    caching.bump('flights')
+    search_index.sync(Flight.objects.filter(pk=flight_id))
+
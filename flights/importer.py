@@ -0,0 +1,240 @@
+"""
+Bulk flight schedule import from CSV or JSON.
+
+Airline, airport and aircraft references are resolved through in-memory maps
+built once per import, and flights are upserted on
+``(flight_number, departure_time)`` with ``bulk_create(update_conflicts=True)``
+one batch at a time. Seat counters are only set when a flight is first
+inserted, so re-importing a schedule never resets seats that were already sold.
+
+Expected columns (CSV header or JSON object keys):
+
+    flight_number, airline, aircraft, origin, destination,
+    departure_time, arrival_time, economy_price,
+    business_price, first_class_price, status, gate, terminal   (optional)
+
+``airline``, ``origin`` and ``destination`` are IATA codes. ``aircraft`` is
+either an ``Aircraft`` id or a model name of that airline's fleet. Times
+without an offset are taken as local time at the origin/destination airport.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import caching, counters
+from core.models import Airline, Airport
+from core.utils import get_zone
+from . import search_index
+from .models import Aircraft, Flight
+
+BATCH_SIZE = 2000
+
+# Fields overwritten when a (flight_number, departure_time) row already exists
+UPDATE_FIELDS = [
+    'airline', 'aircraft', 'origin', 'destination', 'arrival_time', 'duration',
+    'economy_price', 'business_price', 'first_class_price',
+    'base_economy_price', 'base_business_price', 'base_first_class_price',
+    'status', 'gate', 'terminal', 'updated_at',
+]
+
+STATUSES = {value for value, _ in Flight.FLIGHT_STATUS_CHOICES}
+
+
+class ScheduleRowError(ValueError):
+    pass
+
+
+def read_rows(stream, fmt):
+    """Yield dicts from a text stream in ``csv`` or ``json`` format."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'json':
+        data = json.load(stream)
+        if isinstance(data, dict):
+            data = data.get('flights', [])
+        yield from data
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def _text(row, field, default=''):
+    # JSON feeds may carry numbers (or worse) where CSV always has strings
+    value = row.get(field)
+    if value is None or value == '':
+        return default
+    if isinstance(value, (dict, list)):
+        raise ScheduleRowError(f'{field} is not a value: {value!r}')
+    return str(value).strip()
+
+
+def _decimal(value, field, default=None):
+    if value in (None, ''):
+        if default is None:
+            raise ScheduleRowError(f'{field} is required')
+        return default
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ScheduleRowError(f'{field} is not a number: {value!r}')
+    if not amount.is_finite():
+        raise ScheduleRowError(f'{field} is not a number: {value!r}')
+    if amount < 0:
+        raise ScheduleRowError(f'{field} must not be negative')
+    return amount
+
+
+class ScheduleImporter:
+    """Resolve, validate and upsert schedule rows in batches."""
+
+    def __init__(self, batch_size=BATCH_SIZE, max_rejects=1000):
+        self.batch_size = batch_size
+        self.max_rejects = max_rejects
+        self.airlines = {airline.code.upper(): airline for airline in Airline.objects.all()}
+        self.airports = {airport.code.upper(): airport for airport in Airport.objects.all()}
+        self.aircraft_by_id = {}
+        self.aircraft_by_model = {}
+        for aircraft in Aircraft.objects.all():
+            self.aircraft_by_id[str(aircraft.pk)] = aircraft
+            self.aircraft_by_model.setdefault((aircraft.airline_id, aircraft.model.lower()), aircraft)
+        self.read = 0
+        self.upserted = 0
+        self.rejected = 0
+        self.rejects = []
+
+    def _datetime(self, value, field, airport):
+        try:
+            parsed = parse_datetime(value) if isinstance(value, str) else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ScheduleRowError(f'{field} is not a valid datetime: {value!r}')
+        if timezone.is_naive(parsed):
+            parsed = parsed.replace(tzinfo=get_zone(airport.timezone))
+        return parsed
+
+    def build_flight(self, row):
+        """Turn one input row into an unsaved ``Flight`` or raise ``ScheduleRowError``."""
+        if not isinstance(row, dict):
+            raise ScheduleRowError('row is not an object')
+        flight_number = _text(row, 'flight_number').upper()
+        if not flight_number:
+            raise ScheduleRowError('flight_number is required')
+        if len(flight_number) > 10:
+            raise ScheduleRowError(f'flight_number is too long: {flight_number!r}')
+
+        airline = self.airlines.get(_text(row, 'airline').upper())
+        if airline is None:
+            raise ScheduleRowError(f"unknown airline {row.get('airline')!r}")
+        origin = self.airports.get(_text(row, 'origin').upper())
+        if origin is None:
+            raise ScheduleRowError(f"unknown origin {row.get('origin')!r}")
+        destination = self.airports.get(_text(row, 'destination').upper())
+        if destination is None:
+            raise ScheduleRowError(f"unknown destination {row.get('destination')!r}")
+
+        aircraft_ref = _text(row, 'aircraft')
+        aircraft = self.aircraft_by_id.get(aircraft_ref) or self.aircraft_by_model.get(
+            (airline.pk, aircraft_ref.lower())
+        )
+        if aircraft is None or aircraft.airline_id != airline.pk:
+            raise ScheduleRowError(f'unknown aircraft {aircraft_ref!r} for airline {airline.code}')
+
+        departure_time = self._datetime(row.get('departure_time'), 'departure_time', origin)
+        arrival_time = self._datetime(row.get('arrival_time'), 'arrival_time', destination)
+        if arrival_time <= departure_time:
+            raise ScheduleRowError('arrival_time must be after departure_time')
+
+        status = _text(row, 'status', 'scheduled').lower()
+        if status not in STATUSES:
+            raise ScheduleRowError(f'unknown status {status!r}')
+        gate = _text(row, 'gate')
+        terminal = _text(row, 'terminal')
+        if len(gate) > 10 or len(terminal) > 10:
+            raise ScheduleRowError('gate and terminal are limited to 10 characters')
+
+        economy_price = _decimal(row.get('economy_price'), 'economy_price')
+        business_price = _decimal(row.get('business_price'), 'business_price', Decimal('0.00'))
+        first_class_price = _decimal(row.get('first_class_price'), 'first_class_price', Decimal('0.00'))
+
+        return Flight(
+            flight_number=flight_number,
+            airline=airline,
+            aircraft=aircraft,
+            origin=origin,
+            destination=destination,
+            departure_time=departure_time,
+            arrival_time=arrival_time,
+            duration=arrival_time - departure_time,
+            economy_price=economy_price,
+            business_price=business_price,
+            first_class_price=first_class_price,
+            # Imported fares are published fares; the pricing engine reprices from them
+            base_economy_price=economy_price,
+            base_business_price=business_price,
+            base_first_class_price=first_class_price,
+            available_economy_seats=aircraft.economy_seats,
+            available_business_seats=aircraft.business_seats,
+            available_first_class_seats=aircraft.first_class_seats,
+            status=status,
+            gate=gate,
+            terminal=terminal,
+        )
+
+    def reject(self, line, reason):
+        self.rejected += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append({'line': line, 'reason': reason})
+
+    def flush(self, batch):
+        if not batch:
+            return
+        with transaction.atomic():
+            Flight.objects.bulk_create(
+                batch.values(),
+                update_conflicts=True,
+                unique_fields=['flight_number', 'departure_time'],
+                update_fields=UPDATE_FIELDS,
+            )
+        # bulk_create sends no post_save, so public page caches are invalidated here
+        caching.bump('flights', 'schedule')
+        self.upserted += len(batch)
+        batch.clear()
+
+    def run(self, rows):
+        """Import an iterable of row dicts and return the report."""
+        # Keyed on the upsert key so a repeated row within a batch keeps the last version
+        batch = {}
+        started = timezone.now()
+        for line, row in enumerate(rows, start=1):
+            self.read += 1
+            try:
+                flight = self.build_flight(row)
+            except ScheduleRowError as e:
+                self.reject(line, str(e))
+                continue
+            batch[(flight.flight_number, flight.departure_time)] = flight
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+        self.flush(batch)
+        if self.upserted:
+            # Upserts cannot tell inserts from updates, so recount flights once per import
+            counters.reconcile(groups=['flights'])
+            search_index.refresh(since=started)
+        return self.report()
+
+    def report(self):
+        return {
+            'read': self.read,
+            'upserted': self.upserted,
+            'rejected': self.rejected,
+            'rejects': self.rejects,
+        }
+
+
+def import_schedule(stream, fmt, batch_size=BATCH_SIZE):
+    """Import a text stream in ``csv``/``json`` format and return the report."""
+    return ScheduleImporter(batch_size=batch_size).run(read_rows(stream, fmt))
@@ -0,0 +1,214 @@
+"""
+Live flight status, gate and terminal changes for Server-Sent Events clients.
+
+One ``StatusBroadcaster`` per process polls ``Flight.updated_at`` every
+``POLL_INTERVAL`` seconds with a single query, regardless of how many clients
+are connected, and fans changed flights out to the subscribers of that flight
+or of its origin airport. The query only covers subscribed flights and the
+departures within ``AIRPORT_WINDOW_*`` of subscribed airports. Polling (rather than ``post_save``) also picks up
+changes written by other processes and by ``bulk_update``.
+
+An idle subscriber is an ``asyncio.Queue`` and a suspended generator, so an
+ASGI server can hold tens of thousands of them. Only changes to the fields in
+``TRACKED_FIELDS`` are sent; saves that only touch seat counters are not.
+Each new subscriber's snapshot seeds the values of flights the broadcaster
+has not seen yet, so after a restart a seat or fare write to a watched flight
+is not mistaken for a status change.
+
+Configured through ``settings.LIVE_STATUS``.
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Flight
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'POLL_INTERVAL': 2.0,
+    'KEEPALIVE': 15,
+    'MAX_SUBSCRIBERS': 20000,
+    'QUEUE_SIZE': 100,
+}
+
+TRACKED_FIELDS = ('status', 'gate', 'terminal', 'departure_time', 'arrival_time')
+
+FIELDS = ('id', 'flight_number', 'origin_id', 'origin__code', 'destination__code', 'updated_at') + TRACKED_FIELDS
+
+# Re-read this far behind the newest updated_at seen, for rows committed late
+OVERLAP = timedelta(seconds=5)
+
+# Departures an airport subscription covers, both in its snapshot and in later events
+AIRPORT_WINDOW_BEFORE = timedelta(hours=1)
+AIRPORT_WINDOW_AFTER = timedelta(hours=12)
+
+# Ids per IN clause of the poll query
+ID_CHUNK = 500
+
+STATE_LIMIT = 100000
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LIVE_STATUS', {})}
+
+
+class BroadcasterFull(Exception):
+    pass
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+def flight_payload(row):
+    return {
+        'id': row['id'],
+        'flight_number': row['flight_number'],
+        'origin': row['origin__code'],
+        'destination': row['destination__code'],
+        **{field: row[field] for field in TRACKED_FIELDS},
+    }
+
+
+class Subscription:
+    def __init__(self, flight_ids, airport_ids, queue_size):
+        self.flight_ids = set(flight_ids)
+        self.airport_ids = set(airport_ids)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def put(self, message):
+        if self.queue.full():
+            # Slow client: drop its oldest pending event rather than stall everyone
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class StatusBroadcaster:
+    def __init__(self, poll_interval, max_subscribers, queue_size):
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.subscribers = 0
+        self._by_flight = defaultdict(set)
+        self._by_airport = defaultdict(set)
+        self._state = OrderedDict()
+        self._since = None
+        self._task = None
+
+    def subscribe(self, flight_ids=(), airport_ids=()):
+        if self.subscribers >= self.max_subscribers:
+            raise BroadcasterFull()
+        subscription = Subscription(flight_ids, airport_ids, self.queue_size)
+        for flight_id in subscription.flight_ids:
+            self._by_flight[flight_id].add(subscription)
+        for airport_id in subscription.airport_ids:
+            self._by_airport[airport_id].add(subscription)
+        self.subscribers += 1
+        if self._task is None or self._task.done():
+            self._since = timezone.now()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for index, keys in ((self._by_flight, subscription.flight_ids), (self._by_airport, subscription.airport_ids)):
+            for key in keys:
+                index[key].discard(subscription)
+                if not index[key]:
+                    del index[key]
+        self.subscribers -= 1
+
+    def _store(self, flight_id, values):
+        self._state[flight_id] = values
+        self._state.move_to_end(flight_id)
+        if len(self._state) > STATE_LIMIT:
+            self._state.popitem(last=False)
+
+    def remember(self, row):
+        """Record a flight's current values; returns False if they were already known.
+
+        Only the poll loop may call this: a value recorded anywhere else would
+        never be published to the existing subscribers.
+        """
+        values = tuple(row[field] for field in TRACKED_FIELDS)
+        if self._state.get(row['id']) == values:
+            return False
+        self._store(row['id'], values)
+        return True
+
+    def seed(self, rows):
+        """Record snapshot values of flights not seen before; known flights are left to the poll loop."""
+        for row in rows:
+            if row['id'] not in self._state:
+                self._store(row['id'], tuple(row[field] for field in TRACKED_FIELDS))
+
+    def publish(self, row):
+        if not self.remember(row):
+            return
+        targets = self._by_flight.get(row['id'], set()) | self._by_airport.get(row['origin_id'], set())
+        if targets:
+            message = format_event('status', flight_payload(row))
+            for subscription in targets:
+                subscription.put(message)
+
+    def _poll(self, flight_ids, airport_ids):
+        # Only subscribed flights, and departures around now at subscribed airports: a bulk
+        # write (repricing, an import) touching the whole table must not load it all here
+        now = timezone.now()
+        wanted = Q()
+        for start in range(0, len(flight_ids), ID_CHUNK):
+            wanted |= Q(id__in=flight_ids[start:start + ID_CHUNK])
+        for start in range(0, len(airport_ids), ID_CHUNK):
+            wanted |= Q(
+                origin_id__in=airport_ids[start:start + ID_CHUNK],
+                departure_time__gte=now - AIRPORT_WINDOW_BEFORE,
+                departure_time__lte=now + AIRPORT_WINDOW_AFTER,
+            )
+        if not wanted:
+            return []
+        try:
+            rows = list(Flight.objects.filter(
+                wanted, updated_at__gt=self._since - OVERLAP,
+            ).order_by('updated_at').values(*FIELDS))
+        finally:
+            close_old_connections()
+        if rows:
+            self._since = max(self._since, rows[-1]['updated_at'])
+        return rows
+
+    async def _run(self):
+        # Stops when the last subscriber leaves; the next subscribe() restarts it
+        while self.subscribers:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                # Copied here, on the event loop, because subscribe() mutates the indexes
+                rows = await sync_to_async(self._poll)(list(self._by_flight), list(self._by_airport))
+            except Exception:
+                logger.exception('Flight status poll failed')
+                continue
+            for row in rows:
+                self.publish(row)
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        config = get_config()
+        _broadcaster = StatusBroadcaster(
+            poll_interval=config['POLL_INTERVAL'],
+            max_subscribers=config['MAX_SUBSCRIBERS'],
+            queue_size=config['QUEUE_SIZE'],
+        )
+    return _broadcaster
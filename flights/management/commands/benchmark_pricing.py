@@ -0,0 +1,92 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Airline, Airport
+from flights.models import Aircraft, Flight
+from flights.pricing import Repricer, get_config
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the fare engine on a synthetic set of upcoming flights: a dry run, the first '
+        'run that writes every fare, and a steady-state run. All generated rows are rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flights', type=int, default=1_000_000)
+        parser.add_argument('--airlines', type=int, default=20)
+        parser.add_argument('--airports', type=int, default=60)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--chunk-size', type=int, default=get_config()['CHUNK_SIZE'])
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.generate(options)
+            self.run_benchmark(options)
+            transaction.set_rollback(True)
+        self.stdout.write('Synthetic data rolled back.')
+
+    def generate(self, options):
+        rng = random.Random(42)
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        airlines = Airline.objects.bulk_create([
+            Airline(name=f'Bench Airline {i}', code=f'Z{i:02d}') for i in range(options['airlines'])
+        ])
+        airports = Airport.objects.bulk_create([
+            Airport(name=f'Bench Airport {i}', city=f'Bench City {i}', country='Benchland', code=f'Q{i:02d}')
+            for i in range(options['airports'])
+        ])
+        aircraft = Aircraft.objects.bulk_create([
+            Aircraft(model='Bench 320', airline=airline, capacity=180, economy_seats=150,
+                     business_seats=24, first_class_seats=6)
+            for airline in airlines
+        ])
+
+        # Spread over the pricing horizon so every days-to-departure bucket is exercised
+        now = timezone.now()
+        step = timedelta(days=get_config()['HORIZON_DAYS']) / max(options['flights'], 1)
+        batch = []
+        for i in range(options['flights']):
+            index = rng.randrange(len(airlines))
+            origin, destination = rng.sample(airports, 2)
+            departure = now + timedelta(minutes=5) + step * i
+            batch.append(Flight(
+                flight_number=f'{airlines[index].code}{i}', airline=airlines[index], aircraft=aircraft[index],
+                origin=origin, destination=destination, departure_time=departure,
+                arrival_time=departure + timedelta(hours=2), duration=timedelta(hours=2),
+                economy_price=Decimal(rng.randint(80, 400)), business_price=Decimal(rng.randint(500, 1500)),
+                first_class_price=Decimal(rng.randint(1500, 4000)),
+                available_economy_seats=rng.randint(0, 150), available_business_seats=rng.randint(0, 24),
+                available_first_class_seats=rng.randint(0, 6),
+            ))
+            if len(batch) >= batch_size:
+                Flight.objects.bulk_create(batch)
+                batch = []
+        Flight.objects.bulk_create(batch)
+
+        self.stdout.write(f"Generated {options['flights']} flights in {time.perf_counter() - started:.1f}s")
+
+    def timed(self, label, repricer):
+        started = time.perf_counter()
+        report = repricer.run()
+        self.stdout.write(
+            f"{label:<45} {time.perf_counter() - started:8.3f}s  "
+            f"scanned {report['scanned']}, repriced {report['repriced']}, {report['changes']} fare change(s)"
+        )
+        return report
+
+    def run_benchmark(self, options):
+        config = {**get_config(), 'CHUNK_SIZE': options['chunk_size']}
+        now = timezone.now()
+        self.timed('dry run (price only)', Repricer(config, dry_run=True, now=now))
+        self.timed('first run (write, history, search index)', Repricer(config, now=now))
+        # Nothing sold and no day boundary crossed since: this is what a scheduled run costs
+        self.timed('steady state', Repricer(config, now=now))
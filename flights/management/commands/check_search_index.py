@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from flights import search_index
+
+
+class Command(BaseCommand):
+    help = 'Compare the flight search index with the flights it was built from'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite missing and stale rows and drop orphans')
+        parser.add_argument('--batch-size', type=int, default=search_index.BATCH_SIZE)
+    
+    def handle(self, *args, **options):
+        report = search_index.check(fix=options['fix'], batch_size=options['batch_size'])
+        summary = (f"{report['checked']} checked: {report['missing']} missing, "
+                   f"{report['stale']} stale, {report['orphaned']} orphaned")
+        if not (report['missing'] or report['stale'] or report['orphaned']):
+            self.stdout.write(self.style.SUCCESS(summary))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'{summary} (fixed)'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{summary}; run with --fix to repair'))
@@ -0,0 +1,51 @@
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.models import AdminLog
+from flights.importer import BATCH_SIZE, import_schedule
+
+
+class Command(BaseCommand):
+    help = 'Upsert flights from a CSV or JSON schedule file'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--user', required=True, help='Staff username the import is recorded against')
+    
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'json'):
+            raise CommandError('Cannot infer the format, pass --format csv|json')
+        try:
+            admin_user = User.objects.get(username=options['user'], is_staff=True)
+        except User.DoesNotExist:
+            raise CommandError(f"No staff user named {options['user']!r}")
+        
+        started = time.perf_counter()
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            report = import_schedule(stream, fmt, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        
+        for reject in report['rejects']:
+            self.stderr.write(f"line {reject['line']}: {reject['reason']}")
+        if report['rejected'] > len(report['rejects']):
+            self.stderr.write(f"... {report['rejected'] - len(report['rejects'])} more reject(s) not shown")
+        
+        AdminLog.objects.create(
+            admin_user=admin_user,
+            action='import',
+            object_type='Flight',
+            description=f"Schedule import of {os.path.basename(path)}: {report['upserted']} upserted, "
+                        f"{report['rejected']} rejected",
+            ip_address='127.0.0.1',
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {report['read']} row(s): {report['upserted']} upserted, "
+            f"{report['rejected']} rejected in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.models import AdminLog
+from flights.statusfeed import BATCH_SIZE, ingest_status_feed
+
+
+class Command(BaseCommand):
+    help = 'Apply a CSV or JSON operational status feed, writing only flights that changed'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'json'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--user', required=True, help='Staff username the update is recorded against')
+    
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'json'):
+            raise CommandError('Cannot infer the format, pass --format csv|json')
+        try:
+            admin_user = User.objects.get(username=options['user'], is_staff=True)
+        except User.DoesNotExist:
+            raise CommandError(f"No staff user named {options['user']!r}")
+        
+        started = time.perf_counter()
+        if path == '-':
+            report = ingest_status_feed(sys.stdin, fmt, batch_size=options['batch_size'])
+        else:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                report = ingest_status_feed(stream, fmt, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        
+        for reject in report['rejects']:
+            self.stderr.write(f"line {reject['line']}: {reject['reason']}")
+        if report['rejected'] > len(report['rejects']):
+            self.stderr.write(f"... {report['rejected'] - len(report['rejects'])} more reject(s) not shown")
+        
+        summary = (f"{report['applied']} applied, {report['unchanged']} unchanged, "
+                   f"{report['unknown']} unknown, {report['rejected']} rejected")
+        AdminLog.objects.create(
+            admin_user=admin_user,
+            action='update',
+            object_type='Flight',
+            description=f"Status feed from {os.path.basename(path) if path != '-' else 'stdin'}: {summary}",
+            ip_address='127.0.0.1',
+        )
+        self.stdout.write(self.style.SUCCESS(f"Read {report['read']} row(s): {summary} in {elapsed:.1f}s"))
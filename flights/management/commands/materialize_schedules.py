@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from flights.schedules import materialize_range
+
+
+class Command(BaseCommand):
+    help = 'Create concrete flights from schedules for the near horizon'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help='Number of days ahead to materialize')
+    
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        created = materialize_range(today, today + timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Created {created} flight(s)'))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from flights import search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the flat flight search index, or with --incremental re-index flights updated since the last run'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true', help='Only flights whose updated_at moved')
+        parser.add_argument('--batch-size', type=int, default=search_index.BATCH_SIZE)
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['incremental']:
+            written = search_index.refresh(batch_size=options['batch_size'])
+        else:
+            written = search_index.rebuild(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Indexed {written} flight(s) in {elapsed:.1f}s'))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from flights.pricing import get_config, reprice_flights
+
+
+class Command(BaseCommand):
+    help = 'Reprice upcoming flights from load factor and days to departure, writing only changed fares'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Compute prices without writing them')
+        parser.add_argument('--chunk-size', type=int, default=get_config()['CHUNK_SIZE'])
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = reprice_flights(dry_run=options['dry_run'], CHUNK_SIZE=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        
+        verb = 'would change' if report['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {report['scanned']} flight(s): {report['repriced']} repriced, "
+            f"{report['changes']} cabin fare(s) {verb} in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:21
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('flights', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight_number', models.CharField(max_length=10)),
+                ('days_of_week', models.CharField(default='1234567', max_length=7)),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField()),
+                ('departure_time', models.TimeField()),
+                ('duration', models.DurationField()),
+                ('economy_price', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('business_price', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('first_class_price', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('aircraft', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='flights.aircraft')),
+                ('airline', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.airline')),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='arriving_schedules', to='core.airport')),
+                ('origin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departing_schedules', to='core.airport')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='flights', to='flights.flightschedule'),
+        ),
+        migrations.AddIndex(
+            model_name='flightschedule',
+            index=models.Index(fields=['valid_from', 'valid_until'], name='flights_fli_valid_f_b59bbc_idx'),
+        ),
+    ]
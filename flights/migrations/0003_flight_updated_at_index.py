@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_site_counter'),
+        ('flights', '0002_flight_schedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['updated_at'], name='flights_fli_updated_e8fa46_idx'),
+        ),
+    ]
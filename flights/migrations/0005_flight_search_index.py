@@ -0,0 +1,107 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:03
+
+from datetime import timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of flights.search_index as of this migration
+SOURCE_FIELDS = [
+    'id', 'flight_number', 'status',
+    'airline__code', 'airline__name',
+    'origin_id', 'origin__code', 'origin__city', 'origin__name', 'origin__timezone',
+    'destination_id', 'destination__code', 'destination__city', 'destination__name',
+    'departure_time', 'arrival_time', 'duration',
+    'economy_price', 'business_price', 'first_class_price',
+    'available_economy_seats', 'available_business_seats', 'available_first_class_seats',
+    'updated_at',
+]
+
+COPIED = [
+    'flight_number', 'status', 'departure_time', 'arrival_time', 'duration',
+    'economy_price', 'business_price', 'first_class_price',
+    'available_economy_seats', 'available_business_seats', 'available_first_class_seats',
+]
+
+BATCH_SIZE = 2000
+
+
+def get_zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return dt_timezone.utc
+
+
+def populate_index(apps, schema_editor):
+    Flight = apps.get_model('flights', 'Flight')
+    FlightSearchIndex = apps.get_model('flights', 'FlightSearchIndex')
+    rows = []
+    for values in Flight.objects.order_by('pk').values(*SOURCE_FIELDS).iterator(chunk_size=BATCH_SIZE):
+        rows.append(FlightSearchIndex(
+            flight_id=values['id'],
+            airline_code=values['airline__code'],
+            airline_name=values['airline__name'],
+            origin_id=values['origin_id'],
+            origin_code=values['origin__code'],
+            origin_city=values['origin__city'],
+            origin_name=values['origin__name'],
+            destination_id=values['destination_id'],
+            destination_code=values['destination__code'],
+            destination_city=values['destination__city'],
+            destination_name=values['destination__name'],
+            local_date=values['departure_time'].astimezone(get_zone(values['origin__timezone'])).date(),
+            source_updated_at=values['updated_at'],
+            **{field: values[field] for field in COPIED},
+        ))
+        if len(rows) >= BATCH_SIZE:
+            FlightSearchIndex.objects.bulk_create(rows)
+            rows = []
+    FlightSearchIndex.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_site_counter'),
+        ('flights', '0004_fare_pricing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightSearchIndex',
+            fields=[
+                ('flight', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to='flights.flight')),
+                ('flight_number', models.CharField(max_length=10)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('delayed', 'Delayed'), ('boarding', 'Boarding'), ('departed', 'Departed'), ('in_air', 'In Air'), ('landed', 'Landed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('airline_code', models.CharField(max_length=3)),
+                ('airline_name', models.CharField(max_length=100)),
+                ('origin_code', models.CharField(max_length=3)),
+                ('origin_city', models.CharField(max_length=100)),
+                ('origin_name', models.CharField(max_length=200)),
+                ('destination_code', models.CharField(max_length=3)),
+                ('destination_city', models.CharField(max_length=100)),
+                ('destination_name', models.CharField(max_length=200)),
+                ('departure_time', models.DateTimeField()),
+                ('arrival_time', models.DateTimeField()),
+                ('local_date', models.DateField()),
+                ('duration', models.DurationField()),
+                ('economy_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('business_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('first_class_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('available_economy_seats', models.PositiveIntegerField()),
+                ('available_business_seats', models.PositiveIntegerField()),
+                ('available_first_class_seats', models.PositiveIntegerField()),
+                ('source_updated_at', models.DateTimeField()),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.airport')),
+                ('origin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.airport')),
+            ],
+            options={
+                'ordering': ['departure_time'],
+                'indexes': [models.Index(fields=['local_date', 'departure_time'], name='flights_fli_local_d_bb26d4_idx'), models.Index(fields=['origin', 'local_date'], name='flights_fli_origin__6a9836_idx'), models.Index(fields=['destination', 'local_date'], name='flights_fli_destina_a67cc2_idx'), models.Index(fields=['source_updated_at'], name='flights_fli_source__5775f0_idx')],
+            },
+        ),
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+    ]
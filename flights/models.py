@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from core.models import Airline, Airport
+from core.utils import get_zone
+from datetime import datetime
 from decimal import Decimal
 
 class Aircraft(models.Model):
@@ -14,6 +16,69 @@ class Aircraft(models.Model):
     def __str__(self):
         return f"{self.airline.name} - {self.model}"
 
+class FlightSchedule(models.Model):
+    """Recurring flight that is expanded into concrete Flight rows on demand"""
+    flight_number = models.CharField(max_length=10)
+    airline = models.ForeignKey(Airline, on_delete=models.CASCADE)
+    aircraft = models.ForeignKey(Aircraft, on_delete=models.CASCADE)
+    origin = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='departing_schedules')
+    destination = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='arriving_schedules')
+    
+    days_of_week = models.CharField(max_length=7, default='1234567')  # ISO weekdays, 1 = Monday
+    valid_from = models.DateField()
+    valid_until = models.DateField()
+    departure_time = models.TimeField()  # Local time at the origin airport
+    duration = models.DurationField()
+    
+    economy_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))])
+    business_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))], default=0)
+    first_class_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))], default=0)
+    
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['valid_from', 'valid_until']),
+        ]
+    
+    def __str__(self):
+        return f"{self.flight_number} {self.origin.code}-{self.destination.code} ({self.days_of_week})"
+    
+    def operates_on(self, date):
+        return (self.is_active and
+                self.valid_from <= date <= self.valid_until and
+                str(date.isoweekday()) in self.days_of_week)
+    
+    def departure_on(self, date):
+        """Aware departure datetime for a local operating date"""
+        return datetime.combine(date, self.departure_time, tzinfo=get_zone(self.origin.timezone))
+    
+    def build_flight(self, date):
+        """Unsaved Flight for a local operating date, with seats from the aircraft"""
+        departure_time = self.departure_on(date)
+        return Flight(
+            schedule=self,
+            flight_number=self.flight_number,
+            airline_id=self.airline_id,
+            aircraft=self.aircraft,
+            origin=self.origin,
+            destination=self.destination,
+            departure_time=departure_time,
+            arrival_time=departure_time + self.duration,
+            duration=self.duration,
+            economy_price=self.economy_price,
+            business_price=self.business_price,
+            first_class_price=self.first_class_price,
+            base_economy_price=self.economy_price,
+            base_business_price=self.business_price,
+            base_first_class_price=self.first_class_price,
+            available_economy_seats=self.aircraft.economy_seats,
+            available_business_seats=self.aircraft.business_seats,
+            available_first_class_seats=self.aircraft.first_class_seats,
+        )
+
 class Flight(models.Model):
     FLIGHT_STATUS_CHOICES = [
         ('scheduled', 'Scheduled'),
@@ -30,6 +95,7 @@ class Flight(models.Model):
     aircraft = models.ForeignKey(Aircraft, on_delete=models.CASCADE)
     origin = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='departing_flights')
     destination = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='arriving_flights')
+    schedule = models.ForeignKey(FlightSchedule, on_delete=models.SET_NULL, null=True, blank=True, related_name='flights')
     
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
@@ -39,6 +105,11 @@ class Flight(models.Model):
     business_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))], default=0)
     first_class_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.00'))], default=0)
     
+    # Published fares the pricing engine starts from; null means the current price is the base
+    base_economy_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    base_business_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    base_first_class_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
     available_economy_seats = models.PositiveIntegerField()
     available_business_seats = models.PositiveIntegerField(default=0)
     available_first_class_seats = models.PositiveIntegerField(default=0)
@@ -50,9 +121,18 @@ class Flight(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # What the public pages show; changing any of these bumps the 'schedule' cache namespace
+    SCHEDULE_FIELDS = frozenset([
+        'flight_number', 'airline', 'aircraft', 'origin', 'destination',
+        'departure_time', 'arrival_time', 'duration', 'status',
+    ])
+    
     class Meta:
         unique_together = ['flight_number', 'departure_time']
         ordering = ['departure_time']
+        indexes = [
+            models.Index(fields=['updated_at']),  # Polled by the live status broadcaster
+        ]
     
     def __str__(self):
         return f"{self.flight_number} - {self.origin.code} to {self.destination.code}"
@@ -87,3 +167,65 @@ class Seat(models.Model):
     
     def __str__(self):
         return f"Seat {self.seat_number} - {self.flight.flight_number}"
+
+class FareHistory(models.Model):
+    """One price change made by the pricing engine for a cabin of a flight"""
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='fare_history')
+    seat_class = models.CharField(max_length=10, choices=Seat.SEAT_CLASS_CHOICES)
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    load_factor = models.FloatField()
+    days_to_departure = models.PositiveIntegerField()
+    changed_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['flight', 'changed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.flight_id} {self.seat_class}: {self.old_price} -> {self.new_price}"
+
+class FlightSearchIndex(models.Model):
+    """Flat copy of the searchable columns of a flight, kept in sync by flights/search_index.py"""
+    flight = models.OneToOneField(Flight, on_delete=models.CASCADE, primary_key=True, related_name='search_index')
+    flight_number = models.CharField(max_length=10)
+    status = models.CharField(max_length=20, choices=Flight.FLIGHT_STATUS_CHOICES)
+    
+    airline_code = models.CharField(max_length=3)
+    airline_name = models.CharField(max_length=100)
+    origin = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    origin_code = models.CharField(max_length=3)
+    origin_city = models.CharField(max_length=100)
+    origin_name = models.CharField(max_length=200)
+    destination = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+')
+    destination_code = models.CharField(max_length=3)
+    destination_city = models.CharField(max_length=100)
+    destination_name = models.CharField(max_length=200)
+    
+    departure_time = models.DateTimeField()
+    arrival_time = models.DateTimeField()
+    local_date = models.DateField()  # Departure date at the origin airport
+    duration = models.DurationField()
+    
+    economy_price = models.DecimalField(max_digits=10, decimal_places=2)
+    business_price = models.DecimalField(max_digits=10, decimal_places=2)
+    first_class_price = models.DecimalField(max_digits=10, decimal_places=2)
+    available_economy_seats = models.PositiveIntegerField()
+    available_business_seats = models.PositiveIntegerField()
+    available_first_class_seats = models.PositiveIntegerField()
+    
+    source_updated_at = models.DateTimeField()  # Flight.updated_at this row was built from
+    
+    class Meta:
+        ordering = ['departure_time']
+        indexes = [
+            models.Index(fields=['local_date', 'departure_time']),
+            models.Index(fields=['origin', 'local_date']),
+            models.Index(fields=['destination', 'local_date']),
+            models.Index(fields=['source_updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.flight_number} - {self.origin_code} to {self.destination_code}"
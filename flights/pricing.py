@@ -0,0 +1,245 @@
+"""
+Dynamic fares driven by load factor and time to departure.
+
+Bookable flights departing within ``HORIZON_DAYS`` are read in chunks of
+``CHUNK_SIZE`` rows into NumPy arrays, and every cabin of the chunk is priced
+in one vectorized pass:
+
+    price = base fare * LOAD_FACTOR_CURVE(seats sold / cabin capacity)
+                      * DAYS_CURVE(whole days to departure)
+
+Curves are lists of ``(x, multiplier)`` points, interpolated linearly and held
+flat beyond the first and last point. The combined multiplier is clipped to
+``MIN_MULTIPLIER``..``MAX_MULTIPLIER`` and prices are rounded to cents. Days
+are counted in whole days, so a flight's price only moves when it sells seats
+or crosses a day boundary, and runs a few minutes apart rewrite few rows.
+
+The base fare is ``base_<cabin>_price``, or the current price while that is
+still null. Repricing always starts from the base fare, so repeated runs never
+compound.
+
+Only flights whose price changed are written, with one parameterised
+``UPDATE`` per flight sent through ``executemany``. ``bulk_update`` builds a
+``CASE`` expression over the whole batch and is far slower at this scale. The
+base fare and ``updated_at`` are written with the new prices, so ETags and the
+search index refresh see the change; ``updated_at`` is the time of the write,
+not of the run's start, so it never moves behind a save made during the run.
+Every changed cabin gets a ``FareHistory`` row.
+Signals are bypassed, so the page cache version is bumped here.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import FloatField, Func
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+import numpy as np
+
+from core import caching
+from . import search_index
+from .models import FareHistory, Flight
+
+DEFAULTS = {
+    'HORIZON_DAYS': 365,
+    'STATUSES': ['scheduled', 'delayed'],
+    'LOAD_FACTOR_CURVE': [(0.0, 0.85), (0.5, 1.0), (0.8, 1.2), (0.95, 1.5), (1.0, 1.8)],
+    'DAYS_CURVE': [(0, 1.5), (3, 1.3), (7, 1.15), (14, 1.05), (21, 1.0), (60, 0.9)],
+    'CABIN_CURVES': {},  # Per-cabin overrides of the curves above, e.g. {'business': {'DAYS_CURVE': [...]}}
+    'MIN_MULTIPLIER': 0.5,
+    'MAX_MULTIPLIER': 3.0,
+    'CHUNK_SIZE': 100000,
+}
+
+# cabin -> (price column, available seats column, aircraft capacity column)
+CABINS = {
+    'economy': ('economy_price', 'available_economy_seats', 'economy_seats'),
+    'business': ('business_price', 'available_business_seats', 'business_seats'),
+    'first': ('first_class_price', 'available_first_class_seats', 'first_class_seats'),
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FARE_PRICING', {})}
+
+
+def _curve(points):
+    points = sorted(points)
+    return np.array([x for x, _ in points], dtype=float), np.array([y for _, y in points], dtype=float)
+
+
+def get_curves(config):
+    """``{cabin: (load factor curve, days curve)}`` as ``np.interp`` arrays."""
+    curves = {}
+    for cabin in CABINS:
+        overrides = config['CABIN_CURVES'].get(cabin, {})
+        curves[cabin] = (
+            _curve(overrides.get('LOAD_FACTOR_CURVE', config['LOAD_FACTOR_CURVE'])),
+            _curve(overrides.get('DAYS_CURVE', config['DAYS_CURVE'])),
+        )
+    return curves
+
+
+def price(base, available, capacity, days, curves, config):
+    """Vectorized prices and load factors for one cabin. All arguments are equal-length arrays."""
+    (load_x, load_y), (days_x, days_y) = curves
+    sold = np.clip(capacity - available, 0, None)
+    load_factor = np.divide(sold, capacity, out=np.zeros_like(base), where=capacity > 0)
+    multiplier = np.interp(load_factor, load_x, load_y) * np.interp(days, days_x, days_y)
+    multiplier = np.clip(multiplier, config['MIN_MULTIPLIER'], config['MAX_MULTIPLIER'])
+    return np.round(base * multiplier, 2), load_factor
+
+
+class EpochSeconds(Func):
+    """Seconds since 1970-01-01 UTC of a datetime column, computed by the database."""
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Stored as UTC text without an offset; 2440587.5 is the Julian day of the epoch
+        return self.as_sql(compiler, connection, template='((julianday(%(expressions)s) - 2440587.5) * 86400.0)')
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='EXTRACT(EPOCH FROM %(expressions)s)::double precision')
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        # Django runs MySQL sessions in UTC when USE_TZ is on
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)')
+
+    def as_oracle(self, compiler, connection, **extra_context):
+        template = "((CAST(%(expressions)s AS DATE) - DATE '1970-01-01') * 86400)"
+        return self.as_sql(compiler, connection, template=template)
+
+
+def _columns():
+    # Departure as epoch seconds: one float per row instead of a datetime object
+    columns = ['pk', EpochSeconds('departure_time')]
+    for price_field, seats_field, capacity_field in CABINS.values():
+        columns += [
+            Cast(Coalesce(f'base_{price_field}', price_field), FloatField()),
+            Cast(price_field, FloatField()),
+            Cast(seats_field, FloatField()),
+            Cast(f'aircraft__{capacity_field}', FloatField()),
+        ]
+    return columns
+
+
+def _fetch(queryset):
+    # Iterating values_list() runs a Python converter per value; the casts already yield floats
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _update_sql():
+    quote = connection.ops.quote_name
+    fields = [price_field for price_field, _, _ in CABINS.values()]
+    fields += [f'base_{price_field}' for price_field in fields] + ['updated_at']
+    assignments = ', '.join(f'{quote(Flight._meta.get_field(name).column)} = %s' for name in fields)
+    return f'UPDATE {quote(Flight._meta.db_table)} SET {assignments} WHERE {quote(Flight._meta.pk.column)} = %s'
+
+
+def _history_sql():
+    quote = connection.ops.quote_name
+    fields = ['flight', 'seat_class', 'old_price', 'new_price', 'load_factor', 'days_to_departure', 'changed_at']
+    columns = ', '.join(quote(FareHistory._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    return f'INSERT INTO {quote(FareHistory._meta.db_table)} ({columns}) VALUES ({placeholders})'
+
+
+class Repricer:
+    """Reprice upcoming flights chunk by chunk, writing only the prices that changed."""
+
+    def __init__(self, config=None, dry_run=False, now=None):
+        self.config = config or get_config()
+        self.curves = get_curves(self.config)
+        self.dry_run = dry_run
+        self.now = now or timezone.now()
+        self.scanned = 0
+        self.repriced = 0
+        self.changes = 0
+
+    def queryset(self):
+        horizon = self.now + timedelta(days=self.config['HORIZON_DAYS'])
+        return Flight.objects.filter(
+            status__in=self.config['STATUSES'],
+            departure_time__gt=self.now,
+            departure_time__lte=horizon,
+        ).order_by('pk')
+
+    def reprice(self, rows):
+        """Price one chunk of ``_columns()`` rows. Returns ``(prices per flight, history rows)``."""
+        columns = list(zip(*rows))
+        ids = np.array(columns[0], dtype=np.int64)
+        # Whole seconds: julianday() arithmetic on SQLite is only accurate to a few microseconds
+        departures = np.round(np.array(columns[1], dtype=float))
+        days = np.floor((departures - self.now.timestamp()) / 86400)
+
+        new_prices, bases = [], []
+        changed = np.zeros(len(ids), dtype=bool)
+        history = []
+        for index, cabin in enumerate(CABINS):
+            base, current, available, capacity = (
+                np.array(column, dtype=float) for column in columns[2 + index * 4:6 + index * 4]
+            )
+            new, load_factor = price(base, available, capacity, days, self.curves[cabin], self.config)
+            cabin_changed = np.abs(new - current) >= 0.005
+            changed |= cabin_changed
+            new_prices.append(new)
+            bases.append(base)
+            positions = np.flatnonzero(cabin_changed)
+            history += zip(
+                ids[positions].tolist(), [cabin] * len(positions),
+                current[positions].tolist(), new[positions].tolist(),
+                np.round(load_factor[positions], 4).tolist(), days[positions].astype(np.int64).tolist(),
+            )
+
+        selected = np.flatnonzero(changed)
+        values = np.column_stack(new_prices + bases)[selected].tolist()
+        updates = [(*row, flight_id) for row, flight_id in zip(values, ids[selected].tolist())]
+        return updates, history
+
+    def write(self, updates, history):
+        """Write one chunk of ``reprice()`` output, stamped with the current time."""
+        now = timezone.now()
+        updated_at = Flight._meta.get_field('updated_at').get_db_prep_save(now, connection)
+        changed_at = FareHistory._meta.get_field('changed_at').get_db_prep_save(now, connection)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.executemany(_update_sql(), [(*row[:-1], updated_at, row[-1]) for row in updates])
+                cursor.executemany(_history_sql(), [(*row, changed_at) for row in history])
+
+    def run(self):
+        """Reprice every upcoming flight and return the report."""
+        chunk_size = self.config['CHUNK_SIZE']
+        queryset = self.queryset().values_list(*_columns())
+        last_pk = 0
+        while True:
+            rows = _fetch(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            self.scanned += len(rows)
+            updates, history = self.reprice(rows)
+            if updates and not self.dry_run:
+                self.write(updates, history)
+            self.repriced += len(updates)
+            self.changes += len(history)
+        if self.repriced and not self.dry_run:
+            caching.bump('flights')
+            # Every row written here carries an updated_at after self.now
+            search_index.refresh(since=self.now)
+        return self.report()
+
+    def report(self):
+        return {
+            'scanned': self.scanned,
+            'repriced': self.repriced,
+            'changes': self.changes,
+            'dry_run': self.dry_run,
+        }
+
+
+def reprice_flights(dry_run=False, **overrides):
+    """Reprice upcoming flights with ``settings.FARE_PRICING`` (plus ``overrides``) and return the report."""
+    return Repricer({**get_config(), **overrides}, dry_run=dry_run).run()
@@ -0,0 +1,135 @@
+"""
+Signed fare quotes that lock a price between availability and payment.
+
+A quote is issued when availability is answered and carries everything later
+booking steps need: flight, cabin, passengers, the unit fare, taxes, service
+fee and an expiry. It is serialized with ``django.core.signing``, so it is
+self-contained and tamper-proof. Verifying it costs an HMAC and no query, and
+the booking flow never re-prices. Only seat inventory is checked again, when
+the booking is paid (see ``availability.reserve``).
+
+Configured through ``settings.FARE_QUOTE``.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core import signing
+
+DEFAULTS = {
+    'TTL': 900,  # Seconds a quoted price is held
+    'TAX_RATE': '0.12',
+    'SERVICE_FEE': '25.00',  # Per booking
+    'CURRENCY': 'USD',
+}
+
+SALT = 'flights.quotes'
+
+CENTS = Decimal('0.01')
+
+
+class QuoteError(ValueError):
+    pass
+
+
+class QuoteExpired(QuoteError):
+    pass
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FARE_QUOTE', {})}
+
+
+def window_start(now=None):
+    """Start of the current half-TTL window, as epoch seconds.
+
+    Responses carrying a quote fold this into their validators, so a cached
+    copy is never replayed once its quote has used up half of its lifetime.
+    """
+    half = max(get_config()['TTL'] // 2, 1)
+    now = time.time() if now is None else now
+    return int(now // half * half)
+
+
+@dataclass(frozen=True)
+class Quote:
+    flight_id: int
+    flight_number: str
+    seat_class: str
+    passengers: int
+    unit_price: Decimal
+    taxes: Decimal
+    service_fee: Decimal
+    expires_at: int  # Epoch seconds
+    token: str = ''
+
+    @property
+    def fare(self):
+        return self.unit_price * self.passengers
+
+    @property
+    def total(self):
+        return self.fare + self.taxes + self.service_fee
+
+    @property
+    def expires(self):
+        return datetime.fromtimestamp(self.expires_at, tz=dt_timezone.utc)
+
+    def as_dict(self):
+        return {
+            'token': self.token,
+            'seat_class': self.seat_class,
+            'passengers': self.passengers,
+            'unit_price': float(self.unit_price),
+            'fare': float(self.fare),
+            'taxes': float(self.taxes),
+            'service_fee': float(self.service_fee),
+            'total': float(self.total),
+            'currency': get_config()['CURRENCY'],
+            'expires_at': self.expires.isoformat(),
+        }
+
+
+def issue(flight_id, flight_number, seat_class, unit_price, passengers, now=None):
+    """Price ``passengers`` seats at ``unit_price`` and return a signed ``Quote``."""
+    if passengers < 1:
+        raise QuoteError('A fare quote needs at least one passenger')
+    config = get_config()
+    unit_price = Decimal(unit_price).quantize(CENTS)
+    taxes = (unit_price * passengers * Decimal(config['TAX_RATE'])).quantize(CENTS, rounding=ROUND_HALF_UP)
+    service_fee = Decimal(config['SERVICE_FEE'])
+    expires_at = int(time.time() if now is None else now) + config['TTL']
+    payload = {
+        'f': flight_id, 'n': flight_number, 'c': seat_class, 'p': passengers,
+        'u': str(unit_price), 't': str(taxes), 's': str(service_fee), 'e': expires_at,
+    }
+    token = signing.dumps(payload, salt=SALT, compress=True)
+    return Quote(flight_id, flight_number, seat_class, passengers, unit_price, taxes, service_fee, expires_at, token)
+
+
+def verify(token, flight_id=None, check_expiry=True, now=None):
+    """Decode a token back into its ``Quote``, or raise ``QuoteError``/``QuoteExpired``."""
+    try:
+        payload = signing.loads(token or '', salt=SALT)
+        quote = Quote(
+            flight_id=int(payload['f']),
+            flight_number=payload['n'],
+            seat_class=payload['c'],
+            passengers=int(payload['p']),
+            unit_price=Decimal(payload['u']),
+            taxes=Decimal(payload['t']),
+            service_fee=Decimal(payload['s']),
+            expires_at=int(payload['e']),
+            token=token,
+        )
+    except (signing.BadSignature, KeyError, TypeError, ValueError, ArithmeticError):
+        raise QuoteError('Invalid fare quote')
+    if quote.passengers < 1:
+        raise QuoteError('Invalid fare quote')
+    if flight_id is not None and quote.flight_id != int(flight_id):
+        raise QuoteError('Fare quote is for another flight')
+    if check_expiry and quote.expires_at <= (time.time() if now is None else now):
+        raise QuoteExpired('Fare quote has expired')
+    return quote
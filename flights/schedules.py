@@ -0,0 +1,103 @@
+"""
+On-demand expansion of ``FlightSchedule`` templates into concrete ``Flight`` rows.
+
+Only the dates that are searched (or pre-built by ``materialize_schedules``) get
+rows. Expansion is idempotent: existing ``(flight_number, departure_time)``
+pairs are skipped, and a batch that collides with a concurrent request is
+retried without the flights that request created.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import caching, counters
+from . import search_index
+from .models import Flight, FlightSchedule
+
+MAX_ATTEMPTS = 3
+
+
+def active_schedules(start, end):
+    """Schedules whose validity window overlaps the local dates ``start``..``end``."""
+    return FlightSchedule.objects.filter(
+        is_active=True,
+        valid_from__lte=end,
+        valid_until__gte=start,
+    ).select_related('aircraft', 'origin', 'destination')
+
+
+def materialize(schedules, dates, only_date=None):
+    """
+    Create the missing flights of ``schedules`` on the given local dates.
+
+    With ``only_date`` set, flights whose departure does not fall on that date
+    in the current timezone are skipped. Returns the number of flights created.
+    """
+    candidates = {}
+    for schedule in schedules:
+        for date in dates:
+            if not schedule.operates_on(date):
+                continue
+            flight = schedule.build_flight(date)
+            if only_date and timezone.localtime(flight.departure_time).date() != only_date:
+                continue
+            candidates[(flight.flight_number, flight.departure_time)] = flight
+    
+    if not candidates:
+        return 0
+    
+    # Plain inserts in a savepoint rather than ignore_conflicts, so that a successful
+    # insert means every row is ours and the counters below are exact. A concurrent
+    # request that materialized some of the same flights fails the batch; retry without them.
+    for _ in range(MAX_ATTEMPTS):
+        existing = set(Flight.objects.filter(
+            flight_number__in={key[0] for key in candidates},
+            departure_time__in={key[1] for key in candidates},
+        ).values_list('flight_number', 'departure_time'))
+        new_flights = [flight for key, flight in candidates.items() if key not in existing]
+        if not new_flights:
+            return 0
+        try:
+            with transaction.atomic():
+                Flight.objects.bulk_create(new_flights)
+                # bulk_create skips the counter signals; materialized flights are always 'scheduled'
+                counters.increment('flights', len(new_flights))
+                counters.increment('flights:status:scheduled', len(new_flights))
+        except IntegrityError:
+            for flight in new_flights:
+                flight.pk = None
+            continue
+        break
+    else:
+        return 0
+
+    caching.bump('flights', 'schedule')
+    # Searches read the index right after materializing, so the new rows are indexed now
+    search_index.sync(Flight.objects.filter(
+        flight_number__in={flight.flight_number for flight in new_flights},
+        departure_time__in={flight.departure_time for flight in new_flights},
+    ))
+    return len(new_flights)
+
+
+def materialize_for_date(date, route_filter=Q(), local=False):
+    """
+    Make sure every scheduled flight departing on ``date`` exists.
+
+    Local operating dates around ``date`` are expanded too, because an
+    airport's local date can differ from the date in the site timezone.
+    With ``local`` set, ``date`` is the local date at the origin airport.
+    """
+    if local:
+        return materialize(active_schedules(date, date).filter(route_filter), [date])
+    dates = [date - timedelta(days=1), date, date + timedelta(days=1)]
+    schedules = active_schedules(dates[0], dates[-1]).filter(route_filter)
+    return materialize(schedules, dates, only_date=date)
+
+
+def materialize_range(start, end):
+    """Expand all schedules for every local date from ``start`` to ``end`` inclusive."""
+    dates = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    return materialize(active_schedules(start, end), dates)
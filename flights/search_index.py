@@ -0,0 +1,172 @@
+"""
+Maintenance of ``FlightSearchIndex``, the flat table flight search reads.
+
+Each row copies the columns search filters, sorts and displays: airport and
+airline codes and names, the departure date at the origin, and per-cabin
+price and availability. With those on one row, search needs no joins.
+
+Rows are kept in sync two ways:
+
+* ``post_save`` of a ``Flight``, ``Airport`` or ``Airline`` updates the
+  affected rows (see ``flights/signals.py``); deleting a flight cascades.
+* Bulk writers skip those signals. Materialization and seat reservations
+  ``sync()`` the rows they wrote. Schedule import, the status feed and the
+  pricing engine set ``Flight.updated_at`` and finish with
+  ``refresh(since=<their start time>)``. Without ``since``, ``refresh()``
+  starts from the newest ``source_updated_at`` already indexed. The window
+  reaches back ``REFRESH_OVERLAP`` so that transactions committing late are
+  not missed. Re-copying a row is idempotent.
+
+``rebuild()`` recreates the whole table and ``check()`` compares it against
+the flights it was built from.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+
+from core.utils import get_zone
+from .models import Flight, FlightSearchIndex
+
+BATCH_SIZE = 2000
+
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+SOURCE_FIELDS = [
+    'id', 'flight_number', 'status',
+    'airline__code', 'airline__name',
+    'origin_id', 'origin__code', 'origin__city', 'origin__name', 'origin__timezone',
+    'destination_id', 'destination__code', 'destination__city', 'destination__name',
+    'departure_time', 'arrival_time', 'duration',
+    'economy_price', 'business_price', 'first_class_price',
+    'available_economy_seats', 'available_business_seats', 'available_first_class_seats',
+    'updated_at',
+]
+
+# Index columns copied as-is from the flight
+COPIED = [
+    'flight_number', 'status', 'departure_time', 'arrival_time', 'duration',
+    'economy_price', 'business_price', 'first_class_price',
+    'available_economy_seats', 'available_business_seats', 'available_first_class_seats',
+]
+
+UPDATE_FIELDS = [
+    field.name for field in FlightSearchIndex._meta.concrete_fields if not field.primary_key
+]
+
+
+def build_row(values):
+    """Unsaved ``FlightSearchIndex`` for a flight given as a ``SOURCE_FIELDS`` dict."""
+    return FlightSearchIndex(
+        flight_id=values['id'],
+        airline_code=values['airline__code'],
+        airline_name=values['airline__name'],
+        origin_id=values['origin_id'],
+        origin_code=values['origin__code'],
+        origin_city=values['origin__city'],
+        origin_name=values['origin__name'],
+        destination_id=values['destination_id'],
+        destination_code=values['destination__code'],
+        destination_city=values['destination__city'],
+        destination_name=values['destination__name'],
+        local_date=values['departure_time'].astimezone(get_zone(values['origin__timezone'])).date(),
+        source_updated_at=values['updated_at'],
+        **{field: values[field] for field in COPIED},
+    )
+
+
+def _write(rows, batch_size):
+    with transaction.atomic():
+        FlightSearchIndex.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['flight'],
+            update_fields=UPDATE_FIELDS,
+        )
+
+
+def sync(flights, batch_size=BATCH_SIZE):
+    """Upsert the index rows of a ``Flight`` queryset. Returns the number of rows written."""
+    written = 0
+    rows = []
+    for values in flights.order_by('pk').values(*SOURCE_FIELDS).iterator(chunk_size=batch_size):
+        rows.append(build_row(values))
+        if len(rows) >= batch_size:
+            _write(rows, batch_size)
+            written += len(rows)
+            rows = []
+    if rows:
+        _write(rows, batch_size)
+        written += len(rows)
+    return written
+
+
+def refresh(since=None, batch_size=BATCH_SIZE):
+    """
+    Re-index flights updated since ``since``, or by default since the newest
+    row already indexed. Returns the number of rows written.
+
+    Bulk writers pass the time they started: single-row syncs made while they
+    run move the newest indexed row past the ``updated_at`` they stamped.
+    """
+    if since is None:
+        since = FlightSearchIndex.objects.aggregate(newest=Max('source_updated_at'))['newest']
+    flights = Flight.objects.all()
+    if since is not None:
+        flights = flights.filter(updated_at__gte=since - REFRESH_OVERLAP)
+    return sync(flights, batch_size=batch_size)
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Recreate the whole index. Returns the number of rows written."""
+    with transaction.atomic():
+        FlightSearchIndex.objects.all().delete()
+        return sync(Flight.objects.all(), batch_size=batch_size)
+
+
+def check(fix=False, batch_size=BATCH_SIZE):
+    """
+    Compare every index row with the row ``build_row`` makes from its flight.
+
+    Returns ``{'checked', 'missing', 'stale', 'orphaned'}`` counts and, with
+    ``fix``, rewrites missing and stale rows and deletes orphans.
+    """
+    report = {'checked': 0, 'missing': 0, 'stale': 0, 'orphaned': 0}
+    compared = ['flight_id'] + UPDATE_FIELDS
+    compared = [FlightSearchIndex._meta.get_field(name).attname for name in compared]
+    last_pk = 0
+    while True:
+        sources = list(
+            Flight.objects.filter(pk__gt=last_pk).order_by('pk').values(*SOURCE_FIELDS)[:batch_size]
+        )
+        if not sources:
+            break
+        last_pk = sources[-1]['id']
+        stored = {
+            row['flight_id']: row
+            for row in FlightSearchIndex.objects.filter(
+                flight_id__in=[values['id'] for values in sources]
+            ).values(*compared)
+        }
+        outdated = []
+        for values in sources:
+            expected = build_row(values)
+            row = stored.get(values['id'])
+            if row is None:
+                report['missing'] += 1
+            elif any(row[name] != getattr(expected, name) for name in compared):
+                report['stale'] += 1
+            else:
+                continue
+            outdated.append(expected)
+        report['checked'] += len(sources)
+        if fix and outdated:
+            _write(outdated, batch_size)
+
+    # Rows whose flight is gone can only appear if flights were deleted outside the ORM
+    orphans = FlightSearchIndex.objects.exclude(flight_id__in=Flight.objects.values('pk'))
+    report['orphaned'] = orphans.count()
+    if fix and report['orphaned']:
+        orphans.delete()
+    return report
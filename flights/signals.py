@@ -0,0 +1,41 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import Airline, Airport
+from . import search_index
+from .models import Flight, FlightSearchIndex
+
+
+@receiver(post_save, sender=Flight)
+def flight_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search_index.sync(Flight.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_save, sender=Airport)
+def airport_saving(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._previous_timezone = Airport.objects.filter(pk=instance.pk).values_list('timezone', flat=True).first()
+
+
+@receiver(post_save, sender=Airport)
+def airport_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    FlightSearchIndex.objects.filter(origin=instance).update(
+        origin_code=instance.code, origin_city=instance.city, origin_name=instance.name,
+    )
+    FlightSearchIndex.objects.filter(destination=instance).update(
+        destination_code=instance.code, destination_city=instance.city, destination_name=instance.name,
+    )
+    if getattr(instance, '_previous_timezone', instance.timezone) != instance.timezone:
+        # Local departure dates move with the origin's timezone
+        search_index.sync(Flight.objects.filter(origin=instance))
+
+
+@receiver(post_save, sender=Airline)
+def airline_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        FlightSearchIndex.objects.filter(flight__airline=instance).update(
+            airline_code=instance.code, airline_name=instance.name,
+        )
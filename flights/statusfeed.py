@@ -0,0 +1,268 @@
+"""
+Bulk ingestion of the operational status feed.
+
+Each update names a flight by ``(flight_number, departure_time)`` and carries
+any of ``status``, ``gate``, ``terminal``, ``arrival_time`` and
+``new_departure_time``. A missing field leaves the flight's value unchanged,
+and an empty ``gate``/``terminal`` clears it. Times must include a UTC
+offset.
+
+Per batch, current values are loaded with one query, compared in memory, and
+only flights that actually changed are written, with ``bulk_update`` limited
+to the fields that changed. A departure change into a slot that stays taken,
+by a flight outside the batch or by an earlier line of it, is rejected;
+flights may swap or chain slots within one batch.
+``updated_at`` is set explicitly, because ``bulk_update`` does not apply
+``auto_now``, and the live status stream polls that column. ``bulk_update``
+sends no signals, so the page cache version and the status counters are
+adjusted here.
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import caching, counters
+from . import search_index
+from .importer import STATUSES, read_rows
+from .models import Flight
+
+BATCH_SIZE = 2000
+
+UPDATE_FIELDS = ['status', 'gate', 'terminal', 'departure_time', 'arrival_time', 'duration', 'updated_at']
+
+# Placeholder departures (plus the flight id in seconds) while a batch reshuffles slots
+PARKING = datetime(1900, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class StatusRowError(ValueError):
+    pass
+
+
+def _text(row, field):
+    # JSON feeds may carry numbers (or worse) where CSV always has strings
+    value = row.get(field)
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        raise StatusRowError(f'{field} is not a value: {value!r}')
+    return str(value).strip()
+
+
+def _datetime(value, field):
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise StatusRowError(f'{field} is not a valid datetime: {value!r}')
+    if timezone.is_naive(parsed):
+        raise StatusRowError(f'{field} must include a UTC offset: {value!r}')
+    return parsed
+
+
+def parse_update(row):
+    """Validate one feed row and return ``(key, changes)``."""
+    if not isinstance(row, dict):
+        raise StatusRowError('row is not an object')
+    flight_number = _text(row, 'flight_number').upper()
+    if not flight_number:
+        raise StatusRowError('flight_number is required')
+    key = (flight_number, _datetime(row.get('departure_time'), 'departure_time'))
+
+    changes = {}
+    status = _text(row, 'status').lower()
+    if status:
+        if status not in STATUSES:
+            raise StatusRowError(f'unknown status {status!r}')
+        changes['status'] = status
+    for field in ('gate', 'terminal'):
+        if row.get(field) is not None:
+            value = _text(row, field)
+            if len(value) > 10:
+                raise StatusRowError(f'{field} is limited to 10 characters')
+            changes[field] = value
+    if row.get('arrival_time'):
+        changes['arrival_time'] = _datetime(row['arrival_time'], 'arrival_time')
+    if row.get('new_departure_time'):
+        changes['departure_time'] = _datetime(row['new_departure_time'], 'new_departure_time')
+    return key, changes
+
+
+class StatusFeedIngester:
+    """Apply feed updates in batches, writing only the flights that changed."""
+
+    def __init__(self, batch_size=BATCH_SIZE, max_rejects=1000):
+        self.batch_size = batch_size
+        self.max_rejects = max_rejects
+        self.read = 0
+        self.applied = 0
+        self.unchanged = 0
+        self.unknown = 0
+        self.rejected = 0
+        self.rejects = []
+
+    def reject(self, line, reason):
+        self.rejected += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append({'line': line, 'reason': reason})
+
+    def _load(self, keys):
+        candidates = Flight.objects.filter(
+            flight_number__in={key[0] for key in keys},
+            departure_time__in={key[1] for key in keys},
+        ).only('id', 'flight_number', *UPDATE_FIELDS)
+        # The IN x IN filter is a superset; keep exact key matches only
+        return {
+            (flight.flight_number, flight.departure_time): flight
+            for flight in candidates
+            if (flight.flight_number, flight.departure_time) in keys
+        }
+
+    def _taken(self, moves):
+        """Keys among the requested departure changes that already belong to another flight."""
+        if not moves:
+            return set()
+        return set(Flight.objects.filter(
+            flight_number__in={key[0] for key in moves},
+            departure_time__in={key[1] for key in moves},
+        ).values_list('flight_number', 'departure_time')) & moves
+
+    def _resolve_moves(self, updates):
+        """
+        Drop the departure changes that would collide, and return the updates that remain.
+
+        A new departure is free if no flight holds it, or if the flight holding it
+        moves away in this batch; of several updates claiming the same slot, the
+        first line wins. Rejecting a move keeps its flight in its old slot, so
+        this repeats until no more moves are rejected.
+        """
+        moves = [update for update in updates if 'departure_time' in update[2]]
+        if not moves:
+            return updates
+        taken = self._taken({(flight.flight_number, diff['departure_time']) for _, flight, diff in moves})
+        rejected = {}
+        while True:
+            active = [move for move in moves if move[0] not in rejected]
+            vacated = {(flight.flight_number, flight.departure_time) for _, flight, _ in active}
+            claimed = set()
+            for line, flight, diff in active:
+                target = (flight.flight_number, diff['departure_time'])
+                if target in claimed or (target in taken and target not in vacated):
+                    rejected[line] = target
+                else:
+                    claimed.add(target)
+            if len(active) == len(moves) - len(rejected):
+                break
+        for line, (flight_number, departure) in rejected.items():
+            self.reject(line, f'{flight_number} already has a flight departing at {departure.isoformat()}')
+        return [update for update in updates if update[0] not in rejected]
+
+    def _park(self, moving):
+        """Move flights whose slot another flight takes to a unique placeholder departure first.
+
+        Unique constraints are checked row by row during an UPDATE, so without
+        this a swap (or any chain of moves) could collide halfway.
+        """
+        targets = {(flight.flight_number, flight.departure_time) for flight in moving}
+        parked = [
+            Flight(pk=flight.pk, departure_time=PARKING + timedelta(seconds=flight.pk))
+            for flight, old_departure in moving.items()
+            if (flight.flight_number, old_departure) in targets
+        ]
+        if parked:
+            Flight.objects.bulk_update(parked, ['departure_time'], batch_size=self.batch_size)
+
+    def flush(self, batch):
+        if not batch:
+            return
+        flights = self._load(batch.keys())
+        updates = []
+        for key, (line, changes) in batch.items():
+            flight = flights.get(key)
+            if flight is None:
+                self.unknown += 1
+                continue
+            new_departure = changes.get('departure_time', flight.departure_time)
+            new_arrival = changes.get('arrival_time', flight.arrival_time)
+            if new_arrival <= new_departure:
+                self.reject(line, 'arrival_time must be after departure_time')
+                continue
+            diff = {field: value for field, value in changes.items() if getattr(flight, field) != value}
+            if not diff:
+                self.unchanged += 1
+                continue
+            updates.append((line, flight, diff))
+        updates = self._resolve_moves(updates)
+
+        now = timezone.now()
+        # bulk_update cost grows with the number of fields, so flights are grouped by what changed
+        by_fields = {}
+        status_moves = Counter()
+        # Flight -> departure before this batch, for the flights changing departure
+        moving = {}
+        for _, flight, diff in updates:
+            old_status = flight.status
+            if 'departure_time' in diff:
+                moving[flight] = flight.departure_time
+            for field, value in diff.items():
+                setattr(flight, field, value)
+            fields = sorted(diff)
+            if 'departure_time' in diff or 'arrival_time' in diff:
+                flight.duration = flight.arrival_time - flight.departure_time
+                fields.append('duration')
+            flight.updated_at = now
+            by_fields.setdefault(tuple(fields) + ('updated_at',), []).append(flight)
+            if flight.status != old_status:
+                status_moves[(old_status, flight.status)] += 1
+
+        if updates:
+            with transaction.atomic():
+                self._park(moving)
+                for fields, group in by_fields.items():
+                    Flight.objects.bulk_update(group, fields, batch_size=self.batch_size)
+                for (old_status, new_status), count in status_moves.items():
+                    counters.increment(f'flights:status:{old_status}', -count)
+                    counters.increment(f'flights:status:{new_status}', count)
+            caching.bump('flights')
+            if any(not Flight.SCHEDULE_FIELDS.isdisjoint(fields) for fields in by_fields):
+                caching.bump('schedule')
+        self.applied += len(updates)
+        batch.clear()
+
+    def run(self, rows):
+        """Apply an iterable of feed rows and return the report."""
+        # Keyed on the flight so a repeated update within a batch keeps the last version
+        batch = {}
+        started = timezone.now()
+        for line, row in enumerate(rows, start=1):
+            self.read += 1
+            try:
+                key, changes = parse_update(row)
+            except StatusRowError as e:
+                self.reject(line, str(e))
+                continue
+            if key in batch:
+                # Several updates for one flight in a batch merge, later fields winning
+                changes = {**batch[key][1], **changes}
+            batch[key] = (line, changes)
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+        self.flush(batch)
+        if self.applied:
+            search_index.refresh(since=started)
+        return self.report()
+
+    def report(self):
+        return {
+            'read': self.read,
+            'applied': self.applied,
+            'unchanged': self.unchanged,
+            'unknown': self.unknown,
+            'rejected': self.rejected,
+            'rejects': self.rejects,
+        }
+
+
+def ingest_status_feed(stream, fmt, batch_size=BATCH_SIZE):
+    """Apply a ``csv``/``json`` status feed from a text stream and return the report."""
+    return StatusFeedIngester(batch_size=batch_size).run(read_rows(stream, fmt))
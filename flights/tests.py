@@ -1,3 +1,492 @@
+import json
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+
+from core import counters
+from core.models import Airline, Airport
+from . import availability, live, pricing, quotes, schedules, search_index
+from .importer import import_schedule
+from .models import Aircraft, FareHistory, Flight, FlightSchedule, FlightSearchIndex
+from .statusfeed import StatusFeedIngester
+
+
+def make_flight(aircraft, origin, destination, flight_number, departure_time, **fields):
+    return Flight.objects.create(
+        flight_number=flight_number,
+        airline=aircraft.airline,
+        aircraft=aircraft,
+        origin=origin,
+        destination=destination,
+        departure_time=departure_time,
+        arrival_time=departure_time + timedelta(hours=7),
+        duration=timedelta(hours=7),
+        economy_price=Decimal('300.00'),
+        **{'available_economy_seats': aircraft.economy_seats, **fields}
+    )
+
+
+class StatusFeedDepartureChangeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        cls.aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=150, economy_seats=150)
+        cls.origin = Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK')
+        cls.destination = Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR')
+        cls.t1 = datetime(2030, 5, 1, 10, tzinfo=dt_timezone.utc)
+        cls.t2 = cls.t1 + timedelta(hours=1)
+        cls.t3 = cls.t1 + timedelta(hours=2)
+
+    def flight(self, departure_time):
+        return make_flight(self.aircraft, self.origin, self.destination, 'TA1', departure_time)
+
+    def move(self, departure_time, new_departure_time):
+        return {
+            'flight_number': 'TA1',
+            'departure_time': departure_time.isoformat(),
+            'new_departure_time': new_departure_time.isoformat(),
+            'arrival_time': (new_departure_time + timedelta(hours=7)).isoformat(),
+        }
+
+    def test_two_moves_into_the_same_slot_reject_the_second(self):
+        first = self.flight(self.t1)
+        second = self.flight(self.t2)
+
+        report = StatusFeedIngester().run([self.move(self.t1, self.t3), self.move(self.t2, self.t3)])
+
+        self.assertEqual(report['applied'], 1)
+        self.assertEqual(report['rejected'], 1)
+        self.assertEqual(report['rejects'][0]['line'], 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.departure_time, self.t3)
+        self.assertEqual(second.departure_time, self.t2)
+
+    def test_move_into_a_slot_vacated_in_the_same_batch(self):
+        first = self.flight(self.t1)
+        second = self.flight(self.t2)
+
+        report = StatusFeedIngester().run([self.move(self.t1, self.t2), self.move(self.t2, self.t3)])
+
+        self.assertEqual(report['rejected'], 0)
+        self.assertEqual(report['applied'], 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.departure_time, self.t2)
+        self.assertEqual(second.departure_time, self.t3)
+
+    def test_swap(self):
+        first = self.flight(self.t1)
+        second = self.flight(self.t2)
+
+        report = StatusFeedIngester().run([self.move(self.t1, self.t2), self.move(self.t2, self.t1)])
+
+        self.assertEqual(report['applied'], 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.departure_time, self.t2)
+        self.assertEqual(second.departure_time, self.t1)
+
+    def test_move_into_a_slot_that_stays_taken(self):
+        first = self.flight(self.t1)
+        self.flight(self.t2)
+
+        report = StatusFeedIngester().run([self.move(self.t1, self.t2)])
+
+        self.assertEqual(report['applied'], 0)
+        self.assertEqual(report['rejected'], 1)
+        first.refresh_from_db()
+        self.assertEqual(first.departure_time, self.t1)
+
+    def test_rejected_move_keeps_its_slot_occupied(self):
+        # Line 2 loses t3 to line 1, so the flight at t2 stays and line 3 cannot take t2
+        self.flight(self.t1)
+        self.flight(self.t2)
+        third = self.flight(self.t3 + timedelta(hours=1))
+        t4 = third.departure_time
+
+        report = StatusFeedIngester().run([
+            self.move(self.t1, self.t3),
+            self.move(self.t2, self.t3),
+            self.move(t4, self.t2),
+        ])
+
+        self.assertEqual(report['applied'], 1)
+        self.assertEqual([reject['line'] for reject in report['rejects']], [2, 3])
+        third.refresh_from_db()
+        self.assertEqual(third.departure_time, t4)
+
+    def test_non_string_values_are_rejected_or_coerced(self):
+        flight = self.flight(self.t1)
+        rows = [
+            {'flight_number': {'code': 'TA1'}, 'departure_time': self.t1.isoformat()},
+            {'flight_number': 'TA1', 'departure_time': self.t1.isoformat(), 'status': ['boarding']},
+            {'flight_number': 'TA1', 'departure_time': self.t1.isoformat(), 'gate': 12},
+        ]
+
+        report = StatusFeedIngester().run(rows)
+
+        self.assertEqual([reject['line'] for reject in report['rejects']], [1, 2])
+        self.assertEqual(report['applied'], 1)
+        flight.refresh_from_db()
+        self.assertEqual(flight.gate, '12')
+
+
+class AvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=150, economy_seats=150)
+        origin = Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK')
+        destination = Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR')
+        cls.flight = make_flight(aircraft, origin, destination, 'TA1', datetime(2030, 5, 1, 10, tzinfo=dt_timezone.utc))
+
+    def test_passengers_below_one_are_rejected(self):
+        for passengers in ['0', '-2', 'two']:
+            with self.subTest(passengers=passengers):
+                response = self.client.get(reverse('flights:availability', args=[self.flight.pk]),
+                                           {'passengers': passengers})
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn('ETag', response)
+
+    def test_answer_carries_a_quote(self):
+        response = self.client.get(reverse('flights:availability', args=[self.flight.pk]), {'passengers': 2})
+
+        quote = quotes.verify(response.json()['quote']['token'], flight_id=self.flight.pk)
+        self.assertEqual(quote.passengers, 2)
+
+    def test_no_quote_below_one_passenger(self):
+        with self.assertRaises(quotes.QuoteError):
+            quotes.issue(self.flight.pk, 'TA1', 'economy', Decimal('300.00'), 0)
+
+    def test_reserve_refuses_negative_counts(self):
+        with self.assertRaises(ValueError):
+            availability.reserve(self.flight.pk, 'economy', -3)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.available_economy_seats, 150)
+
+
+class StatusBroadcasterTests(TestCase):
+    def setUp(self):
+        self.broadcaster = live.StatusBroadcaster(poll_interval=60, max_subscribers=10, queue_size=10)
+        self.subscription = live.Subscription([1], [], queue_size=10)
+        self.broadcaster._by_flight[1].add(self.subscription)
+        self.row = {
+            'id': 1, 'flight_number': 'TA1', 'origin_id': 7, 'origin__code': 'JFK', 'destination__code': 'LHR',
+            'updated_at': None, 'status': 'scheduled', 'gate': 'A1', 'terminal': '4',
+            'departure_time': datetime(2030, 5, 1, 10, tzinfo=dt_timezone.utc),
+            'arrival_time': datetime(2030, 5, 1, 17, tzinfo=dt_timezone.utc),
+        }
+
+    def test_seeded_flight_publishes_only_tracked_changes(self):
+        self.broadcaster.seed([self.row])
+
+        self.broadcaster.publish(dict(self.row))  # e.g. a seat sold after a restart
+        self.assertTrue(self.subscription.queue.empty())
+
+        self.broadcaster.publish({**self.row, 'gate': 'B7'})
+        self.assertIn('"gate": "B7"', self.subscription.queue.get_nowait())
+
+    def test_seed_leaves_known_values_to_the_poll_loop(self):
+        self.broadcaster.seed([self.row])
+
+        self.broadcaster.seed([{**self.row, 'status': 'delayed'}])
+        self.broadcaster.publish({**self.row, 'status': 'delayed'})
+
+        self.assertIn('"status": "delayed"', self.subscription.queue.get_nowait())
+
+
+class RepricerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        cls.aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=100, economy_seats=100)
+        cls.origin = Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK')
+        cls.destination = Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR')
+
+    def flight(self, number, days, available):
+        return make_flight(self.aircraft, self.origin, self.destination, number,
+                           timezone.now() + timedelta(days=days, hours=12), available_economy_seats=available)
+
+    def config(self):
+        return {**pricing.DEFAULTS, 'LOAD_FACTOR_CURVE': [(0.0, 1.0), (1.0, 2.0)], 'DAYS_CURVE': [(0, 1.0)]}
+
+    def test_prices_follow_the_load_factor_from_the_base_fare(self):
+        empty = self.flight('TA1', 30, available=100)
+        half = self.flight('TA2', 30, available=50)
+
+        report = pricing.Repricer(self.config()).run()
+        pricing.Repricer(self.config()).run()  # Starts from the base fare again: no compounding
+
+        empty.refresh_from_db()
+        half.refresh_from_db()
+        self.assertEqual(report['repriced'], 1)
+        self.assertEqual(empty.economy_price, Decimal('300.00'))
+        self.assertEqual(half.economy_price, Decimal('450.00'))
+        self.assertEqual(half.base_economy_price, Decimal('300.00'))
+        history = FareHistory.objects.get()
+        self.assertEqual((history.flight_id, history.old_price, history.new_price), (half.pk, Decimal('300.00'), Decimal('450.00')))
+
+    def test_dry_run_writes_nothing(self):
+        flight = self.flight('TA1', 30, available=50)
+
+        report = pricing.Repricer(self.config(), dry_run=True).run()
+
+        flight.refresh_from_db()
+        self.assertEqual(report['repriced'], 1)
+        self.assertEqual(flight.economy_price, Decimal('300.00'))
+        self.assertFalse(FareHistory.objects.exists())
+
+    def test_updated_at_is_the_write_time(self):
+        flight = self.flight('TA1', 30, available=50)
+        # A run that started before the flight's last save must not move updated_at back
+        started = flight.updated_at - timedelta(minutes=5)
+
+        pricing.Repricer(self.config(), now=started).run()
+
+        saved_at = flight.updated_at
+        flight.refresh_from_db()
+        self.assertGreaterEqual(flight.updated_at, saved_at)
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        cls.aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=150, economy_seats=150)
+        cls.origin = Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK',
+                                            timezone='America/New_York')
+        cls.destination = Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR')
+        # 02:00 UTC is still the previous evening in New York
+        cls.departure = datetime(2030, 5, 1, 2, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.flight = make_flight(self.aircraft, self.origin, self.destination, 'TA1', self.departure)
+
+    def bulk_write(self, updated_at, **fields):
+        # Like the bulk writers: no signals, updated_at set explicitly
+        Flight.objects.filter(pk=self.flight.pk).update(updated_at=updated_at, **fields)
+
+    def test_saving_a_flight_indexes_it(self):
+        row = FlightSearchIndex.objects.get(flight=self.flight)
+
+        self.assertEqual((row.origin_code, row.destination_city), ('JFK', 'London'))
+        self.assertEqual(row.local_date.isoformat(), '2030-04-30')
+        self.assertEqual(row.source_updated_at, self.flight.updated_at)
+
+    def test_refresh_picks_up_rows_written_without_signals(self):
+        self.bulk_write(timezone.now() + timedelta(seconds=1), available_economy_seats=3)
+
+        search_index.refresh()
+
+        self.assertEqual(FlightSearchIndex.objects.get(flight=self.flight).available_economy_seats, 3)
+
+    def test_refresh_since_covers_a_long_bulk_run(self):
+        started = timezone.now() - timedelta(minutes=30)
+        self.bulk_write(started, economy_price=Decimal('410.00'))
+        # A single-row sync during the run moves the newest indexed row past the bulk write
+        other = make_flight(self.aircraft, self.origin, self.destination, 'TA2', self.departure)
+
+        search_index.refresh()
+        self.assertEqual(FlightSearchIndex.objects.get(flight=self.flight).economy_price, Decimal('300.00'))
+
+        search_index.refresh(since=started)
+        self.assertEqual(FlightSearchIndex.objects.get(flight=self.flight).economy_price, Decimal('410.00'))
+        self.assertTrue(FlightSearchIndex.objects.filter(flight=other).exists())
+
+    def test_airport_changes_reach_the_index(self):
+        self.destination.city = 'Greater London'
+        self.destination.save()
+        self.origin.timezone = 'UTC'
+        self.origin.save()
+
+        row = FlightSearchIndex.objects.get(flight=self.flight)
+        self.assertEqual(row.destination_city, 'Greater London')
+        self.assertEqual(row.local_date.isoformat(), '2030-05-01')
+
+    def test_check_reports_and_fixes_drift(self):
+        other = make_flight(self.aircraft, self.origin, self.destination, 'TA2', self.departure)
+        FlightSearchIndex.objects.filter(flight=other).delete()
+        self.bulk_write(self.flight.updated_at, status='delayed')
+
+        self.assertEqual(search_index.check(), {'checked': 2, 'missing': 1, 'stale': 1, 'orphaned': 0})
+        search_index.check(fix=True)
+        self.assertEqual(search_index.check(), {'checked': 2, 'missing': 0, 'stale': 0, 'orphaned': 0})
+        self.assertEqual(FlightSearchIndex.objects.get(flight=self.flight).status, 'delayed')
+
+
+class ScheduleImportTests(TestCase):
+    HEADER = 'flight_number,airline,aircraft,origin,destination,departure_time,arrival_time,economy_price\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.airline = Airline.objects.create(name='Test Air', code='TA')
+        cls.aircraft = Aircraft.objects.create(model='A320', airline=cls.airline, capacity=150, economy_seats=150)
+        Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK',
+                               timezone='America/New_York')
+        Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR',
+                               timezone='Europe/London')
+
+    def import_csv(self, *lines):
+        return import_schedule(StringIO(self.HEADER + ''.join(line + '\n' for line in lines)), 'csv')
+
+    def test_times_without_offset_are_local_to_each_airport(self):
+        report = self.import_csv('ta1,ta,A320,jfk,lhr,2030-01-15T18:00,2030-01-16T06:00,300')
+
+        self.assertEqual((report['read'], report['upserted'], report['rejected']), (1, 1, 0))
+        flight = Flight.objects.get(flight_number='TA1')
+        self.assertEqual(flight.departure_time, datetime(2030, 1, 15, 23, tzinfo=dt_timezone.utc))
+        self.assertEqual(flight.arrival_time, datetime(2030, 1, 16, 6, tzinfo=dt_timezone.utc))
+        self.assertEqual(flight.duration, timedelta(hours=7))
+        self.assertEqual((flight.aircraft, flight.base_economy_price), (self.aircraft, Decimal('300')))
+        self.assertTrue(FlightSearchIndex.objects.filter(flight=flight).exists())
+        self.assertEqual(counters.get('flights')['flights'], 1)
+
+    def test_reimport_updates_fares_but_keeps_sold_seats(self):
+        row = 'TA1,TA,{},JFK,LHR,2030-01-15T18:00,2030-01-16T06:00,{}'
+        self.import_csv(row.format(self.aircraft.pk, 300))
+        Flight.objects.update(available_economy_seats=90)
+
+        self.import_csv(row.format('a320', 350))
+
+        flight = Flight.objects.get()
+        self.assertEqual((flight.economy_price, flight.available_economy_seats), (Decimal('350'), 90))
+        self.assertEqual(FlightSearchIndex.objects.get(flight=flight).economy_price, Decimal('350'))
+
+    def test_bad_rows_are_reported_by_line(self):
+        report = self.import_csv(
+            'TA1,XX,A320,JFK,LHR,2030-01-15T18:00,2030-01-16T06:00,300',
+            'TA2,TA,A320,JFK,LHR,2030-01-15T18:00,2030-01-15T17:00,300',
+            'TA3,TA,A320,JFK,LHR,2030-01-15T18:00,2030-01-16T06:00,-1',
+            'TA4,TA,B747,JFK,LHR,2030-01-15T18:00,2030-01-16T06:00,300',
+            'TA5,TA,A320,JFK,LHR,tomorrow,2030-01-16T06:00,300',
+            'TA6,TA,A320,JFK,LHR,2030-01-15T18:00,2030-01-16T06:00,300',
+        )
+
+        self.assertEqual((report['upserted'], report['rejected']), (1, 5))
+        self.assertEqual([reject['line'] for reject in report['rejects']], [1, 2, 3, 4, 5])
+        self.assertIn("unknown airline 'XX'", report['rejects'][0]['reason'])
+        self.assertEqual(list(Flight.objects.values_list('flight_number', flat=True)), ['TA6'])
+
+    def test_json_rows_may_carry_numbers_but_not_objects(self):
+        flight = {
+            'flight_number': 'TA1', 'airline': 'TA', 'aircraft': self.aircraft.pk, 'origin': 'JFK',
+            'destination': 'LHR', 'departure_time': '2030-01-15T18:00:00-05:00',
+            'arrival_time': '2030-01-16T06:00:00+00:00', 'economy_price': 300,
+        }
+        rows = [flight, {**flight, 'flight_number': 'TA2', 'gate': {'number': 4}}, 'TA3']
+
+        report = import_schedule(StringIO(json.dumps({'flights': rows})), 'json')
+
+        self.assertEqual((report['upserted'], report['rejected']), (1, 2))
+        self.assertEqual(Flight.objects.get().economy_price, Decimal('300'))
+
+
+class ScheduleMaterializeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=150, economy_seats=150)
+        cls.schedule = FlightSchedule.objects.create(
+            flight_number='TA1',
+            airline=airline,
+            aircraft=aircraft,
+            origin=Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK',
+                                          timezone='America/New_York'),
+            destination=Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR'),
+            days_of_week='135',  # Mon, Wed, Fri
+            valid_from=date(2030, 1, 7),  # A Monday
+            valid_until=date(2030, 1, 16),
+            departure_time=time(21, 0),
+            duration=timedelta(hours=7),
+            economy_price=Decimal('300.00'),
+        )
+
+    def departures(self):
+        return [
+            flight.departure_time
+            for flight in Flight.objects.order_by('departure_time')
+        ]
+
+    def test_range_creates_operating_days_once(self):
+        self.assertEqual(schedules.materialize_range(date(2030, 1, 1), date(2030, 1, 31)), 5)
+        self.assertEqual(schedules.materialize_range(date(2030, 1, 1), date(2030, 1, 31)), 0)
+
+        # 21:00 in New York is 02:00 UTC the next day
+        self.assertEqual(self.departures(), [
+            datetime(2030, 1, day, 2, tzinfo=dt_timezone.utc) for day in (8, 10, 12, 15, 17)
+        ])
+        flight = Flight.objects.first()
+        self.assertEqual((flight.available_economy_seats, flight.status), (150, 'scheduled'))
+        self.assertEqual(counters.get('flights', 'flights:status:scheduled'),
+                         {'flights': 5, 'flights:status:scheduled': 5})
+        self.assertEqual(FlightSearchIndex.objects.count(), 5)
+
+    def test_date_is_matched_on_departure_in_the_site_timezone(self):
+        # Wednesday's 21:00 local departure leaves on Thursday in UTC
+        self.assertEqual(schedules.materialize_for_date(date(2030, 1, 9)), 0)
+        self.assertEqual(schedules.materialize_for_date(date(2030, 1, 10)), 1)
+
+        self.assertEqual(self.departures(), [datetime(2030, 1, 10, 2, tzinfo=dt_timezone.utc)])
+
+    def test_local_date_is_the_origin_date(self):
+        self.assertEqual(schedules.materialize_for_date(date(2030, 1, 9), local=True), 1)
+        self.assertEqual(schedules.materialize_for_date(date(2030, 1, 10), local=True), 0)
+
+    def test_inactive_schedules_are_not_expanded(self):
+        FlightSchedule.objects.update(is_active=False)
+
+        self.assertEqual(schedules.materialize_range(date(2030, 1, 1), date(2030, 1, 31)), 0)
+
+
+class ConditionalAvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        airline = Airline.objects.create(name='Test Air', code='TA')
+        aircraft = Aircraft.objects.create(model='A320', airline=airline, capacity=150, economy_seats=150)
+        origin = Airport.objects.create(name='Kennedy', city='New York', country='US', code='JFK')
+        destination = Airport.objects.create(name='Heathrow', city='London', country='UK', code='LHR')
+        cls.flight = make_flight(aircraft, origin, destination, 'TA1', datetime(2030, 5, 1, 10, tzinfo=dt_timezone.utc))
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, data, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, data, **headers)
+
+    def test_availability_revalidates_until_the_flight_changes(self):
+        url = reverse('flights:availability', args=[self.flight.pk])
+        response = self.get(url, {'passengers': 2})
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(url, {'passengers': 2}, etag).status_code, 304)
+        self.assertEqual(self.get(url, {'passengers': 3}, etag).status_code, 200)
+
+        self.flight.available_economy_seats = 1
+        self.flight.save()
+        response = self.get(url, {'passengers': 2}, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['available'])
+
+    def test_availability_of_a_missing_flight_is_not_conditional(self):
+        response = self.get(reverse('flights:availability', args=[self.flight.pk + 100]), {}, '*')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_answers_304_for_the_same_question(self):
+        url = reverse('flights:availability_batch')
+        query = {'q': f'{self.flight.pk}:economy:2'}
+        etag = self.get(url, query)['ETag']
 
-# Create your tests here.
+        self.assertEqual(self.get(url, query, etag).status_code, 304)
+        self.assertEqual(self.get(url, {'q': f'{self.flight.pk}:economy:1'}, etag).status_code, 200)
+        Flight.objects.filter(pk=self.flight.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.get(url, query, etag).status_code, 200)
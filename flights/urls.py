@@ -8,4 +8,6 @@ urlpatterns = [
     path('search/results/', views.FlightSearchResultsView.as_view(), name='search_results'),
     path('detail/<int:flight_id>/', views.FlightDetailView.as_view(), name='detail'),
     path('availability/<int:flight_id>/', views.FlightAvailabilityView.as_view(), name='availability'),
+    path('availability/batch/', views.FlightBatchAvailabilityView.as_view(), name='availability_batch'),
+    path('live/', views.FlightStatusStreamView.as_view(), name='live_status'),
 ]
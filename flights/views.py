@@ -1,11 +1,63 @@
+import asyncio
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from django.views.generic import TemplateView, ListView
+from django.views.generic import TemplateView, ListView, View
 from django.db.models import Q
-from django.http import JsonResponse
-from datetime import datetime, timedelta
-from .models import Flight, Seat
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from datetime import datetime, timedelta, timezone as dt_timezone
+from .models import Flight, FlightSearchIndex, Seat
+from . import availability, live, quotes
+from .schedules import materialize_for_date
+from core import audit, caching, geo, popularity
+from core.conditional import make_etag, page_etag
+from core.ratelimit import ratelimit
 from core.models import Airport
 
+def flight_updated_at(request, flight_id):
+    """``updated_at`` of a flight, looked up once per request (shared by the ETag and Last-Modified functions)"""
+    cache = request.__dict__.setdefault('_flight_updated_at', {})
+    if flight_id not in cache:
+        cache[flight_id] = Flight.objects.filter(pk=flight_id).values_list('updated_at', flat=True).first()
+    return cache[flight_id]
+
+def search_results_etag(request, *args, **kwargs):
+    # Any flight or airport change invalidates; sorted so parameter order does not matter
+    query = sorted(request.GET.lists())
+    return page_etag(request, query, caching.get_version('flights', 'airports'))
+
+def flight_detail_etag(request, *args, **kwargs):
+    flight_id = kwargs.get('flight_id')
+    updated_at = flight_updated_at(request, flight_id)
+    if updated_at is None:
+        return None
+    return page_etag(request, flight_id, updated_at, caching.get_version(f'seats:flight:{flight_id}'))
+
+def availability_etag(request, *args, **kwargs):
+    flight_id = kwargs.get('flight_id')
+    if availability.parse_passengers(request.GET.get('passengers', 1)) is None:
+        return None
+    updated_at = flight_updated_at(request, flight_id)
+    if updated_at is None:
+        return None
+    return make_etag(
+        flight_id, updated_at, request.GET.get('passengers', ''), request.GET.get('class', ''),
+        quotes.window_start(),
+    )
+
+def availability_last_modified(request, *args, **kwargs):
+    updated_at = flight_updated_at(request, kwargs.get('flight_id'))
+    if updated_at is None:
+        return None
+    # The answer carries a fare quote, so it also goes stale when the quote window turns over
+    return max(updated_at, datetime.fromtimestamp(quotes.window_start(), tz=dt_timezone.utc))
+
 class FlightSearchView(TemplateView):
     template_name = 'flights/search.html'
     
@@ -17,6 +69,8 @@ class FlightSearchView(TemplateView):
         
         return context
 
+@method_decorator(cache_control(private=True, no_cache=True), name='get')
+@method_decorator(condition(etag_func=search_results_etag), name='get')
 class FlightSearchResultsView(ListView):
     template_name = 'flights/search_results.html'
     context_object_name = 'flights'
@@ -28,29 +82,34 @@ class FlightSearchResultsView(ListView):
         departure_date = self.request.GET.get('departure_date', '')
         passengers = int(self.request.GET.get('passengers', 1))
         
-        queryset = Flight.objects.filter(status='scheduled')
+        radius = geo.parse_radius(self.request.GET.get('radius'))
+        route_filter = Q()
         
-        # Filter by departure airport
+        # Airports matching the text plus those within the radius, as one IN list each
         if departure:
-            queryset = queryset.filter(
-                Q(origin__code__icontains=departure) |
-                Q(origin__city__icontains=departure) |
-                Q(origin__name__icontains=departure)
-            )
+            route_filter &= Q(origin_id__in=sorted(geo.expand_airports(departure, radius)))
         
-        # Filter by destination airport
         if destination:
-            queryset = queryset.filter(
-                Q(destination__code__icontains=destination) |
-                Q(destination__city__icontains=destination) |
-                Q(destination__name__icontains=destination)
-            )
+            matches = geo.matching_airports(destination)
+            route_filter &= Q(destination_id__in=sorted(geo.expand_airports(destination, radius, matches)))
+            # Feeds the popular destinations ranking; later pages of the same search are not counted
+            if self.request.GET.get('page', '1') == '1':
+                popularity.record_search(airport_id for airport_id, _, _ in matches)
         
-        # Filter by departure date
+        # The flat search index answers without joins; the flight query stays as a fallback
+        use_index = getattr(settings, 'FLIGHT_SEARCH_USE_INDEX', True)
+        model = FlightSearchIndex if use_index else Flight
+        queryset = model.objects.filter(status='scheduled').filter(route_filter)
+        
+        # Filter by departure date, expanding recurring schedules for that date first
         if departure_date:
             try:
                 date = datetime.strptime(departure_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(departure_time__date=date)
+                materialize_for_date(date, route_filter, local=use_index)
+                if use_index:
+                    queryset = queryset.filter(local_date=date)
+                else:
+                    queryset = queryset.filter(departure_time__date=date)
             except ValueError:
                 pass
         
@@ -62,6 +121,13 @@ class FlightSearchResultsView(ListView):
         # Order by departure time
         queryset = queryset.order_by('departure_time')
         
+        audit.record_activity(
+            self.request, 'flight_searched',
+            f'{departure or "any"} -> {destination or "any"} on {departure_date or "any date"}, {passengers} passenger(s)'
+        )
+        
+        if use_index:
+            return queryset
         return queryset.select_related('airline', 'origin', 'destination', 'aircraft')
     
     def get_context_data(self, **kwargs):
@@ -78,6 +144,8 @@ class FlightSearchResultsView(ListView):
         
         return context
 
+@method_decorator(cache_control(private=True, no_cache=True), name='get')
+@method_decorator(condition(etag_func=flight_detail_etag), name='get')
 class FlightDetailView(TemplateView):
     template_name = 'flights/detail.html'
     
@@ -97,36 +165,148 @@ class FlightDetailView(TemplateView):
         
         return context
 
+@method_decorator(ratelimit('flight_availability'), name='dispatch')
+@method_decorator(cache_control(private=True, no_cache=True), name='get')
+@method_decorator(condition(etag_func=availability_etag, last_modified_func=availability_last_modified), name='get')
 class FlightAvailabilityView(TemplateView):
     """AJAX view to check flight availability"""
     
     def get(self, request, *args, **kwargs):
         flight_id = kwargs.get('flight_id')
-        passengers = int(request.GET.get('passengers', 1))
+        passengers = availability.parse_passengers(request.GET.get('passengers', 1))
         seat_class = request.GET.get('class', 'economy')
+        if passengers is None:
+            return JsonResponse({'error': 'passengers must be at least 1'}, status=400)
         
         try:
-            flight = Flight.objects.get(id=flight_id)
-            
-            if seat_class == 'economy':
-                available = flight.available_economy_seats >= passengers
-                price = flight.economy_price
-            elif seat_class == 'business':
-                available = flight.available_business_seats >= passengers
-                price = flight.business_price
-            elif seat_class == 'first':
-                available = flight.available_first_class_seats >= passengers
-                price = flight.first_class_price
-            else:
-                available = False
-                price = 0
-            
-            return JsonResponse({
-                'available': available,
-                'price': float(price),
-                'currency': 'USD',
-                'total_price': float(price * passengers)
-            })
+            flight = Flight.objects.values(*availability.FIELDS).get(id=flight_id)
+            return JsonResponse(availability.answer(flight, seat_class, passengers))
             
         except Flight.DoesNotExist:
             return JsonResponse({'error': 'Flight not found'}, status=404)
+
+@method_decorator(ratelimit('flight_availability'), name='dispatch')
+class FlightBatchAvailabilityView(View):
+    """AJAX view answering availability for many (flight, class, passengers) tuples at once"""
+    
+    MAX_QUERIES = 100
+    
+    def get(self, request, *args, **kwargs):
+        # ?q=12:economy:2&q=13:business:1 (comma-separated values also accepted)
+        queries = []
+        for value in request.GET.getlist('q'):
+            for item in value.split(','):
+                if not item.strip():
+                    continue
+                try:
+                    flight_id, seat_class, passengers = item.strip().split(':')
+                    queries.append((int(flight_id), seat_class, int(passengers)))
+                except ValueError:
+                    return JsonResponse({'error': f'Expected flight_id:class:passengers, got {item!r}'}, status=400)
+        if not queries:
+            return JsonResponse({'error': 'No queries given'}, status=400)
+        if len(queries) > self.MAX_QUERIES:
+            return JsonResponse({'error': f'At most {self.MAX_QUERIES} queries per request'}, status=400)
+        if any(passengers < 1 for _, _, passengers in queries):
+            return JsonResponse({'error': 'passengers must be at least 1'}, status=400)
+        
+        rows = list(Flight.objects.filter(
+            id__in={flight_id for flight_id, _, _ in queries}
+        ).values(*availability.FIELDS))
+        
+        # The question asked, the newest updated_at involved and the quote window
+        newest = max((row['updated_at'] for row in rows), default=None)
+        etag = make_etag(sorted(queries), len(rows), newest, quotes.window_start())
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        
+        flights = {row['id']: row for row in rows}
+        results = []
+        for flight_id, seat_class, passengers in queries:
+            result = {'flight_id': flight_id, 'class': seat_class, 'passengers': passengers}
+            if flight_id in flights:
+                result.update(availability.answer(flights[flight_id], seat_class, passengers))
+            else:
+                result['error'] = 'Flight not found'
+            results.append(result)
+        
+        response = JsonResponse({'results': results})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+class FlightStatusStreamView(View):
+    """Server-Sent Events stream of status, gate and terminal changes (ASGI only)"""
+    
+    MAX_FLIGHTS = 50
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            # A WSGI worker would buffer the endless stream and never respond
+            return JsonResponse({'error': 'Live updates require an ASGI server'}, status=501)
+        
+        try:
+            flight_ids = {int(value) for value in request.GET.get('flights', '').split(',') if value.strip()}
+        except ValueError:
+            return JsonResponse({'error': 'flights must be a comma-separated list of ids'}, status=400)
+        if len(flight_ids) > self.MAX_FLIGHTS:
+            return JsonResponse({'error': f'At most {self.MAX_FLIGHTS} flights per stream'}, status=400)
+        
+        snapshot = Flight.objects.none()
+        if flight_ids:
+            snapshot = Flight.objects.filter(id__in=flight_ids)
+        
+        airport_ids = set()
+        airport_code = request.GET.get('airport', '').strip().upper()
+        if airport_code:
+            airport = await Airport.objects.filter(code=airport_code).afirst()
+            if airport is None:
+                return JsonResponse({'error': 'Airport not found'}, status=404)
+            airport_ids.add(airport.pk)
+            now = timezone.now()
+            snapshot = snapshot | Flight.objects.filter(
+                origin=airport,
+                departure_time__gte=now - live.AIRPORT_WINDOW_BEFORE,
+                departure_time__lte=now + live.AIRPORT_WINDOW_AFTER,
+            )
+        
+        if not flight_ids and not airport_ids:
+            return JsonResponse({'error': 'Subscribe with ?flights=1,2 or ?airport=CODE'}, status=400)
+        
+        broadcaster = live.get_broadcaster()
+        try:
+            subscription = broadcaster.subscribe(flight_ids, airport_ids)
+        except live.BroadcasterFull:
+            response = JsonResponse({'error': 'Too many live connections'}, status=503)
+            response['Retry-After'] = '30'
+            return response
+        
+        try:
+            rows = [row async for row in snapshot.order_by('departure_time').values(*live.FIELDS)]
+            # Only flights the broadcaster has no values for yet, so a change committed just
+            # before this query still reaches existing subscribers
+            broadcaster.seed(rows)
+            keepalive = live.get_config()['KEEPALIVE']
+        except BaseException:
+            broadcaster.unsubscribe(subscription)
+            raise
+        
+        async def stream():
+            try:
+                yield 'retry: 5000\n\n'
+                yield live.format_event('snapshot', [live.flight_payload(row) for row in rows])
+                while True:
+                    try:
+                        message = await asyncio.wait_for(subscription.queue.get(), keepalive)
+                    except asyncio.TimeoutError:
+                        # Comment line keeps proxies from closing an idle connection
+                        yield ': keepalive\n\n'
+                        continue
+                    yield message
+            finally:
+                broadcaster.unsubscribe(subscription)
+        
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
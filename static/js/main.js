@@ -423,26 +423,83 @@ function initSearchSuggestions() {
     });
 }
 
-function showAirportSuggestions(input, query) {
-    // This would typically fetch from an API
-    const airports = [
-        { code: 'JFK', name: 'John F. Kennedy International Airport', city: 'New York' },
-        { code: 'LAX', name: 'Los Angeles International Airport', city: 'Los Angeles' },
-        { code: 'CHI', name: 'Chicago O\'Hare International Airport', city: 'Chicago' },
-        { code: 'MIA', name: 'Miami International Airport', city: 'Miami' },
-        { code: 'SFO', name: 'San Francisco International Airport', city: 'San Francisco' }
-    ];
-    
-    const filtered = airports.filter(airport => 
-        airport.code.toLowerCase().includes(query) ||
-        airport.name.toLowerCase().includes(query) ||
-        airport.city.toLowerCase().includes(query)
-    );
-    
-    if (filtered.length > 0) {
-        const suggestions = createSuggestionsDropdown(filtered, input);
-        showDropdown(input, suggestions);
+// Airport dataset, fetched once per page from the content-hashed bundle and filtered locally
+let airportBundle = null;
+
+function loadAirportBundle() {
+    if (!airportBundle) {
+        const url = document.body.dataset.airportBundle;
+        airportBundle = url
+            ? fetch(url)
+                .then(response => response.ok ? response.json() : Promise.reject(response.status))
+                .then(data => data.airports.map(([code, name, city, country, key]) => ({ code, name, city, country, key })))
+                .catch(() => null)
+            : Promise.resolve(null);
+    }
+    return airportBundle;
+}
+
+function normalizeQuery(query) {
+    return query.normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase().trim();
+}
+
+function filterAirports(airports, query, limit = 10) {
+    // Exact code first, then code prefix, then word prefix, then anywhere
+    const rank = airport => {
+        const code = airport.code.toLowerCase();
+        if (code === query) return 0;
+        if (code.startsWith(query)) return 1;
+        if (airport.key.startsWith(query) || airport.key.includes(' ' + query)) return 2;
+        return 3;
+    };
+    return airports
+        .filter(airport => airport.key.includes(query))
+        .map(airport => [rank(airport), airport])
+        .sort((a, b) => a[0] - b[0] || a[1].code.localeCompare(b[1].code))
+        .slice(0, limit)
+        .map(([, airport]) => airport);
+}
+
+let pendingAirportSearch = null;
+
+function searchAirportsRemotely(query) {
+    // Fallback when no bundle is built: debounced calls to the search API.
+    // A newer call supersedes the pending one, which resolves empty (and aborts its request).
+    if (pendingAirportSearch) {
+        clearTimeout(pendingAirportSearch.timer);
+        pendingAirportSearch.controller.abort();
+        pendingAirportSearch.resolve([]);
     }
+    return new Promise(resolve => {
+        const search = {resolve, controller: new AbortController()};
+        search.timer = setTimeout(() => {
+            const url = `${document.body.dataset.airportSearchUrl}?q=${encodeURIComponent(query)}`;
+            fetch(url, {signal: search.controller.signal})
+                .then(response => response.json())
+                .then(data => resolve(data.airports))
+                .catch(() => resolve([]))
+                .finally(() => {
+                    if (pendingAirportSearch === search) pendingAirportSearch = null;
+                });
+        }, 250);
+        pendingAirportSearch = search;
+    });
+}
+
+function showAirportSuggestions(input, query) {
+    query = normalizeQuery(query);
+    loadAirportBundle()
+        .then(airports => airports ? filterAirports(airports, query) : searchAirportsRemotely(query))
+        .then(filtered => {
+            // Ignore answers for a query the user has already typed past
+            if (normalizeQuery(input.value) !== query) return;
+            if (filtered.length > 0) {
+                const suggestions = createSuggestionsDropdown(filtered, input);
+                showDropdown(input, suggestions);
+            } else {
+                hideAirportSuggestions(input);
+            }
+        });
 }
 
 function createSuggestionsDropdown(airports, input) {